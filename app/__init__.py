@@ -6,6 +6,7 @@ from app.models.config import Config
 from app.db.postgresdb import PostgresDB
 from flask import redirect, url_for, current_app
 from app.db.db_utils import close_db
+import atexit
 import logging
 from flask_login import LoginManager, login_required, current_user
 from dotenv import load_dotenv
@@ -13,6 +14,7 @@ import os
 from app.managers.job_manager import JobManager
 from app.managers.user_manager import UserManager
 from app.managers.processed_email_manager import ProcessedEmailManager
+from app.managers.failed_task_manager import FailedTaskManager
 from app.managers.role_manager import RoleManager
 from app.db.db_utils import get_db
 from app.managers.update_schema_manager import UpdateSchemaManager
@@ -44,6 +46,7 @@ def init_database():
     processed_email_manager = ProcessedEmailManager()
     user_manager = UserManager()
     user_preferences_manager = UserPreferencesManager()
+    failed_task_manager = FailedTaskManager()
 
     # Call the create_tables method for each manager
     user_manager.create_table()
@@ -51,6 +54,7 @@ def init_database():
     processed_email_manager.create_table()
     role_manager.create_tables()
     user_preferences_manager.create_table()
+    failed_task_manager.create_table()
 
 google_bp = make_google_blueprint(
     client_id="my-key-here",
@@ -97,8 +101,8 @@ def create_flask_app():
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(task_queue_bp, url_prefix='/api/task_queue')
     app.register_blueprint(jobs_api_bp, url_prefix="/api/jobs")
-    # Teardown database connection
-    app.teardown_appcontext(close_db)
+    # The connection pool outlives app contexts; connections are returned to it after each query
+    atexit.register(close_db)
 
     # Initialize the database with app context
     with app.app_context():
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+
+try:
+    from psycopg.conninfo import make_conninfo
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:  # psycopg 3 is only needed by the asyncio code paths
+    AsyncConnectionPool = None
+
+
+class AsyncPostgresDB:
+    """
+    asyncio counterpart of PostgresDB built on psycopg 3, with the same query helpers and its own pool.
+    Statements use the same %s placeholders as PostgresDB, so queries can be shared between both.
+    """
+
+    def __init__(self, host, database, user, password, min_size=None, max_size=None):
+        if AsyncConnectionPool is None:
+            raise RuntimeError("AsyncPostgresDB requires the 'psycopg[pool]' package")
+        self.host = host
+        self.database = database
+        self.user = user
+        self.password = password
+        self.logger = logging.getLogger(__name__)
+        self.min_size = min_size if min_size is not None else int(os.getenv('DB_ASYNC_POOL_MIN_SIZE', '1'))
+        self.max_size = max_size if max_size is not None else int(os.getenv('DB_ASYNC_POOL_MAX_SIZE', '10'))
+        self.pool = AsyncConnectionPool(
+            # make_conninfo quotes values, so passwords with spaces or quotes survive
+            conninfo=make_conninfo(host=host, dbname=database, user=user, password=password),
+            min_size=self.min_size,
+            max_size=self.max_size,
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            kwargs={"autocommit": True},
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+        self.logger.info("AsyncPostgresDB instance initialized")
+
+    async def connect(self):
+        """Open the connection pool and wait until its minimum size is connected."""
+        try:
+            self.logger.info(f"Connecting to database '{self.database}' (async pool size {self.min_size}-{self.max_size})")
+            await self.pool.open(wait=True)
+            self.logger.info("Async database connection pool established successfully.")
+        except Exception as e:
+            self.logger.error(f"Error connecting to the database: {e}")
+            raise
+
+    async def execute_query(self, query, params=None):
+        """Execute a query with optional parameters, returning the first column of RETURNING queries."""
+        async with self.pool.connection() as connection:
+            try:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, params)
+                    if "RETURNING" in query:
+                        row = await cursor.fetchone()
+                        self.logger.debug(f"Query executed successfully")
+                        return row[0]
+                    self.logger.debug(f"Query executed successfully")
+            except Exception as e:
+                self.logger.error(f"Error executing query: {e}\n Query: {query}")
+                raise
+
+    async def fetch_one_with_column_names(self, query, params=None):
+        """Fetch a single row as a dict keyed by column name, or None."""
+        try:
+            async with self.pool.connection() as connection, connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                column_names = [desc[0] for desc in cursor.description]
+                row = await cursor.fetchone()
+                return dict(zip(column_names, row)) if row else None
+        except Exception as e:
+            self.logger.error(f"Error fetching data: {e}\n Query: {query}")
+            return None
+
+    async def fetch_one(self, query, params=None):
+        """Fetch a single result from a query."""
+        try:
+            async with self.pool.connection() as connection, connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                result = await cursor.fetchone()
+                self.logger.debug(f"Query executed successfully")
+                return result
+        except Exception as e:
+            self.logger.error(f"Error fetching data: {e}\n Query: {query}")
+            raise
+
+    async def fetch_all(self, query, params=None):
+        """Fetch every row of a query."""
+        try:
+            async with self.pool.connection() as connection, connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchall()
+        except Exception as e:
+            self.logger.error(f"Error fetching data: {e}\nQuery: {query}")
+            raise
+
+    async def create_table(self, create_table_sql):
+        """Create a table using the provided SQL statement."""
+        try:
+            await self.execute_query(create_table_sql)
+            self.logger.info("Table creation query executed successfully.")
+        except Exception as e:
+            self.logger.error(f"Error creating table: {e}")
+            raise
+
+    async def add_object(self, table, data):
+        """
+        Add a new object (row) to the specified table.
+        :param table: Name of the table.
+        :param data: Dictionary where keys are column names and values are the corresponding values.
+        """
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join(['%s'] * len(data))
+        values = tuple(data.values())
+
+        query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+        await self.execute_query(query, values)
+        self.logger.info(f"Inserted object into {table}")
+
+    async def update_object(self, table, data, condition):
+        """
+        Update an existing object (row) in the specified table.
+        :param table: Name of the table.
+        :param data: Dictionary where keys are column names to update and values are the new values.
+        :param condition: Dictionary where keys are column names to match and values are the values to match.
+        """
+        set_clause = []
+        values = []
+
+        for k, v in data.items():
+            if isinstance(v, dict):
+                # Convert dict to JSON string
+                set_clause.append(f"{k} = %s::jsonb")
+                values.append(json.dumps(v))
+            else:
+                set_clause.append(f"{k} = %s")
+                values.append(v)
+
+        set_clause = ', '.join(set_clause)
+        where_clause = ' AND '.join([f"{k} = %s" for k in condition.keys()])
+        values.extend(condition.values())
+
+        query = f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
+        await self.execute_query(query, tuple(values))
+        self.logger.info(f"Updated object in {table}")
+
+    async def delete_object(self, table, condition):
+        """
+        Delete an object (row) from the specified table.
+        :param table: Name of the table.
+        :param condition: Dictionary where keys are column names to match and values are the values to match.
+        """
+        where_clause = ' AND '.join([f"{k} = %s" for k in condition.keys()])
+        values = tuple(condition.values())
+
+        query = f"DELETE FROM {table} WHERE {where_clause}"
+        await self.execute_query(query, values)
+        self.logger.info(f"Deleted object from {table} where {condition}")
+
+    async def get_object(self, table, condition):
+        """
+        Get an object (row) from the specified table.
+        :param table: Name of the table.
+        :param condition: Dictionary where keys are column names to match and values are the values to match.
+        :return: The object (row) matching the condition, or None if not found.
+        """
+        where_clause = ' AND '.join([f"{k} = %s" for k in condition.keys()])
+        values = tuple(condition.values())
+
+        query = f"SELECT * FROM {table} WHERE {where_clause}"
+        return await self.fetch_one_with_column_names(query, values)
+
+    def get_pool_stats(self) -> dict:
+        """Return the psycopg pool counters (connections, waiting requests, wait times)."""
+        return self.pool.get_stats()
+
+    async def close(self):
+        """Close every connection in the pool."""
+        await self.pool.close()
+        self.logger.info("Async database connection pool closed.")
@@ -1,22 +1,54 @@
+import asyncio
+import threading
+
+from app.db.async_postgresdb import AsyncPostgresDB
 from app.db.postgresdb import PostgresDB
 from app.models.api_response import APIResponse
 from app.models.config import Config
 
 current_db = None
+_db_lock = threading.Lock()
+current_async_db = None
+_async_db_lock = asyncio.Lock()
 
 def get_db():
+    """Return the process-wide PostgresDB; its connection pool is shared by all threads."""
     global current_db
     if not current_db:
-        current_db = PostgresDB(Config.DB_HOST, Config.DB_NAME, Config.DB_USER, Config.DB_PASSWORD)
+        with _db_lock:
+            if not current_db:
+                current_db = PostgresDB(Config.DB_HOST, Config.DB_NAME, Config.DB_USER, Config.DB_PASSWORD)
 
     return current_db
 
 def close_db(e=None):
+    """Close the connection pool. Only call this on process shutdown, never per request."""
     global current_db 
-    if current_db is not None:
-        current_db.close()
-        current_db = None
-        
+    with _db_lock:
+        if current_db is not None:
+            current_db.close()
+            current_db = None
+
+async def get_async_db():
+    """Return the process-wide AsyncPostgresDB, opening its pool on first use. Only use it from one event loop."""
+    global current_async_db
+    if not current_async_db:
+        async with _async_db_lock:
+            if not current_async_db:
+                async_db = AsyncPostgresDB(Config.DB_HOST, Config.DB_NAME, Config.DB_USER, Config.DB_PASSWORD)
+                await async_db.connect()
+                current_async_db = async_db
+
+    return current_async_db
+
+async def close_async_db():
+    """Close the async connection pool on shutdown."""
+    global current_async_db
+    async with _async_db_lock:
+        if current_async_db is not None:
+            await current_async_db.close()
+            current_async_db = None
+
 def get_api_response_value(response: APIResponse, property_name: str):
     """
     Helper function to handle APIResponses and return the value of a specific property.
@@ -0,0 +1,56 @@
+import re
+
+from flask import g, has_request_context
+
+MISSING = object()
+
+_READ_STATEMENT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+def is_read_statement(query) -> bool:
+    """Only plain SELECTs are cached; anything else (including writes with RETURNING) may change rows."""
+    return bool(_READ_STATEMENT.match(query)) and "FOR UPDATE" not in query.upper()
+
+
+def _get_request_cache():
+    """Return the cache of the current Flask request, or None outside of a request."""
+    if not has_request_context():
+        return None
+    cache = g.get('_db_identity_map')
+    if cache is None:
+        cache = g._db_identity_map = {}
+    return cache
+
+
+def make_key(method, query, params):
+    """Build a hashable cache key, or None if the parameters can't be hashed."""
+    if isinstance(params, list):
+        params = tuple(params)
+    key = (method, query, params)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def get(key):
+    """Return the row cached for this request, or MISSING."""
+    cache = _get_request_cache()
+    if cache is None or key is None:
+        return MISSING
+    return cache.get(key, MISSING)
+
+
+def put(key, value):
+    """Cache a row for the rest of the current request."""
+    cache = _get_request_cache()
+    if cache is not None and key is not None:
+        cache[key] = value
+
+
+def clear():
+    """Forget every row cached for the current request, after a write."""
+    cache = _get_request_cache()
+    if cache:
+        cache.clear()
@@ -1,17 +1,103 @@
+import itertools
 import json
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
 import logging
 import os
+import re
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from app.db import identity_map
+from app.db.query_stats import QueryStats
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout."""
+
+
+class _TransactionState(threading.local):
+    """Connection pinned to the current thread by PostgresDB.transaction(), and writes buffered by batch()."""
+
+    def __init__(self):
+        self.connection = None
+        self.batching = False
+        self.pending = []
+
+
+class _IdleConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that keeps up to `max_idle` returned connections open. The base pool opens `minconn`
+    connections up front and also closes every returned connection beyond `minconn` idle ones, so sizing it for
+    busy periods would either connect per query or open every connection at startup.
+    """
+
+    def __init__(self, minconn, maxconn, max_idle, *args, **kwargs):
+        self.max_idle = max(minconn, max_idle)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def _putconn(self, conn, key=None, close=False):
+        if self.closed:
+            raise psycopg2.pool.PoolError("connection pool is closed")
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise psycopg2.pool.PoolError("trying to put unkeyed connection")
+
+        if close or len(self._pool) >= self.max_idle or conn.closed:
+            conn.close()
+        elif conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            # Server connection lost
+            conn.close()
+        else:
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            self._pool.append(conn)
+
+        # The key is gone if closeall() ran while the connection was checked out
+        if not self.closed or key in self._used:
+            del self._used[key]
+            del self._rused[id(conn)]
 
 
 class PostgresDB:
-    def __init__(self, host, database, user, password):
+    def __init__(self, host, database, user, password, min_size=None, max_size=None):
         self.host = host
         self.database = database
         self.user = user
         self.password = password
         self.logger = logging.getLogger(__name__)
-        self.connection = None
+        self.min_size = min_size if min_size is not None else int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+        self.max_size = max_size if max_size is not None else int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+        # Connections kept open when returned; the pool closes the rest, so a lower value means a connect per checkout
+        self.max_idle = int(os.getenv('DB_POOL_MAX_IDLE', str(self.max_size)))
+        self.checkout_timeout = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+        # Connections idle for longer than this are pinged before being handed out
+        self.ping_after = float(os.getenv('DB_POOL_PING_AFTER', '30'))
+        self.pool = None
+        # ThreadedConnectionPool raises instead of waiting when exhausted, so checkouts queue on this semaphore
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._stats_lock = threading.Lock()
+        self._last_used = weakref.WeakKeyDictionary()
+        self._stats = {"checkouts": 0, "wait_time_total": 0.0, "wait_time_max": 0.0, "timeouts": 0, "discarded": 0, "closed_idle": 0}
+        self._in_use = 0
+        self._peak_in_use = 0
+        # Per-connection LRU of query -> prepared statement name. Keyed by the connection object, not its id(),
+        # which a new connection can reuse once the pool closes the old one
+        self.statement_cache_size = int(os.getenv('DB_PREPARED_STATEMENT_CACHE_SIZE', '100'))
+        self._prepared = weakref.WeakKeyDictionary()
+        self._unpreparable = set()
+        self._statement_names = itertools.count(1)
+        self._prepared_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._tx = _TransactionState()
+        self.query_stats = QueryStats() if os.getenv('DB_QUERY_STATS', 'true').lower() == 'true' else None
         self.logger.info("PostgresDB instance initialized")
         self.init_database()
         self.connect()
@@ -45,38 +131,338 @@ class PostgresDB:
             raise
 
     def connect(self):
-        """Establish a connection to the PostgreSQL database."""
+        """Create the connection pool for the PostgreSQL database."""
         try:
-            self.logger.info(f"Connecting to database '{self.database}'")
-            self.connection = psycopg2.connect(host=self.host, database=self.database, user=self.user, password=self.password)
-            self.connection.set_session(autocommit=True)
-            self.logger.info("Database connection established successfully.")
+            self.logger.info(f"Connecting to database '{self.database}' (pool size {self.min_size}-{self.max_size}, {self.max_idle} idle)")
+            self.pool = _IdleConnectionPool(
+                self.min_size,
+                self.max_size,
+                self.max_idle,
+                host=self.host,
+                database=self.database,
+                user=self.user,
+                password=self.password,
+            )
+            self.logger.info("Database connection pool established successfully.")
         except Exception as e:
             self.logger.error(f"Error connecting to the database: {e}")
             raise
 
-    def execute_query(self, query, params=None):
-        """Execute a query with optional parameters."""
+    def _is_healthy(self, connection) -> bool:
+        """Check a pooled connection before handing it out, pinging it if it has been idle for a while."""
+        if connection.closed:
+            return False
+        last_used = self._last_used.get(connection)
+        if last_used is None or time.monotonic() - last_used < self.ping_after:
+            return True
+        try:
+            if not connection.autocommit:
+                connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        """Take a healthy connection from the pool, waiting up to the checkout timeout for one to be free."""
+        started_at = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._stats_lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeoutError(f"No database connection available after {self.checkout_timeout}s")
+        waited = time.monotonic() - started_at
+
+        try:
+            connection = self.pool.getconn()
+            while not self._is_healthy(connection):
+                self.logger.warning("Discarding broken database connection")
+                self._last_used.pop(connection, None)
+                self._prepared.pop(connection, None)
+                self.pool.putconn(connection, close=True)
+                with self._stats_lock:
+                    self._stats["discarded"] += 1
+                connection = self.pool.getconn()
+            if not connection.autocommit:
+                connection.autocommit = True
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._stats_lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return connection
+
+    def _checkin(self, connection):
+        """Return a connection to the pool, rolling back anything left open and closing it if it broke."""
+        try:
+            broken = bool(connection.closed)
+            if not broken and connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                # PREPARE is not transactional: the statements cached for this connection survive the rollback
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    broken = True
+            if not broken:
+                self._last_used[connection] = time.monotonic()
+            self.pool.putconn(connection, close=broken)
+            if connection.closed:
+                if not broken:
+                    with self._stats_lock:
+                        self._stats["closed_idle"] += 1
+                # Broken, or closed by the pool because enough connections are idle: its statements are gone
+                self._last_used.pop(connection, None)
+                self._prepared.pop(connection, None)
+        finally:
+            with self._stats_lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def get_connection(self):
+        """Check a connection out of the pool for one unit of work, or reuse the one of the current transaction."""
+        if self._tx.connection is not None:
+            yield self._tx.connection
+            return
+        connection = self._checkout()
+        try:
+            yield connection
+        finally:
+            self._checkin(connection)
+
+    def _in_transaction(self, connection) -> bool:
+        return connection is self._tx.connection
+
+    def _commit(self, connection):
+        """Commit a single statement, unless it runs inside transaction(), which commits once at the end."""
+        if not self._in_transaction(connection):
+            connection.commit()
+
+    def _rollback(self, connection):
+        """Roll back a failed statement; inside transaction() the whole transaction is rolled back when it exits."""
+        if not self._in_transaction(connection):
+            connection.rollback()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run every statement issued by this thread inside the block on one connection and commit them together.
+        The transaction is rolled back if the block raises or one of its statements failed. Nested calls join
+        the outer transaction.
+        """
+        if self._tx.connection is not None:
+            yield self._tx.connection
+            return
+
+        with self.get_connection() as connection:
+            connection.autocommit = False
+            self._tx.connection = connection
+            try:
+                yield connection
+                self._flush_batch(connection)
+                if connection.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                    # A statement failed and its error was swallowed by the caller, so COMMIT would silently roll back
+                    raise psycopg2.errors.InFailedSqlTransaction("A statement of the transaction failed, rolled back")
+                connection.commit()
+            except Exception:
+                self.logger.warning("Rolling back database transaction")
+                self._tx.pending = []
+                # Rows cached inside the transaction are gone; prepared statements outlive the rollback
+                identity_map.clear()
+                if not connection.closed:
+                    try:
+                        connection.rollback()
+                    except psycopg2.Error:
+                        pass
+                raise
+            finally:
+                self._tx.connection = None
+                if not connection.closed:
+                    connection.autocommit = True
+
+    @contextmanager
+    def batch(self):
+        """
+        Like transaction(), but writes without RETURNING are buffered and sent to the server together,
+        in a single round trip, before the next read of the transaction or when the block exits.
+        """
+        with self.transaction() as connection:
+            batching = self._tx.batching
+            self._tx.batching = True
+            try:
+                yield connection
+                self._flush_batch(connection)
+            except Exception:
+                self._tx.pending = []
+                raise
+            finally:
+                self._tx.batching = batching
+
+    def _flush_batch(self, connection):
+        """Send the writes buffered by batch() as one multi-statement query."""
+        pending = self._tx.pending
+        if not pending:
+            return
+        self._tx.pending = []
+        started_at = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(b";\n".join(pending))
+        if self.query_stats is not None:
+            self.query_stats.record(f"BATCH ({len(pending)} statements)", time.perf_counter() - started_at, len(pending))
+        self.logger.debug(f"Flushed {len(pending)} batched statements")
+
+    @staticmethod
+    def _to_numbered_placeholders(query):
+        """Rewrite %s placeholders as $1..$n for PREPARE, or return None if the query uses named placeholders."""
+        if '%(' in query:
+            return None
+        counter = itertools.count(1)
+        return re.sub(r'%%|%s', lambda match: '%' if match.group() == '%%' else f"${next(counter)}", query)
+
+    def _execute(self, connection, cursor, query, params=None, prepare=False):
+        """Execute a query on a cursor and record its latency and row count."""
+        if self._tx.pending and self._in_transaction(connection):
+            # Buffered writes must reach the server before anything that may read them
+            self._flush_batch(connection)
+        if not identity_map.is_read_statement(query):
+            # Any write may change cached rows, directly or through triggers
+            identity_map.clear()
+        started_at = time.perf_counter()
         try:
-            with self.connection.cursor() as cursor:
+            self._execute_statement(connection, cursor, query, params, prepare)
+        finally:
+            if self.query_stats is not None:
+                self.query_stats.record(query, time.perf_counter() - started_at, cursor.rowcount)
+
+    def _execute_statement(self, connection, cursor, query, params=None, prepare=False):
+        """
+        Execute a query on a cursor. With `prepare`, the query is planned once per connection with PREPARE
+        and run with EXECUTE afterwards; the least recently used statements are deallocated beyond the cache size.
+        """
+        if not prepare or query in self._unpreparable:
+            cursor.execute(query, params)
+            return
+
+        statements = self._prepared.setdefault(connection, OrderedDict())
+        name = statements.get(query)
+        if name is not None:
+            statements.move_to_end(query)
+            with self._stats_lock:
+                self._prepared_stats["hits"] += 1
+        else:
+            numbered_query = self._to_numbered_placeholders(query)
+            if numbered_query is None:
+                self._unpreparable.add(query)
                 cursor.execute(query, params)
-                # Si la requête contient un INSERT, utiliser RETURNING pour obtenir l'ID
-                if "RETURNING" in query:
-                    last_id = cursor.fetchone()[0]
-                    self.connection.commit()
+                return
+            name = self._prepare(cursor, statements, query, numbered_query)
+            with self._stats_lock:
+                self._prepared_stats["misses"] += 1
+            if len(statements) > self.statement_cache_size:
+                _, evicted_name = statements.popitem(last=False)
+                cursor.execute(f"DEALLOCATE {evicted_name}")
+                with self._stats_lock:
+                    self._prepared_stats["evictions"] += 1
+
+        try:
+            self._execute_prepared(cursor, name, params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # The server no longer knows the statements cached for this connection (e.g. DISCARD ALL):
+            # forget them all and prepare this one again
+            statements.clear()
+            if not connection.autocommit:
+                raise
+            self.logger.warning(f"Prepared statement {name} is missing on its connection, preparing it again")
+            name = self._prepare(cursor, statements, query, self._to_numbered_placeholders(query))
+            self._execute_prepared(cursor, name, params)
+        except psycopg2.errors.FeatureNotSupported:
+            # "cached plan must not change result type": the table changed under a SELECT *, so plan it again later
+            if connection.autocommit:
+                statements.pop(query, None)
+                cursor.execute(f"DEALLOCATE {name}")
+                cursor.execute(query, params)
+            else:
+                raise
+
+    def _prepare(self, cursor, statements, query, numbered_query):
+        """PREPARE a query under a new name and cache the name for the cursor's connection."""
+        name = f"stmt_{next(self._statement_names)}"
+        cursor.execute(f"PREPARE {name} AS {numbered_query}")
+        statements[query] = name
+        return name
+
+    @staticmethod
+    def _execute_prepared(cursor, name, params):
+        if params:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cursor.execute(f"EXECUTE {name}")
+
+    def get_prepared_statement_stats(self) -> dict:
+        """Return hit/miss counters of the prepared statement cache."""
+        with self._stats_lock:
+            lookups = self._prepared_stats["hits"] + self._prepared_stats["misses"]
+            return {
+                **self._prepared_stats,
+                "hit_rate": self._prepared_stats["hits"] / lookups if lookups else 0.0,
+                "prepared": sum(len(statements) for statements in self._prepared.values()),
+            }
+
+    def get_query_stats(self, limit=20, order_by="total_ms") -> list:
+        """Return the top statements by total time (or calls, max_ms, rows), with their latency histograms."""
+        if self.query_stats is None:
+            return []
+        return self.query_stats.get_top_statements(limit, order_by)
+
+    def get_pool_stats(self) -> dict:
+        """Return checkout wait times and utilisation of the connection pool."""
+        with self._stats_lock:
+            checkouts = self._stats["checkouts"]
+            return {
+                **self._stats,
+                "wait_time_avg": self._stats["wait_time_total"] / checkouts if checkouts else 0.0,
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "max_size": self.max_size,
+                "utilisation": self._in_use / self.max_size,
+            }
+
+    def execute_query(self, query, params=None):
+        """Execute a query with optional parameters."""
+        with self.get_connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    if self._tx.batching and self._in_transaction(connection) and "RETURNING" not in query:
+                        identity_map.clear()
+                        self._tx.pending.append(cursor.mogrify(query, params))
+                        return
+                    self._execute(connection, cursor, query, params)
+                    # Si la requête contient un INSERT, utiliser RETURNING pour obtenir l'ID
+                    if "RETURNING" in query:
+                        last_id = cursor.fetchone()[0]
+                        self._commit(connection)
+                        self.logger.debug(f"Query executed successfully")
+                        return last_id
+                    self._commit(connection)
                     self.logger.debug(f"Query executed successfully")
-                    return last_id
-                self.connection.commit()
-                self.logger.debug(f"Query executed successfully")
-        except Exception as e:
-            self.logger.error(f"Error executing query: {e}\n Query: {query}")
-            self.connection.rollback()
-            raise
+            except Exception as e:
+                self.logger.error(f"Error executing query: {e}\n Query: {query}")
+                self._rollback(connection)
+                raise
 
-    def fetch_one_with_column_names(self, query, params=None):
+    def fetch_one_with_column_names(self, query, params=None, prepare=False):
+        # Repeated lookups within one request are served from the request's identity map
+        cache_key = identity_map.make_key("fetch_one_with_column_names", query, params) if identity_map.is_read_statement(query) else None
+        cached = identity_map.get(cache_key)
+        if cached is not identity_map.MISSING:
+            return dict(cached) if cached else cached
         try:
-            with self.connection.cursor() as cur:
-                cur.execute(query, params)
+            with self.get_connection() as connection, connection.cursor() as cur:
+                self._execute(connection, cur, query, params, prepare)
 
                 # Get the column names
                 column_names = [desc[0] for desc in cur.description]
@@ -87,37 +473,76 @@ class PostgresDB:
                 if row:
                     # Combine column names with values
                     result = dict(zip(column_names, row))
+                    identity_map.put(cache_key, dict(result))
                     return result
                 else:
+                    identity_map.put(cache_key, None)
                     return None
         except Exception as e:
             print(f"Error executing query: {e}")
             return None
 
-    def fetch_one(self, query, params=None):
-        """Fetch a single result from a query."""
+    def fetch_one(self, query, params=None, prepare=False):
+        """Fetch a single result from a query; `prepare` reuses a server-side plan for hot queries."""
+        cache_key = identity_map.make_key("fetch_one", query, params) if identity_map.is_read_statement(query) else None
+        cached = identity_map.get(cache_key)
+        if cached is not identity_map.MISSING:
+            return cached
         try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(query, params)
+            with self.get_connection() as connection, connection.cursor() as cursor:
+                self._execute(connection, cursor, query, params, prepare)
                 result = cursor.fetchone()
                 self.logger.debug(f"Query executed successfully")
+                identity_map.put(cache_key, result)
                 return result
         except Exception as e:
             self.logger.error(f"Error fetching data: {e}\n Query: {query}")
             raise
 
-    def fetch_all(self, query, params=None):
-        try:
-            with self.connection.cursor() as cur:
-                if params:
-                    cur.execute(query, params)
-                else:
-                    cur.execute(query)
-                return cur.fetchall()
-        except Exception as e:
-            self.logger.error(f"Error fetching data: {e}\nQuery: {query}")
-            self.connection.rollback()  # Roll back the transaction
-            raise  # Re-raise the exception after rolling back
+    def fetch_all(self, query, params=None, prepare=False):
+        with self.get_connection() as connection:
+            try:
+                with connection.cursor() as cur:
+                    self._execute(connection, cur, query, params or None, prepare)
+                    return cur.fetchall()
+            except Exception as e:
+                self.logger.error(f"Error fetching data: {e}\nQuery: {query}")
+                self._rollback(connection)  # Roll back the transaction
+                raise  # Re-raise the exception after rolling back
+
+    def stream(self, query, params=None, batch_size=1000):
+        """
+        Iterate over the rows of a query through a server-side cursor, fetching `batch_size` rows at a time.
+        A pooled connection is held until the generator is exhausted or closed.
+        """
+        with self.get_connection() as connection:
+            in_transaction = self._in_transaction(connection)
+            if in_transaction:
+                self._flush_batch(connection)
+            else:
+                # Named cursors only live inside a transaction
+                connection.autocommit = False
+            try:
+                started_at = time.perf_counter()
+                row_count = 0
+                with connection.cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(query, params)
+                    for row in cursor:
+                        row_count += 1
+                        yield row
+                self._commit(connection)
+                # Includes the time the caller spent between batches, so streams only show up as slow when consumed slowly
+                if self.query_stats is not None:
+                    self.query_stats.record(query, time.perf_counter() - started_at, row_count)
+            except Exception as e:
+                self.logger.error(f"Error streaming data: {e}\nQuery: {query}")
+                raise
+            finally:
+                if not in_transaction:
+                    if connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                        connection.rollback()
+                    connection.autocommit = True
 
     def create_table(self, create_table_sql):
         """Create a table using the provided SQL statement."""
@@ -142,6 +567,57 @@ class PostgresDB:
         self.execute_query(query, values)
         self.logger.info(f"Inserted object into {table}")
 
+    def bulk_upsert(self, table, rows, conflict_cols, update_cols=None, returning=None, page_size=1000):
+        """
+        Insert many rows with a single multi-row INSERT ... ON CONFLICT statement per page.
+        :param table: Name of the table.
+        :param rows: List of dictionaries with the same keys (column names).
+        :param conflict_cols: Columns of the unique constraint to check for conflicts.
+        :param update_cols: Columns to overwrite on conflict; conflicting rows are skipped when omitted.
+        :param returning: Columns to return for the rows actually inserted or updated.
+        :return: The RETURNING rows, or an empty list.
+        """
+        if not rows:
+            return []
+
+        # A single statement cannot touch the same row twice, so keep the last row per conflict key.
+        # Keys containing NULL never conflict, so those rows are all kept.
+        unique_rows = {}
+        for position, row in enumerate(rows):
+            key = tuple(row[col] for col in conflict_cols)
+            unique_rows[(position,) if None in key else key] = row
+        columns = list(rows[0].keys())
+        values = [
+            tuple(json.dumps(row[col]) if isinstance(row[col], dict) else row[col] for col in columns)
+            for row in unique_rows.values()
+        ]
+
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s ON CONFLICT ({', '.join(conflict_cols)}) "
+        if update_cols:
+            query += "DO UPDATE SET " + ', '.join(f"{col} = EXCLUDED.{col}" for col in update_cols)
+        else:
+            query += "DO NOTHING"
+        if returning:
+            query += f" RETURNING {', '.join(returning)}"
+
+        identity_map.clear()
+        with self.get_connection() as connection:
+            try:
+                if self._in_transaction(connection):
+                    self._flush_batch(connection)
+                started_at = time.perf_counter()
+                with connection.cursor() as cursor:
+                    result = psycopg2.extras.execute_values(cursor, query, values, page_size=page_size, fetch=bool(returning))
+                if self.query_stats is not None:
+                    self.query_stats.record(query, time.perf_counter() - started_at, len(values))
+                self._commit(connection)
+                self.logger.info(f"Upserted {len(values)} rows into {table}")
+                return result or []
+            except Exception as e:
+                self.logger.error(f"Error upserting into {table}: {e}")
+                self._rollback(connection)
+                raise
+
     def update_object(self, table, data, condition):
         """
         Update an existing object (row) in the specified table.
@@ -182,18 +658,19 @@ class PostgresDB:
         self.execute_query(query, values)
         self.logger.info(f"Deleted object from {table} where {condition}")
 
-    def get_object(self, table, condition):
+    def get_object(self, table, condition, prepare=False):
         """
         Get an object (row) from the specified table.
         :param table: Name of the table.
         :param condition: Dictionary where keys are column names to match and values are the values to match.
+        :param prepare: Run the lookup as a prepared statement (for hot lookups).
         :return: The object (row) matching the condition, or None if not found.
         """
         where_clause = ' AND '.join([f"{k} = %s" for k in condition.keys()])
         values = tuple(condition.values())
 
         query = f"SELECT * FROM {table} WHERE {where_clause}"
-        result = self.fetch_one_with_column_names(query, values)
+        result = self.fetch_one_with_column_names(query, values, prepare=prepare)
         if result:
             self.logger.info(f"Found object in {table} where {condition}")
             return result
@@ -202,7 +679,8 @@ class PostgresDB:
             return None
 
     def close(self):
-        """Close the database connection."""
-        if self.connection:
-            self.connection.close()
-            self.logger.info("Database connection closed.")
+        """Close every connection in the pool."""
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
+            self.logger.info("Database connection pool closed.")
@@ -0,0 +1,113 @@
+import bisect
+import logging
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|\$\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryStats:
+    """
+    Per-statement call counts, latency histograms and row counts for PostgresDB, plus a slow-query log.
+    Statements are grouped by their normalized text, so the same query with different parameters is one entry.
+    """
+
+    def __init__(self, slow_query_ms=None, max_statements=500):
+        self.slow_query_ms = slow_query_ms if slow_query_ms is not None else float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+        self.max_statements = max_statements
+        self.logger = logging.getLogger(__name__)
+        self._statements = {}
+        self._normalized = OrderedDict()
+        self._lock = threading.Lock()
+
+    def normalize(self, query) -> str:
+        """Collapse whitespace and replace literals and placeholders with '?'."""
+        with self._lock:
+            normalized = self._normalized.get(query)
+            if normalized is not None:
+                self._normalized.move_to_end(query)
+                return normalized
+
+        normalized = _STRING_LITERAL.sub("?", query)
+        normalized = _PLACEHOLDER.sub("?", normalized)
+        normalized = _NUMBER_LITERAL.sub("?", normalized)
+        normalized = _WHITESPACE.sub(" ", normalized).strip()
+
+        with self._lock:
+            self._normalized[query] = normalized
+            if len(self._normalized) > self.max_statements * 4:
+                self._normalized.popitem(last=False)
+        return normalized
+
+    def record(self, query, duration, rows):
+        """
+        Record one execution of a query.
+        :param query: The SQL text as executed.
+        :param duration: Execution time in seconds.
+        :param rows: Rows returned or affected, or a negative value if unknown.
+        """
+        statement = self.normalize(query)
+        duration_ms = duration * 1000
+        with self._lock:
+            stats = self._statements.get(statement)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    return
+                stats = {
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+                self._statements[statement] = stats
+            stats["calls"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["rows"] += max(rows, 0)
+            stats["histogram"][bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+
+        if duration_ms >= self.slow_query_ms:
+            self.logger.warning(f"Slow query ({duration_ms:.1f} ms, {rows} rows) from {self._find_caller()}: {statement}")
+
+    @staticmethod
+    def _find_caller() -> str:
+        """Name the first frame outside the db layer, i.e. the manager method that issued the query."""
+        frame = sys._getframe(2)
+        while frame is not None:
+            filename = frame.f_code.co_filename.replace("\\", "/")
+            if "/app/db/" not in filename and not filename.endswith("contextlib.py"):
+                module = frame.f_globals.get("__name__", "?")
+                return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+            frame = frame.f_back
+        return "unknown"
+
+    def get_top_statements(self, limit=20, order_by="total_ms") -> list:
+        """Return the `limit` statements with the highest `order_by` value (total_ms, calls, max_ms or rows)."""
+        with self._lock:
+            snapshot = [(statement, dict(stats, histogram=list(stats["histogram"]))) for statement, stats in self._statements.items()]
+
+        snapshot.sort(key=lambda item: item[1][order_by], reverse=True)
+        top_statements = []
+        for statement, stats in snapshot[:limit]:
+            stats["statement"] = statement
+            stats["avg_ms"] = stats["total_ms"] / stats["calls"]
+            stats["histogram"] = {
+                (f"<={bound}ms" if i < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}ms"): count
+                for i, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), stats["histogram"]))
+            }
+            top_statements.append(stats)
+        return top_statements
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
@@ -3,7 +3,7 @@ import threading
 
 from flask_login import login_required
 from app import create_flask_app
-from flask import Blueprint, render_template, redirect, url_for, flash
+from flask import Blueprint, render_template, redirect, url_for, flash, g
 import logging
 from app.managers.currency_convertion_manager import CurrencyConversionManager
 from app.managers.messages_handler import MessageHandler
@@ -54,8 +54,10 @@ def truncate_title_filter(title, max_length=50):
 
 @app.context_processor
 def inject_role_manager():
-    role_manager = RoleManager()
-    return dict(role_manager=role_manager)
+    # Reuse one RoleManager for every template rendered during the request
+    if 'role_manager' not in g:
+        g.role_manager = RoleManager()
+    return dict(role_manager=g.role_manager)
 
 
 @app.route('/api/get_options/<field_key>', methods=['get'])
@@ -0,0 +1,114 @@
+import logging
+from app.db.db_utils import get_db
+from app.db.postgresdb import PostgresDB
+from app.models.api_response import APIResponse
+
+
+class FailedTaskManager:
+    def __init__(self):
+        """
+        Initialize the FailedTaskManager class with a PostgresDB instance.
+        Failed tasks are task queue messages quarantined after exhausting their attempts.
+        """
+        self.db: PostgresDB = get_db()
+        self.logger = logging.getLogger(__name__)
+
+    def add_failed_task(self, user_id, task_type, message_body, error, receive_count, queue_message_id=None) -> APIResponse:
+        """
+        Quarantine a task that could not be processed.
+        :param user_id: The ID of the user owning the task.
+        :param task_type: The type of the task, if it could be parsed.
+        :param message_body: The raw queue message body, kept so the task can be replayed.
+        :param error: Description of the last failure.
+        :param receive_count: How many times the message was received.
+        :param queue_message_id: The message ID assigned by the queue backend.
+        """
+        try:
+            failed_task_id = self.db.execute_query(
+                """
+                INSERT INTO failed_tasks (user_id, task_type, message_body, error, receive_count, queue_message_id)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING failed_task_id
+                """,
+                (user_id, task_type, message_body, error, receive_count, queue_message_id),
+            )
+            self.logger.warning(f"Quarantined {task_type} task for user {user_id} after {receive_count} attempts: {error}")
+            return APIResponse(status="success", message="Failed task stored successfully", data={"failed_task_id": failed_task_id})
+        except Exception as e:
+            self.logger.error(f"Failed to store failed task for user: {user_id}", exc_info=True)
+            return APIResponse(status="failure", message="Failed to store failed task")
+
+    def get_failed_tasks(self, user_id=None, limit=100) -> APIResponse:
+        """
+        List quarantined tasks, most recent first.
+        :param user_id: Only list the tasks of this user (optional).
+        :param limit: Maximum number of tasks to return.
+        """
+        try:
+            query = """
+            SELECT failed_task_id, user_id, task_type, message_body, error, receive_count, queue_message_id, failed_at
+            FROM failed_tasks
+            """
+            params = []
+            if user_id is not None:
+                query += " WHERE user_id = %s"
+                params.append(user_id)
+            query += " ORDER BY failed_at DESC LIMIT %s"
+            params.append(limit)
+
+            columns = ["failed_task_id", "user_id", "task_type", "message_body", "error", "receive_count", "queue_message_id", "failed_at"]
+            failed_tasks = [dict(zip(columns, row)) for row in self.db.fetch_all(query, tuple(params))]
+            return APIResponse(status="success", message="Failed tasks retrieved successfully", data=failed_tasks)
+        except Exception as e:
+            self.logger.error("Failed to retrieve failed tasks", exc_info=True)
+            return APIResponse(status="failure", message="Failed to retrieve failed tasks")
+
+    def get_failed_task(self, failed_task_id) -> APIResponse:
+        """
+        Get a single quarantined task.
+        :param failed_task_id: The ID of the failed task.
+        """
+        try:
+            failed_task = self.db.get_object('failed_tasks', {'failed_task_id': failed_task_id})
+            if failed_task is None:
+                return APIResponse(status="failure", message="Failed task not found")
+            return APIResponse(status="success", message="Failed task retrieved successfully", data=failed_task)
+        except Exception as e:
+            self.logger.error(f"Failed to retrieve failed task: {failed_task_id}", exc_info=True)
+            return APIResponse(status="failure", message="Failed to retrieve failed task")
+
+    def delete_failed_task(self, failed_task_id) -> APIResponse:
+        """
+        Remove a quarantined task, after it was replayed or discarded.
+        :param failed_task_id: The ID of the failed task.
+        """
+        try:
+            self.db.delete_object('failed_tasks', {'failed_task_id': failed_task_id})
+            self.logger.info(f"Deleted failed task: {failed_task_id}")
+            return APIResponse(status="success", message="Failed task deleted successfully")
+        except Exception as e:
+            self.logger.error(f"Failed to delete failed task: {failed_task_id}", exc_info=True)
+            return APIResponse(status="failure", message="Failed to delete failed task")
+
+    def create_table(self) -> APIResponse:
+        """Create the failed_tasks table if it doesn't exist."""
+        try:
+            create_table_query = """
+            CREATE TABLE IF NOT EXISTS failed_tasks (
+                failed_task_id SERIAL PRIMARY KEY,
+                user_id INTEGER,
+                task_type VARCHAR(100),
+                message_body TEXT NOT NULL,
+                error TEXT,
+                receive_count INTEGER NOT NULL DEFAULT 0,
+                queue_message_id VARCHAR(128),
+                failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_failed_tasks_user_id ON failed_tasks (user_id, failed_at);
+            """
+            self.db.create_table(create_table_query)
+            self.logger.info("Created failed_tasks table successfully")
+            return APIResponse(status="success", message="Failed tasks table created successfully")
+        except Exception as e:
+            self.logger.error("Failed to create failed_tasks table", exc_info=True)
+            return APIResponse(status="failure", message="Failed to create failed tasks table")
@@ -1,10 +1,16 @@
+import base64
 import hashlib
+import json
 import logging
+import re
+import socket
+import threading
 from datetime import datetime, timezone
 import os
 from typing import Dict, List
 
 from flask_login import current_user
+import psycopg2.errors
 import requests
 from app.db.postgresdb import PostgresDB
 from app.managers.currency_convertion_manager import CurrencyConversionManager
@@ -14,6 +20,15 @@ from app.db.db_utils import get_db
 from enum import Enum, auto
 
 
+# Columns indexed by job_details.search_vector (db_migrations/003)
+FULL_TEXT_SEARCH_COLUMNS = ('job_title', 'job_description')
+
+# Columns of a job export; search_vector, change_seq and the processing claim columns are internal
+JOB_EXPORT_COLUMNS = (
+    'job_id', 'job_title', 'job_description', 'budget', 'email_date', 'gemini_results', 'job_fit',
+    'status', 'status_id', 'performance_metrics', 'created_at', 'last_updated_at',
+)
+
 job_status = [
     {"id": 1, "name": "New", "color": "green"},
     {"id": 2, "name": "In Progress", "color": "yellow"},
@@ -94,13 +109,50 @@ class JobManager:
 
     def get_job_by_id(self, job_id):
         try:
-            job_detail = self.db.get_object("job_details", {"job_id": job_id})
+            job_detail = self.db.get_object("job_details", {"job_id": job_id}, prepare=True)
             self.logger.info(f"Retrieved job {job_id}")
             return APIResponse(status="success", message="Job retrieved successfully", data=job_detail)
         except Exception as e:
             self.logger.error(f"Failed to retrieve job {job_id}", exc_info=True)
             return APIResponse(status="failure", message="Failed to retrieve job")
 
+    def claim_job_for_processing(self, job_id, claimed_by=None, stale_after_seconds=None) -> APIResponse:
+        """
+        Atomically claim a job for one worker, so duplicate process_job tasks do not repeat the work.
+        The claim fails if the job already has Gemini results or another worker claimed it recently;
+        claims older than `stale_after_seconds` are treated as abandoned by a crashed worker.
+        The claim is released when the processing result is stored (see release_job_claim).
+        """
+        if claimed_by is None:
+            claimed_by = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        if stale_after_seconds is None:
+            stale_after_seconds = int(os.getenv('JOB_PROCESSING_CLAIM_TIMEOUT', '900'))
+        try:
+            result = self.db.fetch_one(
+                """
+                UPDATE job_details
+                SET claimed_by = %s, claimed_at = NOW()
+                WHERE job_id = %s
+                  AND (gemini_results IS NULL OR gemini_results = '{}'::jsonb)
+                  AND (claimed_at IS NULL OR claimed_at < NOW() - make_interval(secs => %s))
+                RETURNING job_id
+                """,
+                (claimed_by, job_id, stale_after_seconds),
+            )
+            claimed = result is not None
+            self.logger.info(f"Job {job_id} {'claimed by ' + claimed_by if claimed else 'already processed or claimed'}")
+            return APIResponse(status="success", message="Job claim checked successfully", data={"claimed": claimed})
+        except Exception as e:
+            self.logger.error(f"Failed to claim job {job_id}", exc_info=True)
+            return APIResponse(status="failure", message="Failed to claim job")
+
+    @staticmethod
+    def release_job_claim(job_data):
+        """Clear the processing claim of a job dict, so the update storing the result also releases the job."""
+        job_data["claimed_by"] = None
+        job_data["claimed_at"] = None
+        return job_data
+
     def apply_for_job(self, job_id, user_id) -> APIResponse:
         """Apply for a job."""
         try:
@@ -167,6 +219,103 @@ class JobManager:
             self.logger.error(f"Failed to retrieve job applications for user {user_id}", exc_info=True)
             return APIResponse(status="failure", message="Failed to retrieve user job applications")
 
+    @staticmethod
+    def encode_page_cursor(sort_column, sort_order, search_value, next_start, last_job) -> str:
+        """Encode the position after `last_job` as an opaque cursor for the next page."""
+        value = last_job[sort_column]
+        value_type = "datetime" if isinstance(value, datetime) else None
+        position = {
+            "c": sort_column,
+            "o": sort_order,
+            "s": search_value or "",
+            "n": next_start,
+            "v": value.isoformat() if value_type else value,
+            "t": value_type,
+            "id": last_job["job_id"],
+        }
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    @staticmethod
+    def decode_page_cursor(cursor):
+        """Decode a cursor built by encode_page_cursor, or return None if it is malformed."""
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if position["t"] == "datetime":
+                position["v"] = datetime.fromisoformat(position["v"])
+            return position
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    @staticmethod
+    def to_prefix_tsquery(search_value):
+        """
+        Turn free text into a tsquery matching jobs that contain every word, the last one as a prefix
+        so results narrow while the user types. Returns None if the text has no words.
+        """
+        words = re.findall(r"\w+", search_value)
+        if not words:
+            return None
+        return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+    def has_search_lexemes(self, search_query) -> bool:
+        """
+        Check that the text search configuration keeps at least one word of a tsquery. Stop words are dropped,
+        so a query made only of them ("the", "and") is empty and would match nothing.
+        """
+        return self.db.fetch_one("SELECT numnode(to_tsquery('english', %s)) > 0", (search_query,), prepare=True)[0]
+
+    def search_jobs(self, user_id, search_value, limit=20) -> APIResponse:
+        """
+        Full-text search of a user's jobs, best matches first.
+        Title matches rank above description matches (see db_migrations/003).
+        Text made only of stop words is matched with LIKE instead, newest jobs first.
+        """
+        try:
+            search_query = self.to_prefix_tsquery(search_value or "")
+            if not search_query:
+                return APIResponse(status="success", message="No search terms", data=[])
+
+            if self.has_search_lexemes(search_query):
+                results = self.db.fetch_all(
+                    """
+                    SELECT job_id, job_title, budget, status, job_fit, created_at,
+                           ts_rank_cd(search_vector, query) AS rank
+                    FROM job_details, to_tsquery('english', %s) AS query
+                    WHERE user_id = %s AND search_vector @@ query
+                    ORDER BY rank DESC, job_id
+                    LIMIT %s
+                    """,
+                    (search_query, user_id, limit),
+                )
+            else:
+                pattern = f"%{search_value}%"
+                results = self.db.fetch_all(
+                    """
+                    SELECT job_id, job_title, budget, status, job_fit, created_at, 0.0 AS rank
+                    FROM job_details
+                    WHERE user_id = %s AND (job_title LIKE %s OR job_description LIKE %s)
+                    ORDER BY created_at DESC, job_id
+                    LIMIT %s
+                    """,
+                    (user_id, pattern, pattern, limit),
+                )
+            columns = ["job_id", "job_title", "budget", "status", "job_fit", "created_at", "rank"]
+            jobs = [dict(zip(columns, row)) for row in results]
+            self.logger.info(f"Found {len(jobs)} jobs for user {user_id} matching '{search_value}'")
+            return APIResponse(status="success", message="Jobs searched successfully", data=jobs)
+        except Exception as e:
+            self.logger.error(f"Failed to search jobs for user {user_id}", exc_info=True)
+            return APIResponse(status="failure", message="Failed to search jobs")
+
+    def get_user_job_count(self, user_id) -> int:
+        """Number of jobs of a user, read from the counter maintained by triggers on job_details."""
+        try:
+            result = self.db.fetch_one("SELECT job_count FROM user_job_counts WHERE user_id = %s", (user_id,), prepare=True)
+            return result[0] if result else 0
+        except psycopg2.errors.UndefinedTable:
+            # db_migrations/002 not applied yet
+            return self.db.fetch_one("SELECT COUNT(*) FROM job_details WHERE user_id = %s", (user_id,))[0]
+
     def get_jobs_for_user(
         self,
         user_id,
@@ -177,9 +326,15 @@ class JobManager:
         search_value: str = None,
         columns: List[Dict[str, str]] = None,
         searchable_columns: List[str] = None,
+        cursor: str = None,
     ) -> APIResponse:
-        """Get jobs for a user with start and length parameters for pagination."""
+        """
+        Get jobs for a user with start and length parameters for pagination.
+        When `cursor` is the next_cursor returned for the previous page (same sort and search), the page is
+        read by seeking past the last row of that page instead of skipping `start` rows with OFFSET.
+        """
         try:
+            start = start or 0
             if not columns:
                 columns = [{'data': 'job_id'}]  # Fallback to at least select job_id
 
@@ -190,8 +345,8 @@ class JobManager:
             if sort_order not in ['ASC', 'DESC']:
                 sort_order = 'DESC'
 
-            # Construct SELECT part of the query
-            select_columns = ', '.join(valid_columns)
+            # Construct SELECT part of the query; job_id identifies the rows and breaks ties between equal sort values
+            select_columns = ', '.join(valid_columns + ([] if 'job_id' in valid_columns else ['job_id']))
 
             # Base query
             query = f"""
@@ -202,55 +357,95 @@ class JobManager:
             query_params = [user_id]
 
             # Add search functionality if search_value is provided
+            search_conditions = []
             if search_value and searchable_columns:
-                search_conditions = []
+                search_query = self.to_prefix_tsquery(search_value)
+                # Without words left for the index (e.g. only stop words), the indexed columns are matched with LIKE
+                full_text = (
+                    search_query is not None
+                    and any(column in FULL_TEXT_SEARCH_COLUMNS for column in searchable_columns)
+                    and self.has_search_lexemes(search_query)
+                )
+                if full_text:
+                    search_conditions.append("search_vector @@ to_tsquery('english', %s)")
+                    query_params.append(search_query)
                 for column in searchable_columns:
-                    if column in valid_columns:
+                    if column in valid_columns and not (full_text and column in FULL_TEXT_SEARCH_COLUMNS):
                         search_conditions.append(f"{column} LIKE %s")
                         query_params.append(f"%{search_value}%")
                 if search_conditions:
                     query += " AND (" + " OR ".join(search_conditions) + ")"
+            filtered_params = list(query_params)
+            filtered_query = query
+
+            position = self.decode_page_cursor(cursor) if cursor else None
+            if position and (position["c"], position["o"], position["s"], position["n"]) != (
+                sort_column, sort_order, search_value or "", start
+            ):
+                position = None
+
+            if position:
+                # Seek past the last row of the previous page; NULLs sort last in ascending order, first in descending
+                if sort_order == 'ASC':
+                    query += f" AND (({sort_column}, job_id) > (%s, %s) OR {sort_column} IS NULL)"
+                else:
+                    query += f" AND ({sort_column}, job_id) < (%s, %s)"
+                query_params.extend([position["v"], position["id"]])
+                query += f" ORDER BY {sort_column} {sort_order}, job_id {sort_order} LIMIT %s"
+                query_params.append(length)
+            else:
+                query += f" ORDER BY {sort_column} {sort_order}, job_id {sort_order} LIMIT %s OFFSET %s"
+                query_params.extend([length, start])
 
-            # Add sorting
-            query += f" ORDER BY {sort_column} {sort_order}"
-
-            # Add pagination
-            query += " LIMIT %s OFFSET %s"
-            query_params.extend([length, start])
-
-            # Execute the query
+            total_jobs = self.get_user_job_count(user_id)
 
-            # Query to get total jobs (without pagination and search)
-            total_jobs = self.db.fetch_one("SELECT COUNT(*) FROM job_details WHERE user_id = %s", (user_id,))[0]
+            # Without a search every job of the user matches, so only count when filtering
+            if search_conditions:
+                filtered_jobs = self.db.fetch_one(
+                    f"SELECT COUNT(*) FROM ({filtered_query}) AS filtered_jobs", tuple(filtered_params)
+                )[0]
+            else:
+                filtered_jobs = total_jobs
 
-            # Query to get filtered jobs count (with search, without pagination)
-            filtered_query = query.split(' LIMIT ')[0]
-            filtered_params = query_params[:-2]  # Remove LIMIT and OFFSET parameters
-            filtered_jobs = self.db.fetch_one(
-                f"SELECT COUNT(*) FROM ({filtered_query}) AS filtered_jobs", tuple(filtered_params)
-            )[0]
             results = self.db.fetch_all(query, tuple(query_params))
             # Construct jobs list based on the columns provided
             jobs = []
             for row in results:
                 job = {}
-                for i, column in enumerate(valid_columns):
+                for i, column in enumerate(select_columns.split(', ')):
                     job[column] = row[i]
                 jobs.append(job)
 
+            next_cursor = None
+            if len(jobs) == length and jobs[-1][sort_column] is not None:
+                next_cursor = self.encode_page_cursor(sort_column, sort_order, search_value, start + length, jobs[-1])
+
             data = {
                 "jobs": jobs,
                 "recordsTotal": total_jobs,
                 "recordsFiltered": filtered_jobs,
+                "next_cursor": next_cursor,
             }
 
-            self.logger.info(f"Retrieved {len(jobs)} jobs for user {user_id} starting at {start} with length {length}")
+            self.logger.info(
+                f"Retrieved {len(jobs)} jobs for user {user_id} starting at {start} with length {length}"
+                f"{' (keyset)' if position else ''}"
+            )
             return APIResponse(status="success", message="User jobs retrieved successfully", data=data)
 
         except Exception as e:
             self.logger.error(f"Failed to retrieve jobs for user {user_id}", exc_info=True)
             return APIResponse(status="failure", message="Failed to retrieve user jobs")
 
+    def stream_jobs_for_user(self, user_id):
+        """
+        Yield every job of a user as a dict, oldest first. Rows are read through a server-side cursor, so memory
+        stays flat however many jobs the user has; the generator holds a database connection until it is exhausted.
+        """
+        query = f"SELECT {', '.join(JOB_EXPORT_COLUMNS)} FROM job_details WHERE user_id = %s ORDER BY created_at, job_id"
+        for row in self.db.stream(query, (user_id,)):
+            yield dict(zip(JOB_EXPORT_COLUMNS, row))
+
     def fetch_and_store_jobs(self) -> APIResponse:
         """Fetch jobs from Freelancer API and store them in the database."""
         try:
@@ -281,7 +476,7 @@ class JobManager:
             if response.status_code == 200 and freelancer_data.get('status') == 'success':
                 projects = freelancer_data['result']['projects']
                 currency_conversion = CurrencyConversionManager()
-                job_list = []
+                jobs_data = []
                 for project in projects:
                     # Convert budget to user's currency
                     converted_budget = currency_conversion.convert_budget(
@@ -305,9 +500,12 @@ class JobManager:
                         'status_id': 1,  # Default status for new jobs
                     }
                     project["is_new"] = False
-                    if self.get_job_by_id(job_id).data is None:
-                        self.add_new_job(job_data)
-                        job_list.append(job_data)
+                    jobs_data.append(job_data)
+
+                # Store the whole fetch in one statement; RETURNING only lists the jobs that were new
+                new_job_ids = {row[0] for row in self.db.bulk_upsert("job_details", jobs_data, ["job_id"], returning=["job_id"])}
+                jobs_by_id = {job_data['job_id']: job_data for job_data in jobs_data}
+                job_list = [job_data for job_id, job_data in jobs_by_id.items() if job_id in new_job_ids]
 
                 self.logger.info(f"Successfully fetched and stored {len(projects)} jobs for user {current_user.user_id}.")
                 return APIResponse(status="success", message="Jobs fetched and stored successfully", data=job_list)
@@ -321,20 +519,50 @@ class JobManager:
             self.logger.error(f"Error while fetching and storing jobs: {str(e)}", exc_info=True)
             return APIResponse(status="failure", message="Error while fetching and storing jobs")
 
-    def poll_updates_for_user(self, user_id, last_sync) -> APIResponse:
-        """Poll for updates for a user."""
+    @staticmethod
+    def decode_change_cursor(cursor):
+        """Return the snapshot ("xmin:xmax:xip,...") stored in a change feed cursor, or None if it is malformed."""
+        try:
+            snapshot = base64.urlsafe_b64decode(cursor.encode()).decode()
+        except (ValueError, AttributeError):
+            return None
+        return snapshot if re.fullmatch(r"\d+:\d+:(\d+(,\d+)*)?", snapshot) else None
+
+    def poll_updates_for_user(self, user_id, last_sync=None, cursor=None) -> APIResponse:
+        """
+        Poll for updates for a user.
+        With `cursor`, the cursor returned by the previous poll, only jobs written by transactions that the previous
+        poll could not see yet are returned, so no update is missed or sent twice whatever the commit order.
+        `last_sync` (a timestamp) starts a feed for clients that have no cursor yet.
+        Returns the updated jobs and the cursor for the next poll.
+        """
         try:
-            # Query jobs updated after last_sync
+            # The snapshot of this very statement tells the next poll which writes were already visible
             query = """
-            SELECT job_id, status, job_fit 
-                FROM job_details 
-                WHERE last_updated_at > %s and user_id = %s
+            SELECT pg_current_snapshot()::text, job.job_id, job.status, job.job_fit
+            FROM (SELECT 1) AS poll
+            LEFT JOIN job_details AS job ON job.user_id = %s
             """
-            results = self.db.fetch_all(query, (last_sync, user_id))
+            params = [user_id]
+            snapshot = self.decode_change_cursor(cursor) if cursor else None
+            if snapshot:
+                # Transactions before the snapshot's xmin were all visible to it, later ones may not have been
+                query += " AND job.change_seq >= %s AND NOT pg_visible_in_snapshot(job.change_seq::text::xid8, %s::pg_snapshot)"
+                params.extend([int(snapshot.split(':')[0]), snapshot])
+            elif last_sync is not None:
+                query += " AND job.last_updated_at > %s"
+                params.append(last_sync)
+            else:
+                return APIResponse(status="failure", message="Missing or invalid cursor")
+
+            results = self.db.fetch_all(query, tuple(params))
             # Prepare job data for JSON response
-            job_data = [{'job_id': job[0], 'status': job[1], 'job_fit': job[2]} for job in results]
+            job_data = [{'job_id': job[1], 'status': job[2], 'job_fit': job[3]} for job in results if job[1] is not None]
+            next_cursor = base64.urlsafe_b64encode(results[0][0].encode()).decode()
 
-            return APIResponse(status="success", message="Updates polled successfully", data=job_data)
+            return APIResponse(
+                status="success", message="Updates polled successfully", data={"jobs": job_data, "cursor": next_cursor}
+            )
         except Exception as e:
             self.logger.error(f"Failed to poll updates for user {user_id}", exc_info=True)
             return APIResponse(status="failure", message="Failed to poll updates")
@@ -86,7 +86,7 @@ class RoleManager:
             JOIN roles r ON ur.role_id = r.role_id
             WHERE ur.user_id = %s
             """
-            roles = [row[0] for row in self.db.fetch_all(query, (user_id,))]
+            roles = [row[0] for row in self.db.fetch_all(query, (user_id,), prepare=True)]
             self.logger.info(f"Roles retrieved for user with ID {user_id}: {', '.join(roles)}")
             return APIResponse(status="success", message="Roles retrieved successfully", data=roles)
         except Exception as e:
@@ -100,7 +100,7 @@ class RoleManager:
             role_id = self._get_role_id_by_name(role_name)
             if role_id:
                 result = self.db.fetch_one(
-                    "SELECT COUNT(*) FROM user_roles WHERE user_id = %s AND role_id = %s", (user_id, role_id)
+                    "SELECT COUNT(*) FROM user_roles WHERE user_id = %s AND role_id = %s", (user_id, role_id), prepare=True
                 )
                 has_role = result[0] > 0
                 self.logger.info(f"User with ID {user_id} {'has' if has_role else 'does not have'} role '{role_name}'")
@@ -181,10 +181,11 @@ class RoleManager:
         try:
             role_id = self._get_role_id_by_name(role_name)
             if role_id:
-                # First, delete the role assignments from user_roles
-                self.db.execute_query("DELETE FROM user_roles WHERE role_id = %s", (role_id,))
-                # Then, delete the role itself
-                self.db.execute_query("DELETE FROM roles WHERE role_id = %s", (role_id,))
+                with self.db.batch():
+                    # First, delete the role assignments from user_roles
+                    self.db.execute_query("DELETE FROM user_roles WHERE role_id = %s", (role_id,))
+                    # Then, delete the role itself
+                    self.db.execute_query("DELETE FROM roles WHERE role_id = %s", (role_id,))
                 self.logger.info(f"Role '{role_name}' deleted successfully")
                 return APIResponse(status="success", message=f"Role '{role_name}' deleted successfully")
             else:
@@ -211,5 +212,5 @@ class RoleManager:
 
     def _get_role_id_by_name(self, role_name):
         """Helper function to get role_id by role_name."""
-        role = self.db.fetch_one("SELECT role_id FROM roles WHERE role_name = %s", (role_name,))
+        role = self.db.fetch_one("SELECT role_id FROM roles WHERE role_name = %s", (role_name,), prepare=True)
         return role[0] if role else None
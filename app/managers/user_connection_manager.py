@@ -1,37 +1,237 @@
 import logging
 import asyncio
+import os
+from collections import deque
+
+import websockets
+
 from app.models.api_response import APIResponse
 
+# What QueuedConnection.send does when a client's send queue is full
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest', 'close')
+
+
+def _default_send_timeout() -> float:
+    return float(os.getenv('WEBSOCKET_SEND_TIMEOUT', '10'))
+
+
+class QueuedConnection:
+    """
+    Wraps a websocket so sending never waits on a slow client: messages go to a bounded per-connection queue,
+    drained by a writer task that only exists while the queue is not empty, so idle connections cost no task.
+    When the queue is full the overflow policy applies:
+    block waits up to send_timeout for room (then closes), drop_oldest/drop_newest discard a message,
+    close disconnects the client, which reconnects and resyncs.
+    """
+
+    def __init__(self, websocket, max_queue=None, overflow_policy=None, send_timeout=None):
+        self.websocket = websocket
+        self.max_queue = max_queue or int(os.getenv('WEBSOCKET_SEND_QUEUE_SIZE', '64'))
+        self.overflow_policy = overflow_policy or os.getenv('WEBSOCKET_OVERFLOW_POLICY', 'drop_oldest')
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown websocket overflow policy: {self.overflow_policy}")
+        self.send_timeout = send_timeout if send_timeout is not None else _default_send_timeout()
+        self.dropped = 0
+        self.closed = False
+        self._queue = deque()
+        self._writer = None
+        self._space_available = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def send(self, message) -> bool:
+        """Queue a message for the client. Returns False if it was dropped or the connection was closed."""
+        if self.closed:
+            return False
+        if len(self._queue) >= self.max_queue:
+            if self.overflow_policy == 'drop_newest':
+                self.dropped += 1
+                return False
+            if self.overflow_policy == 'drop_oldest':
+                self._queue.popleft()
+                self.dropped += 1
+            elif self.overflow_policy == 'close':
+                await self._close_slow_client()
+                return False
+            elif not await self._wait_for_space():
+                await self._close_slow_client()
+                return False
+
+        self._queue.append(message)
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._drain())
+        return True
+
+    async def _wait_for_space(self) -> bool:
+        """Wait until the writer made room in the queue, or the send timeout elapsed."""
+        if self._space_available is None:
+            self._space_available = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.send_timeout
+        while len(self._queue) >= self.max_queue:
+            self._space_available.clear()
+            try:
+                await asyncio.wait_for(self._space_available.wait(), timeout=max(0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _drain(self):
+        try:
+            while self._queue:
+                message = self._queue.popleft()
+                if self._space_available is not None:
+                    self._space_available.set()
+                # Waits while more than the server's write_limit is buffered for this client
+                await self.websocket.send(message)
+        except websockets.ConnectionClosed:
+            self._queue.clear()
+        except Exception as e:
+            self.logger.error(f"Error sending websocket message: {e}")
+            self._queue.clear()
+        finally:
+            self._writer = None
+
+    async def _close_slow_client(self):
+        self.logger.warning(f"Closing websocket of slow client {self.websocket.remote_address} ({self.dropped} messages dropped)")
+        self.closed = True
+        self._queue.clear()
+        # 1013: try again later
+        await self.websocket.close(code=1013, reason="Send queue overflow")
+
+    async def recv(self):
+        return await self.websocket.recv()
+
+    async def ping(self):
+        return await self.websocket.ping()
+
+    async def close(self, code=1000, reason=""):
+        self.closed = True
+        await self.websocket.close(code=code, reason=reason)
+
+
+def _consume_pong_error(pong_waiter):
+    # A connection closing fails its pending pings; nobody awaits them, so read the error to keep asyncio quiet
+    if not pong_waiter.cancelled():
+        pong_waiter.exception()
+
+
+class HeartbeatWheel:
+    """
+    Pings every registered connection once per `interval` from a single task, instead of one sleeping task
+    per connection. Connections are dealt round-robin into `slots` buckets and each tick visits only the next
+    bucket, so finding the due connections is O(1) per tick and the pings are spread evenly over the interval,
+    even when thousands of clients reconnect at once.
+    A connection that has not answered the previous ping when its bucket comes round again is reported dead.
+    """
+
+    def __init__(self, on_dead, interval=None, slots=None):
+        self.on_dead = on_dead
+        self.interval = interval or float(os.getenv('WEBSOCKET_PING_INTERVAL', '20'))
+        self.slots = [set() for _ in range(slots or int(os.getenv('WEBSOCKET_HEARTBEAT_SLOTS', '20')))]
+        self.tick = self.interval / len(self.slots)
+        self._position = 0
+        self._next_slot = 0
+        self._slot_of = {}
+        self._pong_waiters = {}
+        self._task = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def add(self, connection):
+        # Consecutive connections go to consecutive buckets, so a burst of connections is spread over the interval
+        index = self._next_slot
+        self._next_slot = (self._next_slot + 1) % len(self.slots)
+        self.slots[index].add(connection)
+        self._slot_of[connection] = index
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def discard(self, connection):
+        index = self._slot_of.pop(connection, None)
+        if index is not None:
+            self.slots[index].discard(connection)
+        self._pong_waiters.pop(connection, None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            self._position = (self._position + 1) % len(self.slots)
+            due = list(self.slots[self._position])
+            if due:
+                await asyncio.gather(*(self._check(connection) for connection in due))
+
+    async def _check(self, connection):
+        pong_waiter = self._pong_waiters.get(connection)
+        if pong_waiter is not None and not pong_waiter.done():
+            self.logger.warning("No pong received within a heartbeat interval, dropping connection")
+            await self._drop(connection)
+            return
+        try:
+            pong_waiter = await connection.ping()
+            pong_waiter.add_done_callback(_consume_pong_error)
+            self._pong_waiters[connection] = pong_waiter
+        except Exception as e:
+            self.logger.debug(f"Heartbeat ping failed: {e}")
+            await self._drop(connection)
+
+    async def _drop(self, connection):
+        self.discard(connection)
+        try:
+            await self.on_dead(connection)
+        except Exception as e:
+            self.logger.error(f"Error dropping dead connection: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
 class UserConnectionManager:
-    def __init__(self):
+    """
+    Registry of the open websocket connections of each user; a user has one connection per open tab or device.
+    """
+
+    def __init__(self, heartbeat_interval=None):
         self.active_connections = {}
-        self.heartbeats = {}
+        self._users = {}
+        self._closing = set()
+        self.heartbeat = HeartbeatWheel(self._on_dead_connection, interval=heartbeat_interval)
+        # Longer than the send timeout, so the 'block' overflow policy gives up and closes the slow client first
+        self.broadcast_timeout = float(os.getenv('WEBSOCKET_BROADCAST_TIMEOUT', str(_default_send_timeout() + 1)))
         self.logger = logging.getLogger(self.__class__.__name__)
 
     async def add_connection(self, user_id, connection) -> APIResponse:
         """
-        Adds a connection and starts heartbeat management.
+        Adds a connection of the user and registers it with the heartbeat.
         """
         try:
-            self.active_connections[user_id] = connection
-            self.heartbeats[user_id] = asyncio.create_task(self.heartbeat(user_id))
-            self.logger.info(f"User {user_id} connected.")
+            self.active_connections.setdefault(user_id, set()).add(connection)
+            self._users[connection] = user_id
+            self.heartbeat.add(connection)
+            self.logger.info(f"User {user_id} connected ({len(self.active_connections[user_id])} connections).")
             return APIResponse(status="success", message=f"User {user_id} connected successfully.")
         except Exception as e:
             self.logger.error(f"Error adding connection for {user_id}: {e}")
             return APIResponse(status="failure", message=f"Failed to connect user {user_id}.")
 
-    async def remove_connection(self, user_id) -> APIResponse:
+    async def remove_connection(self, user_id, connection=None) -> APIResponse:
         """
-        Removes the user's connection and stops heartbeat tracking.
+        Removes one connection of the user, or all of them when `connection` is omitted.
         """
         try:
-            if user_id in self.active_connections:
-                del self.active_connections[user_id]
-            if user_id in self.heartbeats:
-                self.heartbeats[user_id].cancel()
-                del self.heartbeats[user_id]
-            self.logger.info(f"User {user_id} disconnected.")
+            connections = self.active_connections.get(user_id, set())
+            removed = [connection] if connection is not None else list(connections)
+            for removed_connection in removed:
+                connections.discard(removed_connection)
+                self._users.pop(removed_connection, None)
+                self.heartbeat.discard(removed_connection)
+            if not connections:
+                self.active_connections.pop(user_id, None)
+            self.logger.info(f"User {user_id} disconnected ({len(connections)} connections left).")
             return APIResponse(status="success", message=f"User {user_id} disconnected successfully.")
         except Exception as e:
             self.logger.error(f"Error removing connection for {user_id}: {e}")
@@ -39,24 +239,50 @@ class UserConnectionManager:
 
     async def is_connected(self, user_id) -> APIResponse:
         """
-        Checks if a user is currently connected.
+        Checks if a user currently has at least one connection.
         """
         connected = user_id in self.active_connections
         message = f"User {user_id} is {'connected' if connected else 'not connected'}."
-        self.logger.info(message)
+        self.logger.debug(message)
         return APIResponse(status="success", message=message, data={"connected": connected})
 
-    async def heartbeat(self, user_id):
+    async def broadcast(self, user_id, message) -> APIResponse:
         """
-        Heartbeat mechanism to ensure user remains connected.
+        Send a message to every connection of the user concurrently; a slow socket only delays its own
+        delivery, up to the broadcast timeout.
         """
-        while user_id in self.active_connections:
-            try:
-                connection = self.active_connections[user_id]
-                await connection.ping()  # Assume the connection has a ping method
-                self.logger.debug(f"Heartbeat sent to user {user_id}.")
-                await asyncio.sleep(10)  # Heartbeat interval
-            except Exception as e:
-                self.logger.error(f"Heartbeat failed for user {user_id}: {e}")
-                await self.remove_connection(user_id)
-                break
+        connections = list(self.active_connections.get(user_id, ()))
+        if not connections:
+            return APIResponse(status="success", message=f"User {user_id} is not connected.", data={"delivered": 0})
+
+        results = await asyncio.gather(
+            *(asyncio.wait_for(connection.send(message), timeout=self.broadcast_timeout) for connection in connections),
+            return_exceptions=True,
+        )
+        delivered = 0
+        for connection, result in zip(connections, results):
+            if isinstance(result, asyncio.TimeoutError):
+                # A client too slow to take the message would miss it silently; disconnect it so it resyncs
+                self.logger.warning(f"Timed out sending to a connection of user {user_id}, closing it")
+                self._close_in_background(connection, 1013, "Send timeout")
+            elif isinstance(result, Exception):
+                self.logger.warning(f"Failed to send message to a connection of user {user_id}: {result!r}")
+            elif result is not False:
+                delivered += 1
+        return APIResponse(status="success", message=f"Message sent to user {user_id}.", data={"delivered": delivered})
+
+    async def _on_dead_connection(self, connection):
+        user_id = self._users.get(connection)
+        if user_id is not None:
+            await self.remove_connection(user_id, connection)
+        # Closing a dead socket waits for the close timeout, don't hold up the heartbeat tick meanwhile
+        self._close_in_background(connection, 1011, "Heartbeat timeout")
+
+    def _close_in_background(self, connection, code, reason):
+        close_task = asyncio.create_task(connection.close(code=code, reason=reason))
+        self._closing.add(close_task)
+        close_task.add_done_callback(self._closing.discard)
+
+    async def close(self):
+        """Stop the heartbeat; the server closes the connections themselves."""
+        await self.heartbeat.stop()
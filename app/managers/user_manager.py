@@ -124,7 +124,7 @@ class UserManager(UserMixin):
         self.logger.info(f"Retrieving user with ID: {user_id}")
         try:
             query = "SELECT user_id, email, is_active, email_verified, last_login FROM users WHERE user_id = %s"
-            result = self.db.fetch_one(query, (user_id,))
+            result = self.db.fetch_one(query, (user_id,), prepare=True)
             if result:
                 user = User(
                     user_id=result[0], email=result[1], is_active=result[2], email_verified=result[3], last_login=result[4]
@@ -202,6 +202,15 @@ class UserManager(UserMixin):
             self.logger.error(f"Password reset failed for {email}: {str(e)}", exc_info=True)
             return APIResponse(status="failure", message=f"Password reset failed for {email}: {str(e)}")
 
+    def stream_all_users(self, show_inactive=False):
+        """Yield users one at a time through a server-side cursor, optionally including inactive ones."""
+        if not show_inactive:
+            query = "SELECT user_id, email, created_at FROM users WHERE is_active = TRUE"
+        else:
+            query = "SELECT user_id, email, created_at FROM users"
+        for row in self.db.stream(query):
+            yield {'user_id': row[0], 'email': row[1], 'created_at': row[2]}
+
     def get_all_users(self, show_inactive=False) -> APIResponse:
         """Retrieve all users, optionally filtering by active status."""
         self.logger.info(f"Retrieving {'active' if not show_inactive else 'all'} users")
@@ -301,12 +310,16 @@ class UserManager(UserMixin):
     def verify_email(self, email, token) -> APIResponse:
         """Verify user's email using the provided token."""
         try:
-            result = self.db.fetch_one("SELECT user_id FROM users WHERE email = %s AND verification_token = %s", (email, token))
+            # The token is checked and cleared in one transaction, so it can only be used once
+            with self.db.transaction():
+                result = self.db.fetch_one(
+                    "SELECT user_id FROM users WHERE email = %s AND verification_token = %s FOR UPDATE", (email, token)
+                )
+                if result:
+                    data = {"email_verified": True, "verification_token": None}
+                    condition = {"user_id": result[0]}
+                    self.db.update_object("users", data, condition)
             if result:
-                user_id = result[0]
-                data = {"email_verified": True, "verification_token": None}
-                condition = {"user_id": user_id}
-                self.db.update_object("users", data, condition)
                 self.logger.info(f"Email verified successfully for user: {email}")
                 return APIResponse(status="success", message="Email verified successfully")
             else:
@@ -324,10 +337,12 @@ class UserManager(UserMixin):
                 user = UserManager(*result)
                 return APIResponse(status="success", message="User found", data={"user": user})
             else:
-                self.db.execute_query(
-                    "INSERT INTO users (google_id, email, email_verified) VALUES (%s, %s, TRUE)", (google_id, email)
-                )
-                user = self.get_user_by_email(email)
+                # The new user is read back on the same connection and committed with it
+                with self.db.transaction():
+                    self.db.execute_query(
+                        "INSERT INTO users (google_id, email, email_verified) VALUES (%s, %s, TRUE)", (google_id, email)
+                    )
+                    user = self.get_user_by_email(email)
                 if user:
                     return APIResponse(status="success", message="User created", data={"user": user})
                 else:
@@ -340,9 +355,7 @@ class UserManager(UserMixin):
         """Retrieve the password hash for a given email."""
         self.logger.info(f"Retrieving password hash for email {email}")
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT password_hash FROM users WHERE email = %s", (email,))
-            result = cursor.fetchone()
+            result = self.db.fetch_one("SELECT password_hash FROM users WHERE email = %s", (email,))
             if result:
                 password_hash = result[0]
                 self.logger.info(f"Password hash retrieved for email {email}")
@@ -412,7 +425,7 @@ class UserManager(UserMixin):
                 JOIN roles r ON ur.role_id = r.role_id
                 WHERE ur.user_id = %s AND r.role_name = %s
             """
-            result = self.db.fetch_one(query, (user_id, role_name))
+            result = self.db.fetch_one(query, (user_id, role_name), prepare=True)
             if result:
                 self.logger.info(f"User {user_id} has role {role_name}")
                 return APIResponse(status="success", message="User has the specified role", data={"has_role": True})
@@ -427,8 +440,8 @@ class UserManager(UserMixin):
         """Check if the system has been initialized with any users or roles."""
         self.logger.info("Checking if the system has been initialized")
         try:
-            user_count = self.db.fetch_one("SELECT COUNT(*) FROM users")[0]
-            role_count = self.db.fetch_one("SELECT COUNT(*) FROM roles")[0]
+            user_count = self.db.fetch_one("SELECT COUNT(*) FROM users", prepare=True)[0]
+            role_count = self.db.fetch_one("SELECT COUNT(*) FROM roles", prepare=True)[0]
 
             is_initialized = user_count > 0 and role_count > 0
 
@@ -444,24 +457,30 @@ class UserManager(UserMixin):
             self.logger.error(f"Failed to check system initialization: {str(e)}", exc_info=True)
             return APIResponse(status="failure", message=f"Failed to check system initialization: {str(e)}")
 
-    def create_user(self, email, password, is_active=True):
+    def create_user(self, email, password, is_active=True, roles=None):
+        """Create a verified user and assign it `roles` (role names) in the same transaction."""
         self.logger.info(f"Creating new user with email {email}")
         try:
             hash_password_response = self.hash_password(password)
             if hash_password_response.status == "success":
 
                 password_hash = hash_password_response.data["hashed_password"]
-                user_id = self.db.execute_query(
-                    "INSERT INTO users (email, password_hash, email_verified) VALUES (%s, %s, %s) RETURNING user_id",
-                    (email, password_hash, True),
-                )
+                with self.db.batch():
+                    user_id = self.db.execute_query(
+                        "INSERT INTO users (email, password_hash, email_verified) VALUES (%s, %s, %s) RETURNING user_id",
+                        (email, password_hash, True),
+                    )
+                    for role_name in roles or []:
+                        self.db.execute_query(
+                            "INSERT INTO user_roles (user_id, role_id) SELECT %s, role_id FROM roles WHERE role_name = %s",
+                            (user_id, role_name),
+                        )
 
                 self.logger.info(f"User created successfully")
                 return APIResponse(status="success", message="User created successfully", data={"user_id": user_id})
             else:
                 return hash_password_response
         except Exception as e:
-            self.db.rollback()
             self.logger.error(f"Failed to create user: {str(e)}", exc_info=True)
             return APIResponse(status="failure", message=f"Failed to create user: {str(e)}")
 
@@ -38,7 +38,7 @@ class UserPreferencesManager:
         self.logger.info(f"Retrieving preferences for user with ID {user_id}")
         try:
             query = "SELECT key, value FROM user_preferences WHERE user_id = %s"
-            preferences = self.db.fetch_all(query, (user_id,))
+            preferences = self.db.fetch_all(query, (user_id,), prepare=True)
             preferences_dict = {row[0]: row[1] for row in preferences}
             self.logger.info(f"Preferences retrieved for user with ID {user_id}: {', '.join([f'{key}={value}' for key, value in preferences_dict.items()])}")
             return APIResponse(status="success", message="Preferences retrieved successfully", data=preferences_dict)
@@ -50,7 +50,7 @@ class UserPreferencesManager:
         self.logger.info(f"Retrieving preference for user {user_id}: {key}")
         try:
             query = "SELECT value FROM user_preferences WHERE user_id = %s AND key = %s"
-            preference = self.db.fetch_one(query, (user_id, key))
+            preference = self.db.fetch_one(query, (user_id, key), prepare=True)
             if preference:
                 self.logger.info(f"Preference retrieved for user {user_id}: {key} = {preference[0]}")
                 return APIResponse(status="success", message="Preference retrieved successfully", data=preference[0])
@@ -122,7 +122,7 @@ class UserPreferencesManager:
         self.logger.info(f"Getting data type for preference key {key} for user {user_id}")
         try:
             query = "SELECT jsonb_typeof(value) FROM user_preferences WHERE user_id = %s AND key = %s"
-            data_type = self.db.fetch_one(query, (user_id, key))
+            data_type = self.db.fetch_one(query, (user_id, key), prepare=True)
             if data_type:
                 self.logger.info(f"Data type for {key} retrieved: {data_type[0]}")
                 return APIResponse(status="success", message="Data type retrieved successfully", data=data_type[0])
@@ -136,7 +136,7 @@ class UserPreferencesManager:
         self.logger.info(f"Getting value for preference key {key} for user {user_id}")
         try:
             query = "SELECT value FROM user_preferences WHERE user_id = %s AND key = %s"
-            value = self.db.fetch_one(query, (user_id, key))
+            value = self.db.fetch_one(query, (user_id, key), prepare=True)
             if value:
                 self.logger.info(f"Value for {key} retrieved: {value[0]}")
                 return APIResponse(status="success", message="Value retrieved successfully", data=value[0])
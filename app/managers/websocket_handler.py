@@ -1,12 +1,19 @@
+import json
 import logging
 from app.managers.user_connection_manager import UserConnectionManager
 from app.models.api_response import APIResponse
+from app.services.pubsub import PubSub, parse_user_channel, user_channel
 import websockets
 
 
 class WebSocketHandler:
-    def __init__(self, connection_manager: UserConnectionManager):
+    def __init__(self, connection_manager: UserConnectionManager, pubsub: PubSub = None):
+        """
+        With a pub/sub bus, notifications are published on the user's channel and delivered by whichever
+        websocket server process holds the user's sockets; without one they are delivered locally.
+        """
         self.connection_manager = connection_manager
+        self.pubsub = pubsub
         self.logger = logging.getLogger(self.__class__.__name__)
 
     async def handle_websocket(self, websocket, user_id):
@@ -15,18 +22,25 @@ class WebSocketHandler:
         """
         response = await self.connection_manager.add_connection(user_id, websocket)
         self.logger.info(response.message)
+        if self.pubsub is not None and len(self.connection_manager.active_connections.get(user_id, ())) == 1:
+            # First socket of the user in this process
+            await self.pubsub.subscribe(user_channel(user_id), self._on_user_event)
 
         try:
-            while await self.connection_manager.is_connected(user_id).data["connected"]:
+            # Ends with ConnectionClosed, also when the heartbeat closes a dead connection
+            while True:
                 message = await websocket.recv()
                 self.logger.info(f"Received message from {user_id}: {message}")
                 response = self.process_message(user_id, message)
-                await self.send_message(user_id, response)
+                # Replies go to the socket that asked, not to every connection of the user
+                await websocket.send(response)
         except websockets.ConnectionClosed:
             self.logger.warning(f"WebSocket connection closed for {user_id}")
         finally:
-            response = await self.connection_manager.remove_connection(user_id)
+            response = await self.connection_manager.remove_connection(user_id, websocket)
             self.logger.info(response.message)
+            if self.pubsub is not None and not (await self.connection_manager.is_connected(user_id)).data["connected"]:
+                await self.pubsub.unsubscribe(user_channel(user_id))
 
     def process_message(self, user_id, message) -> str:
         """
@@ -36,29 +50,49 @@ class WebSocketHandler:
         try:
             # Placeholder for actual message processing logic
             response = APIResponse(status="success", message="Message processed successfully", data={"message": message})
-            return response.json()
+            return json.dumps(response.to_dict())
         except Exception as e:
             self.logger.error(f"Error processing message from {user_id}: {e}")
-            return APIResponse(status="failure", message="Message processing failed").json()
+            return json.dumps(APIResponse(status="failure", message="Message processing failed").to_dict())
 
     async def send_message(self, user_id, message: str):
         """
-        Send a WebSocket message to the user if they are connected.
+        Send a WebSocket message to every connection of the user.
         """
-        connection_status = await self.connection_manager.is_connected(user_id)
-        if connection_status.data["connected"]:
-            websocket = self.connection_manager.active_connections[user_id]
-            try:
-                await websocket.send(message)
-                self.logger.info(f"Message sent to {user_id}: {message}")
-            except Exception as e:
-                self.logger.error(f"Failed to send message to {user_id}: {e}")
+        response = await self.connection_manager.broadcast(user_id, message)
+        if response.data["delivered"]:
+            self.logger.debug(f"Message sent to {user_id} ({response.data['delivered']} connections): {message}")
         else:
-            self.logger.warning(f"Cannot send message; user {user_id} is not connected.")
+            self.logger.debug(f"Message not delivered; user {user_id} has no open connection.")
 
     async def notify_new_job(self, user_id, job_data):
         """
         Notify the user about a new job if they are connected.
         """
-        message = APIResponse(status="success", message="New job available", data=job_data).json()
-        await self.send_message(user_id, message)
+        await self._publish_job_event(user_id, "insert", job_data)
+
+    async def notify_job_update(self, user_id, job_data):
+        """
+        Notify the user that the status or fit of one of their jobs changed, if they are connected.
+        """
+        await self._publish_job_event(user_id, "update", job_data)
+
+    async def _publish_job_event(self, user_id, event, job_data):
+        if self.pubsub is None:
+            await self._deliver_job_event(user_id, event, job_data)
+            return
+        # Same format as the job_details triggers of db_migrations/006
+        await self.pubsub.publish(user_channel(user_id), json.dumps({"event": event, "job": job_data}, default=str))
+
+    async def _on_user_event(self, channel, payload):
+        """Deliver a job event received on the channel of a user with sockets in this process."""
+        user_id = parse_user_channel(channel)
+        try:
+            event = json.loads(payload)
+            await self._deliver_job_event(user_id, event["event"], event["job"])
+        except (ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring malformed event on {channel}: {payload!r} ({e})")
+
+    async def _deliver_job_event(self, user_id, event, job_data):
+        message = "New job available" if event == "insert" else "Job updated"
+        await self.send_message(user_id, json.dumps(APIResponse(status="success", message=message, data=job_data).to_dict()))
@@ -1,3 +1,6 @@
+from flask import jsonify
+
+
 class APIResponse:
     def __init__(self, status, message, data=None):
         self.status = status
@@ -10,3 +13,6 @@ class APIResponse:
             'message': self.message,
             'data': self.data
         }
+
+    def to_json(self):
+        return jsonify(self.to_dict())
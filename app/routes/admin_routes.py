@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from app.managers.user_manager import UserManager
 from app.managers.role_manager import RoleManager
 from app.db.postgresdb import PostgresDB
@@ -52,3 +52,24 @@ def get_admin_data():
 
     except Exception as e:
         return APIResponse(status="failure", message=str(e), data=None).to_json()
+
+
+@admin_bp.route('/db/stats', methods=['GET'])
+@login_required
+@role_required('admin')
+def get_db_stats():
+    db = get_db()
+    limit = request.args.get('limit', 20, type=int)
+    order_by = request.args.get('order_by', 'total_ms')
+    if order_by not in ('total_ms', 'calls', 'max_ms', 'rows'):
+        return APIResponse(status="failure", message="Invalid order_by").to_json(), 400
+
+    return APIResponse(
+        status="success",
+        message="Database stats fetched successfully",
+        data={
+            "statements": db.get_query_stats(limit, order_by),
+            "pool": db.get_pool_stats(),
+            "prepared_statements": db.get_prepared_statement_stats(),
+        },
+    ).to_json()
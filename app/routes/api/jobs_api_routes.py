@@ -1,7 +1,7 @@
 from datetime import datetime
 import logging
 import os
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flask_login import current_user, login_required
 from app.managers.job_manager import JobManager
 from app.managers.user_manager import UserManager
@@ -59,20 +59,63 @@ def poll_updates():
     job_manager = JobManager()
     logging.info("Polling for job updates")
 
+    # Clients resume from the cursor of their previous poll; last_sync only starts a new feed
+    cursor = request.args.get('cursor', None)
     last_sync = request.args.get('last_sync', None)
-    if not last_sync:
-        return APIResponse(status="error", message="Missing last_sync parameter", data=None).to_dict(), 400
+    if not cursor and not last_sync:
+        return APIResponse(status="error", message="Missing cursor or last_sync parameter", data=None).to_dict(), 400
 
-    # Convert string to timestamp
-    try:
-        last_sync_dt = datetime.fromisoformat(last_sync)
-    except ValueError:
-        return APIResponse(status="error", message="Invalid last_sync format", data=None).to_dict(), 400
+    if cursor:
+        if job_manager.decode_change_cursor(cursor) is None:
+            return APIResponse(status="error", message="Invalid cursor", data=None).to_dict(), 400
+        last_sync_dt = None
+    else:
+        # Convert string to timestamp
+        try:
+            last_sync_dt = datetime.fromisoformat(last_sync)
+        except ValueError:
+            return APIResponse(status="error", message="Invalid last_sync format", data=None).to_dict(), 400
 
-    api_response = job_manager.poll_updates_for_user(current_user.user_id, last_sync_dt)
+    api_response = job_manager.poll_updates_for_user(current_user.user_id, last_sync_dt, cursor)
     return api_response.to_dict()
 
 
+@jobs_api_bp.route('/search', methods=['GET'])
+@login_required
+def search_jobs():
+    job_manager = JobManager()
+    search_value = request.args.get('q', '')
+    limit = min(request.args.get('limit', default=20, type=int), 100)
+
+    search_response = job_manager.search_jobs(current_user.user_id, search_value, limit)
+    return search_response.to_dict()
+
+
+@jobs_api_bp.route('/export', methods=['GET'])
+@login_required
+def export_jobs():
+    """Download all of the user's jobs as JSON lines, written out as they are read so memory stays flat."""
+    job_manager = JobManager()
+    user_id = current_user.user_id
+
+    def generate():
+        try:
+            for job in job_manager.stream_jobs_for_user(user_id):
+                yield current_app.json.dumps(job) + "\n"
+        except Exception:
+            # The status line is already sent: end with an error record, then abort the response so the
+            # download is visibly incomplete rather than a clean, shorter file
+            logging.error(f"Failed to export jobs for user {user_id}", exc_info=True)
+            yield current_app.json.dumps({"status": "failure", "message": "Export interrupted"}) + "\n"
+            raise
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=jobs.jsonl'},
+    )
+
+
 @jobs_api_bp.route('/jobs', methods=['GET'])
 @login_required
 def get_jobs_for_user():
@@ -83,6 +126,8 @@ def get_jobs_for_user():
     start = request.args.get('start', type=int)
     length = request.args.get('length', type=int)
     search_value = request.args.get('search[value]', '')
+    # Position after the previous page, lets deep pages seek instead of using OFFSET
+    cursor = request.args.get('cursor')
 
     # Get sorting information
     order_column_index = request.args.get('order[0][column]', type=int)
@@ -119,6 +164,7 @@ def get_jobs_for_user():
         search_value=search_value,
         columns=columns,
         searchable_columns=searchable_columns,
+        cursor=cursor,
     )
 
     if jobs_response.status == "failure":
@@ -130,6 +176,7 @@ def get_jobs_for_user():
         "recordsTotal": jobs_response.data['recordsTotal'],
         "recordsFiltered": jobs_response.data['recordsFiltered'],
         "data": jobs_response.data['jobs'],
+        "next_cursor": jobs_response.data['next_cursor'],
     }
 
     return jsonify(response_data)
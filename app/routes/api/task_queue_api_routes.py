@@ -63,3 +63,32 @@ def task_count_for_user():
     task_queue = TaskQueue()
     response = task_queue.get_task_count_for_user(current_user.user_id)
     return response.to_dict()
+
+
+@task_queue_bp.route('/latency_metrics')
+@login_required
+@role_required('admin')
+def latency_metrics():
+    task_queue = TaskQueue()
+    response = task_queue.get_latency_metrics()
+    return response.to_dict()
+
+
+@task_queue_bp.route('/failed_tasks')
+@login_required
+@role_required('admin')
+def get_failed_tasks():
+    task_queue = TaskQueue()
+    user_id = request.args.get('user_id', type=int)
+    limit = request.args.get('limit', 100, type=int)
+    response = task_queue.get_failed_tasks(user_id, limit)
+    return response.to_dict()
+
+
+@task_queue_bp.route('/failed_tasks/<int:failed_task_id>/replay', methods=['POST'])
+@login_required
+@role_required('admin')
+def replay_failed_task(failed_task_id):
+    task_queue = TaskQueue()
+    response = task_queue.replay_failed_task(failed_task_id)
+    return response.to_dict()
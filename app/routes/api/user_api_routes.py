@@ -1,5 +1,6 @@
+import logging
 import os
-from flask import Blueprint, current_app, request
+from flask import Blueprint, Response, current_app, request, stream_with_context
 from flask_login import current_user, login_required
 from app.managers.user_preferences_manager import UserPreferencesManager
 from app.models.user import User
@@ -16,8 +17,32 @@ def get_all_users():
     user_manager = UserManager()
     # Get filter parameters from request
     show_inactive = request.args.get('show_inactive', 'false').lower() == 'true'
-    users_response = user_manager.get_all_users(show_inactive)
-    return users_response.to_dict()
+    users = user_manager.stream_all_users(show_inactive)
+    # Run the query before committing to a success response, so database errors are still reported as failures
+    try:
+        first_user = next(users, None)
+    except Exception as e:
+        logging.error(f"Failed to retrieve users: {str(e)}", exc_info=True)
+        return APIResponse(status="failure", message=f"Failed to retrieve users: {str(e)}").to_dict()
+
+    def generate():
+        # Same body as APIResponse.to_dict(), written one user at a time
+        yield '{"status": "success", "message": "Users retrieved successfully", "data": {"users": ['
+        if first_user is not None:
+            yield current_app.json.dumps(first_user)
+            try:
+                for user in users:
+                    yield "," + current_app.json.dumps(user)
+            except Exception:
+                # Abort the response instead of closing it as a complete success; the client sees a broken transfer
+                logging.error("Failed to stream users, aborting the response", exc_info=True)
+                raise
+            finally:
+                # Give the stream's database connection back even if the client disconnected mid-response
+                users.close()
+        yield "]}}"
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @user_api_bp.route('/<int:user_id>', methods=['GET'])
 @login_required
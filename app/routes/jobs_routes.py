@@ -6,6 +6,8 @@ from app.db.postgresdb import PostgresDB
 from app.db.db_utils import get_db
 import markdown
 import logging
+import os
+from urllib.parse import urlsplit
 from flask import jsonify, request
 from app.services.email_processor import EmailProcessor
 from app.services.task_queue import TaskQueue
@@ -85,7 +87,25 @@ def jobs():
         logging.warning(f"Failed to fetch jobs: {jobs_answer.message}")
         jobs = []
 
-    return render_template('job/jobs.html', jobs=jobs)
+    return render_template('job/jobs.html', jobs=jobs, websocket_url=get_websocket_url())
+
+
+def get_websocket_url():
+    """
+    URL of the websocket server for live job updates: WEBSOCKET_PUBLIC_URL when set (e.g. a path proxied on
+    this host), otherwise the host of this request on the websocket server's own port.
+    None when WEBSOCKET_SERVER_ENABLED is off, in which case the jobs page polls.
+    """
+    if os.getenv('WEBSOCKET_SERVER_ENABLED', 'false').lower() != 'true':
+        return None
+    public_url = os.getenv('WEBSOCKET_PUBLIC_URL')
+    if public_url:
+        return public_url
+    hostname = urlsplit(f"//{request.host}").hostname
+    if ':' in hostname:
+        hostname = f"[{hostname}]"
+    scheme = 'wss' if request.scheme == 'https' else 'ws'
+    return f"{scheme}://{hostname}:{os.getenv('WEBSOCKET_PORT', '8765')}{os.getenv('WEBSOCKET_PATH', '/ws')}"
 
 
 @job_bp.route('/<job_id>')
@@ -58,29 +58,23 @@ def initial_setup_post():
         flash('Password must be at least 8 characters long.', 'error')
         return render_template('user/setup.html'), 400
 
-    # Create admin role
-    admin_role_response = role_manager.create_role('admin')
-    if admin_role_response.status != "success":
-        flash(admin_role_response.message, 'error')
-        return render_template('user/setup.html'), 500
-
-    # Create admin user
-    admin_user_response = user_manager.create_user(
-        email=email,
-        password=password,
-        is_active=True
-    )
-    if admin_user_response.status != "success":
-        flash(admin_user_response.message, 'error')
-        return render_template('user/setup.html'), 500
-
-    # Assign admin role to the user
-    assign_role_response = role_manager.assign_role_to_user(
-        admin_user_response.data['user_id'],
-        'admin'
-    )
-    if assign_role_response.status != "success":
-        flash(assign_role_response.message, 'error')
+    # Create the admin role and the admin user holding it, all or nothing
+    try:
+        with get_db().transaction():
+            admin_role_response = role_manager.create_role('admin')
+            if admin_role_response.status != "success":
+                raise RuntimeError(admin_role_response.message)
+
+            admin_user_response = user_manager.create_user(
+                email=email,
+                password=password,
+                is_active=True,
+                roles=['admin']
+            )
+            if admin_user_response.status != "success":
+                raise RuntimeError(admin_user_response.message)
+    except Exception as e:
+        flash(str(e), 'error')
         return render_template('user/setup.html'), 500
 
     flash('Initial setup completed successfully. You can now log in.', 'success')
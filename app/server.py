@@ -1,20 +1,48 @@
+import asyncio
 import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from app.db import db_utils
 from app.managers.messages_handler import MessageHandler
 from app.models.config import setup_logging
-from services.task_queue import TaskQueue
-from app.services.email_processor import EmailProcessor
-import json
-import os
+from app.services.task_queue import TaskQueue
+from app.web_socket_server import run_websocket_server
 
 # Set up logging
 setup_logging()
 
-def run_task_queue_listener():
-    logging.info("Initializing task queue listener...")
+# Seconds a worker must stay up before its restart backoff is reset
+STABLE_WORKER_SECONDS = 60
+MAX_RESTART_BACKOFF = 60
+
+
+def _install_stop_handlers(stop_event):
+    """Turn SIGTERM and SIGINT into a stop request instead of killing the process mid-task."""
+
+    def handle_signal(signum, frame):
+        logging.info(f"Received signal {signum}, stopping...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+
+def run_task_queue_listener(partition_index=0, partition_count=1):
+    logging.info(f"Initializing task queue listener (partition {partition_index} of {partition_count})...")
+
+    # A forked worker must not reuse the parent's database connection
+    db_utils.current_db = None
+    stop_event = threading.Event()
+    _install_stop_handlers(stop_event)
 
     # Create a TaskQueue instance
     task_queue = TaskQueue()
-    
+    task_queue.set_partition(partition_index, partition_count)
+
     # Register callbacks for different task types
     task_queue.register_callback('process_job', MessageHandler.handle_process_job_task)
 
@@ -22,22 +50,101 @@ def run_task_queue_listener():
         logging.info("Starting task queue processing.")
         task_queue.start_processing()
 
-        # Keep the main thread running using eventlet sleep
-        while True:
-            pass              
-    except KeyboardInterrupt:
-        logging.info("Task queue processing interrupted by KeyboardInterrupt.")
-        task_queue.stop_processing()
+        # Sleep until asked to stop, logging latency per priority class meanwhile, then let the in-flight tasks drain
+        metrics_interval = int(os.getenv('TASK_QUEUE_METRICS_LOG_INTERVAL', '60'))
+        while not stop_event.wait(timeout=metrics_interval):
+            logging.info(f"Task latency by priority class: {task_queue.get_latency_metrics().data}")
     except Exception as e:
         logging.error(f"An error occurred in task queue listener: {str(e)}")
+    finally:
         task_queue.stop_processing()
+        db_utils.close_db()
+        logging.info(f"Task queue listener for partition {partition_index} stopped.")
+
+
+def run_websocket_process():
+    """Run the websocket server that pushes job updates to browsers (see app/web_socket_server.py)."""
+    db_utils.current_db = None
+    asyncio.run(run_websocket_server())
+
+
+def run_supervisor(num_processes, websocket_server=False):
+    """
+    Run one listener process per partition, plus the websocket server process if `websocket_server`,
+    restart the ones that crash and stop them all on SIGTERM.
+    """
+    logging.info(f"Starting task queue supervisor with {num_processes} worker processes.")
+    stop_event = threading.Event()
+    _install_stop_handlers(stop_event)
+    drain_timeout = int(os.getenv('TASK_QUEUE_DRAIN_TIMEOUT', '300'))
+
+    workers = {}
+    for index in range(num_processes):
+        workers[index] = {
+            "target": run_task_queue_listener,
+            "args": (index, num_processes),
+            "name": f"TaskQueueListener-{index}",
+        }
+    if websocket_server:
+        workers['websocket'] = {"target": run_websocket_process, "args": (), "name": "WebSocketServer"}
+    for worker in workers.values():
+        worker.update({"process": None, "started_at": 0.0, "restarts": 0, "restart_at": 0.0})
+
+    while not stop_event.is_set():
+        now = time.monotonic()
+        for index, worker in workers.items():
+            process = worker["process"]
+            if process is not None and process.is_alive():
+                continue
+
+            if process is not None:
+                logging.error(f"Process {worker['name']} (pid {process.pid}) exited with code {process.exitcode}")
+                if now - worker["started_at"] >= STABLE_WORKER_SECONDS:
+                    worker["restarts"] = 0
+                backoff = min(MAX_RESTART_BACKOFF, 2 ** worker["restarts"])
+                worker["restarts"] += 1
+                worker["restart_at"] = now + backoff
+                worker["process"] = None
+                logging.info(f"Restarting process {worker['name']} in {backoff}s")
+
+            if now >= worker["restart_at"]:
+                process = multiprocessing.Process(target=worker["target"], args=worker["args"], name=worker["name"])
+                process.start()
+                worker["process"] = process
+                worker["started_at"] = now
+                logging.info(f"Started process {worker['name']} (pid {process.pid})")
+
+        stop_event.wait(timeout=1)
+
+    logging.info("Stopping listener processes...")
+    running = [worker["process"] for worker in workers.values() if worker["process"] is not None]
+    for process in running:
+        if process.is_alive():
+            process.terminate()
+
+    deadline = time.monotonic() + drain_timeout
+    for process in running:
+        process.join(timeout=max(0, deadline - time.monotonic()))
+        if process.is_alive():
+            logging.warning(f"Process {process.name} did not drain in time, killing it")
+            process.kill()
+            process.join()
+    logging.info("Task queue supervisor stopped.")
+
 
 # Main function to run task queue listener
 if __name__ == '__main__':
     logging.info("Starting application...")
 
     try:
-        logging.info("Starting task queue listener.")
-        run_task_queue_listener()
+        num_processes = int(os.getenv('TASK_QUEUE_LISTENER_PROCESSES', '1'))
+        # Opt-in: the server needs WEBSOCKET_PORT reachable from browsers (or proxied via WEBSOCKET_PUBLIC_URL).
+        # The jobs page only connects when the web app has the same setting, and keeps polling otherwise.
+        websocket_server = os.getenv('WEBSOCKET_SERVER_ENABLED', 'false').lower() == 'true'
+        if num_processes > 1 or websocket_server:
+            run_supervisor(num_processes, websocket_server)
+        else:
+            logging.info("Starting task queue listener.")
+            run_task_queue_listener()
     except Exception as e:
         logging.error(f"Error in main loop: {str(e)}")
@@ -452,6 +452,12 @@ class JobApplicationProcessor:
             if job["gemini_results"] != {}:
                 self.logger.info("Job has been processed before.")
                 return
+
+            # Duplicate process_job tasks can run concurrently; only the worker that claims the job does the work
+            claim_response = job_manager.claim_job_for_processing(job_id)
+            if not get_api_response_value(claim_response, 'claimed'):
+                self.logger.info(f"Job {job_id} is already being processed, skipping.")
+                return
             self.logger.info(f"Processing job: {job['job_title']}")
 
             # Load the profile.txt content
@@ -538,6 +544,7 @@ class JobApplicationProcessor:
         job["gemini_results"] = gemini_results or {}
         job["status"] = status
         job["performance_metrics"] = performance_metrics or {}
+        JobManager.release_job_claim(job)
         self.logger.info(f"Updating job '{job['job_title']}' with status '{status}'.")
         job_manager = JobManager()
         job_manager.update_job(job)
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+
+from app.db.db_utils import get_async_db
+from app.models.config import Config
+
+try:
+    import psycopg
+    from psycopg import sql
+    from psycopg.conninfo import make_conninfo
+except ImportError:  # psycopg 3 is only needed by the asyncio code paths
+    psycopg = None
+
+MAX_RECONNECT_BACKOFF = 30
+
+
+def user_channel(user_id) -> str:
+    """Channel carrying the events of one user (see db_migrations/006_job_details_user_channels.pgsql)."""
+    return f"user_{user_id}"
+
+
+def parse_user_channel(channel):
+    """Return the user id of a user_channel(), or None for any other channel."""
+    prefix, _, user_id = channel.partition('_')
+    return int(user_id) if prefix == 'user' and user_id.isdigit() else None
+
+
+class PubSub(ABC):
+    """
+    Message bus between processes. Each websocket server process subscribes to the channels of the users whose
+    sockets it holds, so a message published anywhere reaches the process that can deliver it.
+    A channel has one callback per process, awaited as callback(channel, message).
+    """
+
+    @abstractmethod
+    async def publish(self, channel, message):
+        """Send a text message to every process subscribed to the channel."""
+
+    @abstractmethod
+    async def subscribe(self, channel, callback):
+        """Start receiving the channel's messages; subscribing again replaces the callback."""
+
+    @abstractmethod
+    async def unsubscribe(self, channel):
+        """Stop receiving the channel's messages."""
+
+    def start(self):
+        """Start receiving messages in the background, if the bus needs to."""
+
+    async def close(self):
+        """Stop receiving messages."""
+
+
+class InMemoryPubSub(PubSub):
+    """Delivers messages within the process, for tests and single-process development."""
+
+    def __init__(self):
+        self._callbacks = {}
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def publish(self, channel, message):
+        callback = self._callbacks.get(channel)
+        if callback is not None:
+            await callback(channel, message)
+
+    async def subscribe(self, channel, callback):
+        self._callbacks[channel] = callback
+
+    async def unsubscribe(self, channel):
+        self._callbacks.pop(channel, None)
+
+
+class PostgresPubSub(PubSub):
+    """
+    Postgres LISTEN/NOTIFY bus. Messages are published through the async connection pool and received on one
+    dedicated connection, which only LISTENs to the channels subscribed in this process. Database triggers
+    can publish with pg_notify() too, so changes made by any worker reach the websocket servers.
+    Messages must stay below the 8000 byte NOTIFY payload limit.
+    """
+
+    def __init__(self, poll_timeout=None):
+        if psycopg is None:
+            raise RuntimeError("PostgresPubSub requires the 'psycopg' package")
+        # make_conninfo quotes values, so passwords with spaces or quotes survive
+        self.conninfo = make_conninfo(host=Config.DB_HOST, dbname=Config.DB_NAME, user=Config.DB_USER, password=Config.DB_PASSWORD)
+        # How long the listener waits for a notification before applying new subscriptions
+        self.poll_timeout = poll_timeout or float(os.getenv('PUBSUB_POLL_TIMEOUT', '0.5'))
+        self._callbacks = {}
+        self._listening = set()
+        self._subscriptions_changed = False
+        self._task = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def publish(self, channel, message):
+        db = await get_async_db()
+        await db.execute_query("SELECT pg_notify(%s, %s)", (channel, message))
+
+    async def subscribe(self, channel, callback):
+        self._callbacks[channel] = callback
+        self._subscriptions_changed = True
+
+    async def unsubscribe(self, channel):
+        if self._callbacks.pop(channel, None) is not None:
+            self._subscriptions_changed = True
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen_forever())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen_forever(self):
+        """Keep the LISTEN connection open, reconnecting with backoff if the database goes away."""
+        attempts = 0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as connection:
+                    self._listening = set()
+                    self.logger.info("Pub/sub listener connected")
+                    attempts = 0
+                    while True:
+                        await self._apply_subscriptions(connection)
+                        # The connection can't run LISTEN while waiting, so wake up regularly to apply new subscriptions
+                        async for notification in connection.notifies(timeout=self.poll_timeout):
+                            await self._dispatch(notification.channel, notification.payload)
+                            if self._subscriptions_changed:
+                                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Messages published while disconnected are lost; clients resync through the poll cursor
+                backoff = min(MAX_RECONNECT_BACKOFF, 2 ** attempts)
+                attempts += 1
+                self.logger.error(f"Pub/sub listener disconnected: {e}, reconnecting in {backoff}s")
+                await asyncio.sleep(backoff)
+
+    async def _apply_subscriptions(self, connection):
+        self._subscriptions_changed = False
+        subscribed = set(self._callbacks)
+        for channel in subscribed - self._listening:
+            await connection.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+        for channel in self._listening - subscribed:
+            await connection.execute(sql.SQL("UNLISTEN {}").format(sql.Identifier(channel)))
+        self._listening = subscribed
+
+    async def _dispatch(self, channel, message):
+        callback = self._callbacks.get(channel)
+        if callback is None:
+            return
+        try:
+            await callback(channel, message)
+        except Exception as e:
+            self.logger.error(f"Error handling message on channel {channel}: {e}")
+
+
+def create_pubsub(name=None) -> PubSub:
+    """Create the bus selected by PUBSUB_BACKEND (postgres or memory)."""
+    name = (name or os.getenv('PUBSUB_BACKEND', 'postgres')).lower()
+    if name == 'postgres':
+        return PostgresPubSub()
+    if name == 'memory':
+        return InMemoryPubSub()
+    raise ValueError(f"Unknown pub/sub backend: {name}")
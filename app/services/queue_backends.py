@@ -0,0 +1,551 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import boto3
+import psycopg2
+from botocore.exceptions import ClientError
+
+from app.db.postgresdb import PoolTimeoutError
+
+
+def _client_error(code, message, operation_name) -> ClientError:
+    """Build a ClientError shaped like the ones boto3 raises, so TaskQueue handles every backend the same way."""
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation_name)
+
+
+def _queue_does_not_exist(queue, operation_name) -> ClientError:
+    return _client_error('AWS.SimpleQueueService.NonExistentQueue', f"The specified queue does not exist: {queue}", operation_name)
+
+
+def _deduplication_id(entry) -> str:
+    """Explicit deduplication ID, or a content-based one like SQS FIFO queues with ContentBasedDeduplication."""
+    return entry.get('MessageDeduplicationId') or hashlib.sha256(entry['MessageBody'].encode()).hexdigest()
+
+
+class QueueBackend(ABC):
+    """
+    Queue operations TaskQueue relies on.
+
+    The method and argument names follow the boto3 SQS client so the SQS backend is a thin pass-through,
+    responses use the same dictionary shapes, and failures are raised as botocore ClientErrors.
+    """
+
+    @abstractmethod
+    def get_queue_url(self, QueueName) -> dict:
+        pass
+
+    @abstractmethod
+    def create_queue(self, QueueName, Attributes=None) -> dict:
+        pass
+
+    @abstractmethod
+    def list_queues(self) -> dict:
+        pass
+
+    @abstractmethod
+    def send_message_batch(self, QueueUrl, Entries) -> dict:
+        pass
+
+    @abstractmethod
+    def receive_message(
+        self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=30, AttributeNames=None
+    ) -> dict:
+        pass
+
+    @abstractmethod
+    def delete_message(self, QueueUrl, ReceiptHandle) -> dict:
+        pass
+
+    @abstractmethod
+    def delete_message_batch(self, QueueUrl, Entries) -> dict:
+        pass
+
+    @abstractmethod
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout) -> dict:
+        pass
+
+    @abstractmethod
+    def get_queue_attributes(self, QueueUrl, AttributeNames) -> dict:
+        pass
+
+
+class SQSQueueBackend(QueueBackend):
+    """Amazon SQS through boto3."""
+
+    def __init__(self, sqs_client):
+        self.sqs_client = sqs_client
+
+    def get_queue_url(self, QueueName) -> dict:
+        return self.sqs_client.get_queue_url(QueueName=QueueName)
+
+    def create_queue(self, QueueName, Attributes=None) -> dict:
+        return self.sqs_client.create_queue(QueueName=QueueName, Attributes=Attributes or {})
+
+    def list_queues(self) -> dict:
+        return self.sqs_client.list_queues()
+
+    def send_message_batch(self, QueueUrl, Entries) -> dict:
+        return self.sqs_client.send_message_batch(QueueUrl=QueueUrl, Entries=Entries)
+
+    def receive_message(
+        self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=30, AttributeNames=None
+    ) -> dict:
+        return self.sqs_client.receive_message(
+            QueueUrl=QueueUrl,
+            MaxNumberOfMessages=MaxNumberOfMessages,
+            WaitTimeSeconds=WaitTimeSeconds,
+            VisibilityTimeout=VisibilityTimeout,
+            AttributeNames=AttributeNames or [],
+        )
+
+    def delete_message(self, QueueUrl, ReceiptHandle) -> dict:
+        return self.sqs_client.delete_message(QueueUrl=QueueUrl, ReceiptHandle=ReceiptHandle)
+
+    def delete_message_batch(self, QueueUrl, Entries) -> dict:
+        return self.sqs_client.delete_message_batch(QueueUrl=QueueUrl, Entries=Entries)
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout) -> dict:
+        return self.sqs_client.change_message_visibility(
+            QueueUrl=QueueUrl, ReceiptHandle=ReceiptHandle, VisibilityTimeout=VisibilityTimeout
+        )
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames) -> dict:
+        return self.sqs_client.get_queue_attributes(QueueUrl=QueueUrl, AttributeNames=AttributeNames)
+
+
+class InMemoryQueueBackend(QueueBackend):
+    """
+    Process-local queues with SQS semantics (visibility timeouts, FIFO message groups, deduplication).
+    Useful for single-box deployments, tests and measuring queue overhead without a network hop.
+    """
+
+    URL_PREFIX = "memory://task-queue/"
+    DEDUPLICATION_WINDOW = 300
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._queues = {}
+        self._next_message_id = 1
+        self._condition = threading.Condition()
+
+    def _get_queue(self, queue_url, operation_name) -> dict:
+        queue = self._queues.get(queue_url[len(self.URL_PREFIX) :]) if queue_url.startswith(self.URL_PREFIX) else None
+        if queue is None:
+            raise _queue_does_not_exist(queue_url, operation_name)
+        return queue
+
+    def get_queue_url(self, QueueName) -> dict:
+        with self._condition:
+            if QueueName not in self._queues:
+                raise _queue_does_not_exist(QueueName, 'GetQueueUrl')
+            return {'QueueUrl': self.URL_PREFIX + QueueName}
+
+    def create_queue(self, QueueName, Attributes=None) -> dict:
+        with self._condition:
+            if QueueName not in self._queues:
+                self._queues[QueueName] = {
+                    'is_fifo': (Attributes or {}).get('FifoQueue') == 'true',
+                    'messages': [],
+                    'deduplication_ids': {},
+                }
+                self.logger.info(f"Created in-memory queue {QueueName}")
+            return {'QueueUrl': self.URL_PREFIX + QueueName}
+
+    def list_queues(self) -> dict:
+        with self._condition:
+            return {'QueueUrls': [self.URL_PREFIX + name for name in self._queues]}
+
+    def send_message_batch(self, QueueUrl, Entries) -> dict:
+        now = time.time()
+        successful = []
+        with self._condition:
+            queue = self._get_queue(QueueUrl, 'SendMessageBatch')
+            deduplication_ids = queue['deduplication_ids']
+            for dedup_id, (expires_at, _) in list(deduplication_ids.items()):
+                if expires_at <= now:
+                    del deduplication_ids[dedup_id]
+
+            for entry in Entries:
+                dedup_id = _deduplication_id(entry) if queue['is_fifo'] else None
+                if dedup_id is not None and dedup_id in deduplication_ids:
+                    successful.append({'Id': entry['Id'], 'MessageId': deduplication_ids[dedup_id][1]})
+                    continue
+
+                message_id = str(self._next_message_id)
+                self._next_message_id += 1
+                queue['messages'].append(
+                    {
+                        'message_id': message_id,
+                        'body': entry['MessageBody'],
+                        'group_id': entry.get('MessageGroupId'),
+                        'visible_at': 0.0,
+                        'receive_count': 0,
+                        'receipt_handle': None,
+                        'sent_at': now,
+                    }
+                )
+                if dedup_id is not None:
+                    deduplication_ids[dedup_id] = (now + self.DEDUPLICATION_WINDOW, message_id)
+                successful.append({'Id': entry['Id'], 'MessageId': message_id})
+            self._condition.notify_all()
+        return {'Successful': successful, 'Failed': []}
+
+    def receive_message(
+        self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=30, AttributeNames=None
+    ) -> dict:
+        deadline = time.monotonic() + WaitTimeSeconds
+        with self._condition:
+            while True:
+                queue = self._get_queue(QueueUrl, 'ReceiveMessage')
+                messages = self._take_visible_messages(queue, MaxNumberOfMessages, VisibilityTimeout)
+                remaining = deadline - time.monotonic()
+                if messages or remaining <= 0:
+                    break
+                # Wake up on new messages, or in time for in-flight messages whose visibility timeout expires
+                self._condition.wait(timeout=min(remaining, 1.0))
+
+        if not messages:
+            return {}
+        return {
+            'Messages': [
+                {
+                    'MessageId': message['message_id'],
+                    'ReceiptHandle': message['receipt_handle'],
+                    'Body': message['body'],
+                    'Attributes': {
+                        'ApproximateReceiveCount': str(message['receive_count']),
+                        'SentTimestamp': str(int(message['sent_at'] * 1000)),
+                        'MessageGroupId': message['group_id'],
+                    },
+                }
+                for message in messages
+            ]
+        }
+
+    def _take_visible_messages(self, queue, max_messages, visibility_timeout) -> list:
+        now = time.time()
+        # FIFO queues hold back a message group while one of its messages is in flight
+        busy_groups = set()
+        if queue['is_fifo']:
+            busy_groups = {m['group_id'] for m in queue['messages'] if m['receive_count'] and m['visible_at'] > now}
+
+        taken = []
+        for message in queue['messages']:
+            if len(taken) >= max_messages:
+                break
+            if message['visible_at'] > now or message['group_id'] in busy_groups:
+                continue
+            message['visible_at'] = now + visibility_timeout
+            message['receive_count'] += 1
+            message['receipt_handle'] = uuid.uuid4().hex
+            taken.append(dict(message))
+        return taken
+
+    def delete_message(self, QueueUrl, ReceiptHandle) -> dict:
+        with self._condition:
+            queue = self._get_queue(QueueUrl, 'DeleteMessage')
+            queue['messages'] = [m for m in queue['messages'] if m['receipt_handle'] != ReceiptHandle]
+            self._condition.notify_all()
+        return {}
+
+    def delete_message_batch(self, QueueUrl, Entries) -> dict:
+        receipt_handles = {entry['ReceiptHandle'] for entry in Entries}
+        with self._condition:
+            queue = self._get_queue(QueueUrl, 'DeleteMessageBatch')
+            queue['messages'] = [m for m in queue['messages'] if m['receipt_handle'] not in receipt_handles]
+            self._condition.notify_all()
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout) -> dict:
+        with self._condition:
+            queue = self._get_queue(QueueUrl, 'ChangeMessageVisibility')
+            for message in queue['messages']:
+                if message['receipt_handle'] == ReceiptHandle:
+                    message['visible_at'] = time.time() + VisibilityTimeout
+                    return {}
+        raise _client_error('ReceiptHandleIsInvalid', f"Unknown receipt handle: {ReceiptHandle}", 'ChangeMessageVisibility')
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames) -> dict:
+        now = time.time()
+        with self._condition:
+            queue = self._get_queue(QueueUrl, 'GetQueueAttributes')
+            visible = sum(1 for m in queue['messages'] if m['visible_at'] <= now)
+            in_flight = len(queue['messages']) - visible
+        return {
+            'Attributes': {
+                'ApproximateNumberOfMessages': str(visible),
+                'ApproximateNumberOfMessagesNotVisible': str(in_flight),
+            }
+        }
+
+
+class PostgresQueueBackend(QueueBackend):
+    """
+    Queues stored in PostgreSQL. Receivers claim rows with FOR UPDATE SKIP LOCKED, so several
+    workers can poll the same queue without blocking each other or receiving the same message.
+    Receivers of a FIFO queue take turns on an advisory lock, so two of them never start the same group.
+    Database errors are raised as ClientErrors with the InternalError code, like the other backends' failures.
+    """
+
+    URL_PREFIX = "postgres://task-queue/"
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, db):
+        self.db = db
+        self.logger = logging.getLogger(__name__)
+        self.create_tables()
+
+    def create_tables(self):
+        """Create the task_queues and task_queue tables if they don't exist."""
+        self.db.create_table(
+            """
+            CREATE TABLE IF NOT EXISTS task_queues (
+                queue_name VARCHAR(80) PRIMARY KEY,
+                is_fifo BOOLEAN NOT NULL DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        self.db.create_table(
+            """
+            CREATE TABLE IF NOT EXISTS task_queue (
+                message_id BIGSERIAL PRIMARY KEY,
+                queue_name VARCHAR(80) NOT NULL REFERENCES task_queues (queue_name) ON DELETE CASCADE,
+                body TEXT NOT NULL,
+                group_id VARCHAR(128),
+                deduplication_id VARCHAR(128),
+                receipt_handle VARCHAR(64),
+                receive_count INTEGER NOT NULL DEFAULT 0,
+                visible_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                sent_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            CREATE INDEX IF NOT EXISTS idx_task_queue_visible ON task_queue (queue_name, visible_at, message_id);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_task_queue_receipt_handle ON task_queue (receipt_handle);
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_task_queue_deduplication ON task_queue (queue_name, deduplication_id);
+            """
+        )
+
+    def _queue_name(self, queue_url, operation_name) -> str:
+        if not queue_url.startswith(self.URL_PREFIX):
+            raise _queue_does_not_exist(queue_url, operation_name)
+        return queue_url[len(self.URL_PREFIX) :]
+
+    @contextmanager
+    def _database_errors(self, operation_name):
+        """Raise database errors as ClientErrors, which TaskQueue's loops retry instead of dying on."""
+        try:
+            yield
+        except (psycopg2.Error, PoolTimeoutError) as e:
+            raise _client_error('InternalError', str(e), operation_name) from e
+
+    def _get_queue(self, queue_url, operation_name):
+        queue_name = self._queue_name(queue_url, operation_name)
+        row = self.db.fetch_one("SELECT queue_name, is_fifo FROM task_queues WHERE queue_name = %s", (queue_name,))
+        if row is None:
+            raise _queue_does_not_exist(queue_url, operation_name)
+        return row
+
+    def get_queue_url(self, QueueName) -> dict:
+        with self._database_errors('GetQueueUrl'):
+            row = self.db.fetch_one("SELECT queue_name FROM task_queues WHERE queue_name = %s", (QueueName,))
+            if row is None:
+                raise _queue_does_not_exist(QueueName, 'GetQueueUrl')
+            return {'QueueUrl': self.URL_PREFIX + QueueName}
+
+    def create_queue(self, QueueName, Attributes=None) -> dict:
+        with self._database_errors('CreateQueue'):
+            is_fifo = (Attributes or {}).get('FifoQueue') == 'true'
+            self.db.execute_query(
+                "INSERT INTO task_queues (queue_name, is_fifo) VALUES (%s, %s) ON CONFLICT (queue_name) DO NOTHING",
+                (QueueName, is_fifo),
+            )
+            self.logger.info(f"Created Postgres queue {QueueName}")
+            return {'QueueUrl': self.URL_PREFIX + QueueName}
+
+    def list_queues(self) -> dict:
+        with self._database_errors('ListQueues'):
+            rows = self.db.fetch_all("SELECT queue_name FROM task_queues ORDER BY queue_name")
+            return {'QueueUrls': [self.URL_PREFIX + row[0] for row in rows]}
+
+    def send_message_batch(self, QueueUrl, Entries) -> dict:
+        with self._database_errors('SendMessageBatch'):
+            queue_name, is_fifo = self._get_queue(QueueUrl, 'SendMessageBatch')
+            dedup_ids = [_deduplication_id(entry) if is_fifo else None for entry in Entries]
+            # One multi-row INSERT for the whole batch; rows are returned in the order they were inserted
+            rows = self.db.bulk_upsert(
+                'task_queue',
+                [
+                    {
+                        'queue_name': queue_name,
+                        'body': entry['MessageBody'],
+                        'group_id': entry.get('MessageGroupId'),
+                        'deduplication_id': dedup_id,
+                    }
+                    for entry, dedup_id in zip(Entries, dedup_ids)
+                ],
+                conflict_cols=['queue_name', 'deduplication_id'],
+                returning=['message_id', 'deduplication_id'],
+            )
+            if not is_fifo:
+                message_ids = [row[0] for row in rows]
+            else:
+                message_id_by_dedup = {dedup_id: message_id for message_id, dedup_id in rows}
+                duplicates = [dedup_id for dedup_id in set(dedup_ids) if dedup_id not in message_id_by_dedup]
+                if duplicates:
+                    # Duplicates of messages still in the queue: report the originals, as SQS does
+                    message_id_by_dedup.update(
+                        (dedup_id, message_id)
+                        for message_id, dedup_id in self.db.fetch_all(
+                            """
+                            SELECT message_id, deduplication_id FROM task_queue
+                            WHERE queue_name = %s AND deduplication_id = ANY(%s)
+                            """,
+                            (queue_name, duplicates),
+                        )
+                    )
+                message_ids = [message_id_by_dedup.get(dedup_id) for dedup_id in dedup_ids]
+            return {
+                'Successful': [
+                    {'Id': entry['Id'], 'MessageId': str(message_id) if message_id is not None else None}
+                    for entry, message_id in zip(Entries, message_ids)
+                ],
+                'Failed': [],
+            }
+
+    def receive_message(
+        self, QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=30, AttributeNames=None
+    ) -> dict:
+        with self._database_errors('ReceiveMessage'):
+            queue_name, is_fifo = self._get_queue(QueueUrl, 'ReceiveMessage')
+            deadline = time.monotonic() + WaitTimeSeconds
+            while True:
+                rows = self._claim_messages(queue_name, is_fifo, MaxNumberOfMessages, VisibilityTimeout)
+                remaining = deadline - time.monotonic()
+                if rows or remaining <= 0:
+                    break
+                time.sleep(min(self.POLL_INTERVAL, remaining))
+
+        if not rows:
+            return {}
+        return {
+            'Messages': [
+                {
+                    'MessageId': str(message_id),
+                    'ReceiptHandle': receipt_handle,
+                    'Body': body,
+                    'Attributes': {
+                        'ApproximateReceiveCount': str(receive_count),
+                        'SentTimestamp': str(int(sent_at.timestamp() * 1000)),
+                        'MessageGroupId': group_id,
+                    },
+                }
+                for message_id, receipt_handle, body, group_id, receive_count, sent_at in sorted(rows)
+            ]
+        }
+
+    def _claim_messages(self, queue_name, is_fifo, max_messages, visibility_timeout):
+        """
+        Make up to max_messages visible messages in flight and return them. A message is skipped while
+        an earlier message of its group is in flight.
+        """
+        with self.db.transaction():
+            if is_fifo:
+                # Without the lock, two receivers could both see a group with nothing in flight and each claim
+                # one of its messages. The claim below runs after the lock, so its snapshot sees the previous
+                # holder's claims.
+                self.db.execute_query("SELECT pg_advisory_xact_lock(hashtext('task_queue:' || %s))", (queue_name,))
+            return self.db.fetch_all(
+                """
+                UPDATE task_queue
+                SET receipt_handle = md5(random()::text || clock_timestamp()::text || message_id::text),
+                    receive_count = receive_count + 1,
+                    visible_at = NOW() + make_interval(secs => %s)
+                WHERE message_id IN (
+                    SELECT candidate.message_id
+                    FROM task_queue candidate
+                    WHERE candidate.queue_name = %s
+                      AND candidate.visible_at <= NOW()
+                      AND NOT EXISTS (
+                          SELECT 1 FROM task_queue busy
+                          WHERE busy.queue_name = candidate.queue_name
+                            AND busy.group_id = candidate.group_id
+                            AND busy.receive_count > 0
+                            AND busy.visible_at > NOW()
+                      )
+                    ORDER BY candidate.message_id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING message_id, receipt_handle, body, group_id, receive_count, sent_at
+                """,
+                (visibility_timeout, queue_name, max_messages),
+            )
+
+    def delete_message(self, QueueUrl, ReceiptHandle) -> dict:
+        with self._database_errors('DeleteMessage'):
+            queue_name = self._queue_name(QueueUrl, 'DeleteMessage')
+            self.db.execute_query(
+                "DELETE FROM task_queue WHERE queue_name = %s AND receipt_handle = %s", (queue_name, ReceiptHandle)
+            )
+            return {}
+
+    def delete_message_batch(self, QueueUrl, Entries) -> dict:
+        with self._database_errors('DeleteMessageBatch'):
+            queue_name = self._queue_name(QueueUrl, 'DeleteMessageBatch')
+            self.db.execute_query(
+                "DELETE FROM task_queue WHERE queue_name = %s AND receipt_handle = ANY(%s)",
+                (queue_name, [entry['ReceiptHandle'] for entry in Entries]),
+            )
+            return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout) -> dict:
+        with self._database_errors('ChangeMessageVisibility'):
+            queue_name = self._queue_name(QueueUrl, 'ChangeMessageVisibility')
+            self.db.execute_query(
+                """
+                UPDATE task_queue SET visible_at = NOW() + make_interval(secs => %s)
+                WHERE queue_name = %s AND receipt_handle = %s
+                """,
+                (VisibilityTimeout, queue_name, ReceiptHandle),
+            )
+            return {}
+
+    def get_queue_attributes(self, QueueUrl, AttributeNames) -> dict:
+        with self._database_errors('GetQueueAttributes'):
+            queue_name, _ = self._get_queue(QueueUrl, 'GetQueueAttributes')
+            visible, in_flight = self.db.fetch_one(
+                """
+                SELECT COUNT(*) FILTER (WHERE visible_at <= NOW()), COUNT(*) FILTER (WHERE visible_at > NOW())
+                FROM task_queue WHERE queue_name = %s
+                """,
+                (queue_name,),
+            )
+            return {
+                'Attributes': {
+                    'ApproximateNumberOfMessages': str(visible),
+                    'ApproximateNumberOfMessagesNotVisible': str(in_flight),
+                }
+            }
+
+
+def create_queue_backend(backend_name=None) -> QueueBackend:
+    """
+    Build the queue backend selected by `backend_name` or the TASK_QUEUE_BACKEND environment variable.
+    :param backend_name: One of 'sqs' (default), 'memory' or 'postgres'.
+    """
+    backend_name = (backend_name or os.getenv('TASK_QUEUE_BACKEND') or 'sqs').lower()
+    if backend_name == 'sqs':
+        return SQSQueueBackend(boto3.client('sqs', region_name=os.getenv('AWS_SQS_REGION')))
+    if backend_name == 'memory':
+        return InMemoryQueueBackend()
+    if backend_name == 'postgres':
+        from app.db.db_utils import get_db
+
+        return PostgresQueueBackend(get_db())
+    raise ValueError(f"Unknown task queue backend: {backend_name}")
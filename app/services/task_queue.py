@@ -1,14 +1,525 @@
-import boto3
 import logging
 import json
 from botocore.exceptions import ClientError
 import os
+import hashlib
+import threading
 import uuid
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from app.managers.failed_task_manager import FailedTaskManager
 from app.models.api_response import APIResponse
+from app.services.queue_backends import QueueBackend, create_queue_backend
+
+# Tasks a user is waiting on are interactive; everything else is bulk work
+TASK_PRIORITY_CLASSES = {
+    'process_single_email': 'interactive',
+    'scrape_job_details': 'interactive',
+    'process_job': 'bulk',
+}
+DEFAULT_PRIORITY_CLASS = 'bulk'
+DEFAULT_CLASS_WEIGHTS = {'interactive': 4, 'bulk': 1}
+
+
+def get_priority_class(task_type) -> str:
+    """Map a task type to its priority class."""
+    return TASK_PRIORITY_CLASSES.get(task_type, DEFAULT_PRIORITY_CLASS)
+
+
+def parse_class_weights(value) -> dict:
+    """Parse class weights given as 'interactive=4,bulk=1', falling back to the defaults for missing classes."""
+    weights = dict(DEFAULT_CLASS_WEIGHTS)
+    for item in (value or '').split(','):
+        if '=' in item:
+            priority_class, weight = item.split('=', 1)
+            weights[priority_class.strip()] = max(1, int(weight))
+    return weights
+
+
+class QueueUrlRegistry:
+    """Thread-safe, TTL-bounded cache of queue name -> queue URL lookups."""
+
+    def __init__(self, ttl_seconds=300):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, queue_name):
+        """Return the cached URL for a queue name, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(queue_name)
+            if entry is not None:
+                queue_url, expires_at = entry
+                if expires_at > time.monotonic():
+                    self.hits += 1
+                    return queue_url
+                del self._entries[queue_name]
+            self.misses += 1
+            return None
+
+    def put(self, queue_name, queue_url):
+        """Cache the URL of a queue for the configured TTL."""
+        with self._lock:
+            self._entries[queue_name] = (queue_url, time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, queue_name=None, queue_url=None):
+        """Drop a cached entry, either by queue name or by queue URL."""
+        with self._lock:
+            if queue_name is not None:
+                self._entries.pop(queue_name, None)
+            if queue_url is not None:
+                for name, (cached_url, _) in list(self._entries.items()):
+                    if cached_url == queue_url:
+                        del self._entries[name]
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Return the hit/miss counters and the current cache size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
+
+class RecentTaskKeys:
+    """Thread-safe, size- and TTL-bounded set of recently enqueued task deduplication keys."""
+
+    def __init__(self, ttl_seconds=300, max_size=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contains(self, key) -> bool:
+        """Check whether a key was added less than ttl_seconds ago."""
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, key):
+        """Remember a key for the configured TTL, evicting the oldest keys beyond max_size."""
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class QueuePollScheduler:
+    """
+    Per-queue poll state for the fan-in scheduler.
+
+    Queues that recently returned messages are polled first and immediately again with a short
+    long-poll wait. Idle queues back off exponentially between polls, which is what keeps their request
+    count low, and are polled without waiting so they never hold one of the few pollers; a queue that was
+    just sent to is woken up and polled right away.
+
+    `wake` only reaches the scheduler of the process that sent the messages, so the backoff is capped at
+    `max_idle_delay` seconds: that is the longest a task sent from another process waits to be picked up.
+    """
+
+    def __init__(self, min_wait_seconds=1, idle_wait_seconds=0, max_idle_delay=5):
+        self.min_wait_seconds = min_wait_seconds
+        self.idle_wait_seconds = idle_wait_seconds
+        self.max_idle_delay = max_idle_delay
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def sync_queues(self, user_queues):
+        """Track newly discovered queues and forget queues that no longer exist."""
+        with self._lock:
+            known_urls = set()
+            for user_id, queue_url in user_queues:
+                known_urls.add(queue_url)
+                if queue_url not in self._states:
+                    self._states[queue_url] = {
+                        'user_id': user_id,
+                        'next_poll_at': 0.0,
+                        'idle_polls': 0,
+                        'last_message_at': 0.0,
+                        'polling': False,
+                        'woken': False,
+                    }
+            for queue_url in list(self._states):
+                if queue_url not in known_urls and not self._states[queue_url]['polling']:
+                    del self._states[queue_url]
+
+    def acquire_due_queues(self, limit) -> list:
+        """
+        Reserve up to `limit` queues that are due for a poll, busiest first.
+        :return: A list of (user_id, queue_url, wait_time_seconds) tuples.
+        """
+        if limit <= 0:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                (queue_url, state)
+                for queue_url, state in self._states.items()
+                if not state['polling'] and state['next_poll_at'] <= now
+            ]
+            due.sort(key=lambda item: (item[1]['idle_polls'], -item[1]['last_message_at']))
+            acquired = []
+            for queue_url, state in due[:limit]:
+                state['polling'] = True
+                acquired.append((state['user_id'], queue_url, self._wait_time(state)))
+            return acquired
+
+    def record_result(self, queue_url, message_count):
+        """Update a queue's priority and backoff after a poll returned `message_count` messages."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(queue_url)
+            if state is None:
+                return
+            state['polling'] = False
+            woken, state['woken'] = state['woken'], False
+            if message_count > 0:
+                state['idle_polls'] = 0
+                state['last_message_at'] = now
+                state['next_poll_at'] = now
+            elif woken:
+                # Sent to while this poll was in progress: the new messages may have been missed
+                state['idle_polls'] = 0
+                state['next_poll_at'] = now
+            else:
+                state['idle_polls'] += 1
+                state['next_poll_at'] = now + min(self.max_idle_delay, 2 ** (state['idle_polls'] - 1))
+
+    def wake(self, queue_url):
+        """Make a queue due immediately, e.g. after sending it messages, instead of waiting out its backoff."""
+        with self._lock:
+            state = self._states.get(queue_url)
+            if state is not None:
+                state['idle_polls'] = 0
+                state['next_poll_at'] = 0.0
+                state['woken'] = state['polling']
+
+    def seconds_until_next_due(self) -> float:
+        """Return how long until the next idle queue becomes due for a poll."""
+        now = time.monotonic()
+        with self._lock:
+            pending = [state['next_poll_at'] for state in self._states.values() if not state['polling']]
+        if not pending:
+            return float(self.max_idle_delay)
+        return max(0.0, min(pending) - now)
+
+    def _wait_time(self, state) -> int:
+        """
+        Short long-poll waits for busy queues. Idle queues are polled without waiting: with a handful of pollers
+        shared by every user, long waits on empty queues would delay the other queues in proportion to their count.
+        """
+        return self.min_wait_seconds if state['idle_polls'] == 0 else self.idle_wait_seconds
+
+
+class InFlightWindow:
+    """Bounds how many received messages may be queued or running at once."""
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, max_count, timeout=None) -> int:
+        """
+        Reserve up to `max_count` slots, waiting until at least one is free or the timeout expires.
+        :return: The number of slots reserved (0 on timeout).
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < self.max_in_flight, timeout=timeout):
+                return 0
+            reserved = min(max_count, self.max_in_flight - self.in_flight)
+            self.in_flight += reserved
+            return reserved
+
+    def available(self) -> int:
+        """Return the number of free slots."""
+        with self._condition:
+            return self.max_in_flight - self.in_flight
+
+    def wait_for_slot(self, timeout=None) -> bool:
+        """Block until at least one slot is free, without reserving it."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.in_flight < self.max_in_flight, timeout=timeout)
+
+    def release(self, count=1):
+        """Free previously reserved slots."""
+        if count <= 0:
+            return
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - count)
+            self._condition.notify_all()
+
+    def wait_until_empty(self, timeout=None) -> bool:
+        """Block until every reserved slot has been released."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.in_flight == 0, timeout=timeout)
+
+
+class AckBuffer:
+    """
+    Buffers processed messages per queue and deletes them through delete_message_batch,
+    flushing whenever a queue has a full batch or after a short interval.
+    """
+
+    def __init__(self, delete_batch, batch_size=10, flush_interval=1.0):
+        self.delete_batch = delete_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, queue_url, receipt_handle):
+        """Queue a receipt handle for deletion."""
+        self._ensure_started()
+        batch = None
+        with self._lock:
+            handles = self._pending.setdefault(queue_url, [])
+            handles.append(receipt_handle)
+            if len(handles) >= self.batch_size:
+                batch = handles[: self.batch_size]
+                del handles[: self.batch_size]
+        if batch:
+            self.delete_batch(queue_url, batch)
+
+    def flush(self):
+        """Delete every buffered message now."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        for queue_url, handles in pending.items():
+            for i in range(0, len(handles), self.batch_size):
+                self.delete_batch(queue_url, handles[i : i + self.batch_size])
+
+    def stop(self):
+        """Stop the background flusher and delete whatever is still buffered."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._stop_event.clear()
+                    self._thread = threading.Thread(target=self._flush_loop, name="TaskQueueAckFlusher", daemon=True)
+                    self._thread.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing acknowledged messages: {str(e)}")
+
+
+class VisibilityHeartbeat:
+    """Periodically extends the visibility timeout of messages whose tasks are still running."""
+
+    def __init__(self, change_visibility, visibility_timeout=60, interval=None):
+        self.change_visibility = change_visibility
+        self.visibility_timeout = visibility_timeout
+        self.interval = interval or max(1, visibility_timeout // 2)
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def track(self, queue_url, receipt_handle):
+        """Start extending the visibility of a message."""
+        with self._lock:
+            self._tracked[receipt_handle] = queue_url
+
+    def untrack(self, receipt_handle):
+        """Stop extending the visibility of a message."""
+        with self._lock:
+            self._tracked.pop(receipt_handle, None)
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="TaskQueueHeartbeat", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                tracked = list(self._tracked.items())
+            for receipt_handle, queue_url in tracked:
+                self.change_visibility(queue_url, receipt_handle, self.visibility_timeout)
+
+
+class AdaptiveRateController:
+    """
+    Token bucket for outgoing send batches whose rate follows AIMD: it grows additively while
+    SQS accepts batches and is cut multiplicatively whenever SQS throttles.
+    """
+
+    def __init__(self, initial_rate=50.0, min_rate=1.0, max_rate=300.0, burst=10, increase_step=1.0, decrease_factor=0.5):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.throttle_count = 0
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a batch may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+    def on_success(self):
+        """Additive increase after an accepted batch."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self):
+        """Multiplicative decrease after a throttled batch."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = 0.0
+            self.throttle_count += 1
+            logging.warning(f"SQS throttled a send, lowering send rate to {self.rate:.1f} batches/s")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {"rate": self.rate, "throttle_count": self.throttle_count}
+
+
+class FairTaskScheduler:
+    """
+    Buffer of received tasks handed out by weighted round robin across priority classes and plain round robin
+    across users within a class, so one user's bulk import cannot starve other users or their own interactive tasks.
+    """
+
+    def __init__(self, class_weights=None):
+        self.class_weights = dict(class_weights or DEFAULT_CLASS_WEIGHTS)
+        self._pending = {}
+        self._current_weights = {}
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._condition:
+            return self._size
+
+    def put(self, priority_class, user_id, task):
+        """Buffer a task behind the user's other pending tasks of the same class."""
+        with self._condition:
+            users = self._pending.setdefault(priority_class, OrderedDict())
+            users.setdefault(user_id, deque()).append(task)
+            self._size += 1
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Take the next task in fair order, or return None if none arrives within `timeout` seconds."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._size > 0, timeout=timeout):
+                return None
+
+            priority_class = self._next_class()
+            users = self._pending[priority_class]
+            user_id, tasks = next(iter(users.items()))
+            task = tasks.popleft()
+            if tasks:
+                users.move_to_end(user_id)
+            else:
+                del users[user_id]
+            if not users:
+                del self._pending[priority_class]
+                self._current_weights.pop(priority_class, None)
+            self._size -= 1
+            return task
+
+    def _next_class(self) -> str:
+        """Smooth weighted round robin over the classes that have pending tasks."""
+        total_weight = 0
+        selected = None
+        for priority_class in self._pending:
+            weight = self.class_weights.get(priority_class, 1)
+            self._current_weights[priority_class] = self._current_weights.get(priority_class, 0) + weight
+            total_weight += weight
+            if selected is None or self._current_weights[priority_class] > self._current_weights[selected]:
+                selected = priority_class
+        self._current_weights[selected] -= total_weight
+        return selected
+
+
+class TaskLatencyTracker:
+    """Per priority class latency from enqueue to task start (queue wait) and to task completion (total)."""
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, priority_class, queue_wait, total):
+        with self._lock:
+            samples = self._samples.setdefault(
+                priority_class, {"queue_wait": deque(maxlen=self.max_samples), "total": deque(maxlen=self.max_samples)}
+            )
+            samples["queue_wait"].append(queue_wait)
+            samples["total"].append(total)
+            self._counts[priority_class] = self._counts.get(priority_class, 0) + 1
+
+    @staticmethod
+    def _percentile(sorted_values, percentile) -> float:
+        index = int(round(percentile * (len(sorted_values) - 1)))
+        return sorted_values[index]
+
+    def get_stats(self) -> dict:
+        """Count plus p50/p95/max in seconds over the most recent samples of each class."""
+        stats = {}
+        with self._lock:
+            for priority_class, samples in self._samples.items():
+                class_stats = {"count": self._counts[priority_class]}
+                for name, values in samples.items():
+                    sorted_values = sorted(values)
+                    class_stats[f"{name}_p50"] = self._percentile(sorted_values, 0.5)
+                    class_stats[f"{name}_p95"] = self._percentile(sorted_values, 0.95)
+                    class_stats[f"{name}_max"] = sorted_values[-1]
+                stats[priority_class] = class_stats
+        return stats
 
 
 class TaskQueue:
@@ -25,19 +536,69 @@ class TaskQueue:
             TaskQueue._initialized = True
             self.is_processing = False
             self.callbacks = {}
-            region_name = os.getenv('AWS_SQS_REGION')
-            self.sqs_client = boto3.client('sqs', region_name=region_name)
+            self.backend = create_queue_backend()
             self.base_queue_url = os.getenv('AWS_SQS_QUEUE_URL')
             num_workers = os.getenv('TASK_QUEUE_NUM_WORKERS')
             self.num_workers = int(num_workers) if num_workers else 1
-            self.executor = ThreadPoolExecutor(max_workers=self.num_workers)
+            self.executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="TaskQueueWorker")
+            max_in_flight = os.getenv('TASK_QUEUE_MAX_IN_FLIGHT')
+            self.in_flight = InFlightWindow(int(max_in_flight) if max_in_flight else self.num_workers * 2)
+            self._receiver_thread = None
+            queue_url_cache_ttl = os.getenv('TASK_QUEUE_URL_CACHE_TTL')
+            self.queue_url_registry = QueueUrlRegistry(int(queue_url_cache_ttl) if queue_url_cache_ttl else 300)
+            # 'fanin' polls many queues concurrently and needs TASK_QUEUE_NUM_POLLERS sized for the deployment's
+            # queue count and request budget, so existing deployments keep the sequential loop until they opt in
+            self.scheduler_mode = os.getenv('TASK_QUEUE_SCHEDULER', 'sequential').lower()
+            num_pollers = os.getenv('TASK_QUEUE_NUM_POLLERS')
+            self.num_pollers = int(num_pollers) if num_pollers else 4
+            refresh_interval = os.getenv('TASK_QUEUE_REFRESH_INTERVAL')
+            self.queue_refresh_interval = int(refresh_interval) if refresh_interval else 30
+            max_idle_delay = os.getenv('TASK_QUEUE_MAX_IDLE_DELAY')
+            self.poll_scheduler = QueuePollScheduler(max_idle_delay=int(max_idle_delay) if max_idle_delay else 5)
+            self.poller_executor = None
+            visibility_timeout = os.getenv('TASK_QUEUE_VISIBILITY_TIMEOUT')
+            self.visibility_timeout = int(visibility_timeout) if visibility_timeout else 60
+            self.heartbeat = VisibilityHeartbeat(self._change_message_visibility, self.visibility_timeout)
+            send_rate = os.getenv('TASK_QUEUE_SEND_RATE')
+            self.rate_controller = AdaptiveRateController(initial_rate=float(send_rate) if send_rate else 50.0)
+            send_parallelism = os.getenv('TASK_QUEUE_SEND_PARALLELISM')
+            self.send_parallelism = int(send_parallelism) if send_parallelism else 1
+            self.sender_executor = (
+                ThreadPoolExecutor(max_workers=self.send_parallelism, thread_name_prefix="TaskQueueSender")
+                if self.send_parallelism > 1
+                else None
+            )
+            ack_flush_interval = os.getenv('TASK_QUEUE_ACK_FLUSH_INTERVAL')
+            self.task_scheduler = FairTaskScheduler(parse_class_weights(os.getenv('TASK_QUEUE_CLASS_WEIGHTS')))
+            self.latency_tracker = TaskLatencyTracker()
+            self._worker_slots = threading.Semaphore(self.num_workers)
+            self._dispatcher_thread = None
+            # SQS FIFO queues deduplicate for 5 minutes; the local cache skips the request altogether
+            self.recent_task_keys = RecentTaskKeys(ttl_seconds=300)
+            max_attempts = os.getenv('TASK_QUEUE_MAX_ATTEMPTS')
+            self.max_attempts = int(max_attempts) if max_attempts else 5
+            self.partition_index = 0
+            self.partition_count = 1
+            self.ack_buffer = AckBuffer(
+                self._delete_message_batch, flush_interval=float(ack_flush_interval) if ack_flush_interval else 1.0
+            )
+
+    @property
+    def sqs_client(self) -> QueueBackend:
+        """Backwards-compatible name for the queue backend."""
+        return self.backend
+
+    @sqs_client.setter
+    def sqs_client(self, backend):
+        self.backend = backend
 
     def register_callback(self, task_type, callback):
         """Register a callback function for a specific task type."""
         self.callbacks[task_type] = callback
 
-    def get_user_queue_url(self, user_id, is_fifo=True) -> str:
-        """Retrieve the queue URL for a user, creating the queue only if it doesn't exist."""
+    @staticmethod
+    def get_user_queue_name(user_id, is_fifo=True) -> str:
+        """Build the SQS queue name used for a user."""
         # Sanitize the user_id to comply with SQS FIFO naming rules
         sanitized_user_id = ''.join(e for e in str(user_id) if e.isalnum() or e in ['-', '_'])
 
@@ -45,29 +606,65 @@ class TaskQueue:
         queue_name = f"user_{sanitized_user_id}_queue"
         if is_fifo:
             queue_name += ".fifo"
+        return queue_name
+
+    @staticmethod
+    def _is_queue_missing(error: ClientError) -> bool:
+        """Check whether a ClientError means the queue no longer exists."""
+        error_code = error.response.get('Error', {}).get('Code', '')
+        return error_code in ('AWS.SimpleQueueService.NonExistentQueue', 'QueueDoesNotExist')
+
+    def _handle_client_error(self, error: ClientError, user_id=None, queue_url=None):
+        """Invalidate cached queue URLs when SQS reports the queue is gone."""
+        if not self._is_queue_missing(error):
+            return
+        if user_id is not None:
+            logging.warning(f"Queue for user {user_id} no longer exists, invalidating cached URL")
+            self.queue_url_registry.invalidate(queue_name=self.get_user_queue_name(user_id))
+        if queue_url is not None:
+            logging.warning(f"Queue {queue_url} no longer exists, invalidating cached URL")
+            self.queue_url_registry.invalidate(queue_url=queue_url)
+
+    def get_user_queue_url(self, user_id, is_fifo=True) -> str:
+        """Retrieve the queue URL for a user, creating the queue only if it doesn't exist."""
+        queue_name = self.get_user_queue_name(user_id, is_fifo)
+
+        queue_url = self.queue_url_registry.get(queue_name)
+        if queue_url is not None:
+            return queue_url
 
         try:
             # Check if the queue already exists by trying to get its URL
-            response = self.sqs_client.get_queue_url(QueueName=queue_name)
+            response = self.backend.get_queue_url(QueueName=queue_name)
             queue_url = response['QueueUrl']
             logging.info(f"Queue already exists for user {user_id}: {queue_url}")
 
-        except self.sqs_client.exceptions.QueueDoesNotExist:
+        except ClientError as e:
+            if not self._is_queue_missing(e):
+                logging.error(f"Error retrieving or creating queue for user {user_id}: {str(e)}")
+                raise
             # If the queue doesn't exist, create it
             logging.info(f"Queue does not exist for user {user_id}. Creating new queue...")
             attributes = (
                 {'FifoQueue': 'true', 'ContentBasedDeduplication': 'true'} if is_fifo else {'ContentBasedDeduplication': 'true'}
             )
-            create_response = self.sqs_client.create_queue(QueueName=queue_name, Attributes=attributes)
+            create_response = self.backend.create_queue(QueueName=queue_name, Attributes=attributes)
             queue_url = create_response['QueueUrl']
             logging.info(f"Created new queue for user {user_id}: {queue_url}")
 
-        except ClientError as e:
-            logging.error(f"Error retrieving or creating queue for user {user_id}: {str(e)}")
-            raise
-
+        self.queue_url_registry.put(queue_name, queue_url)
         return queue_url
 
+    def get_send_rate_stats(self) -> APIResponse:
+        """Get the current send rate of the adaptive rate controller."""
+        return APIResponse(status="success", message="Send rate stats retrieved", data=self.rate_controller.get_stats())
+
+    def get_queue_url_cache_stats(self) -> APIResponse:
+        """Get the hit/miss counters of the queue URL registry."""
+        return APIResponse(
+            status="success", message="Queue URL cache stats retrieved", data=self.queue_url_registry.get_stats()
+        )
+
     def add_task(self, user_id, type, task_data) -> APIResponse:
         """Add a single task to the user's SQS queue."""
         if not type:
@@ -82,7 +679,7 @@ class TaskQueue:
         """Retrieve a task from the user's SQS queue."""
         try:
             queue_url = self.get_user_queue_url(user_id)
-            response = self.sqs_client.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=1, WaitTimeSeconds=10)
+            response = self.backend.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=1, WaitTimeSeconds=10)
 
             if 'Messages' in response:
                 message = response['Messages'][0]
@@ -99,48 +696,39 @@ class TaskQueue:
                 return APIResponse(status="success", message="No tasks available for user", data=None)
         except ClientError as e:
             logging.error(f"Failed to receive message from SQS for user {user_id}: {str(e)}")
+            self._handle_client_error(e, user_id=user_id)
             return APIResponse(status="failure", message="Failed to retrieve task from queue")
 
     def delete_task(self, user_id, receipt_handle) -> APIResponse:
         """Delete a task from the user's SQS queue."""
         try:
             queue_url = self.get_user_queue_url(user_id)
-            self.sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=receipt_handle)
+            self.backend.delete_message(QueueUrl=queue_url, ReceiptHandle=receipt_handle)
             logging.info(f"Task successfully deleted from SQS queue for user {user_id}.")
             return APIResponse(status="success", message="Task deleted successfully")
         except ClientError as e:
             logging.error(f"Failed to delete message from SQS for user {user_id}: {str(e)}")
+            self._handle_client_error(e, user_id=user_id)
             return APIResponse(status="failure", message="Failed to delete task from queue")
 
     def get_callback_names(self) -> list:
         """Get a list of registered callback names."""
         return list(self.callbacks.keys())
 
-    def process_message(self, user_id, message) -> APIResponse:
-        """Process a message from the user's specific queue."""
-        try:
-            task_data = json.loads(message['Body'])
-            task_type = task_data.get('type')
-
-            if task_type in self.callbacks:
-                callback_result = self.callbacks[task_type](task_data)
-                queue_url = self.get_user_queue_url(user_id)
-                self.sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
-                return APIResponse(status="success", message="Message processed and deleted", data=callback_result)
-            else:
-                logging.warning(f"No callback registered for task type: {task_type}")
-                return APIResponse(status="failure", message=f"No callback registered for task type: {task_type}")
-        except json.JSONDecodeError:
-            logging.error("Failed to parse message body as JSON")
-            return APIResponse(status="failure", message="Failed to parse message body")
-        except ClientError as e:
-            logging.error(f"Error processing message for user {user_id}: {str(e)}")
-            return APIResponse(status="failure", message="Error processing message")
-
     def start_processing(self) -> APIResponse:
         try:
             self.is_processing = True
-            self.executor.submit(self._processing_loop)
+            if self.scheduler_mode == 'fanin':
+                self.poller_executor = ThreadPoolExecutor(max_workers=self.num_pollers, thread_name_prefix="TaskQueuePoller")
+                receiver = self._fanin_processing_loop
+            else:
+                receiver = self._processing_loop
+            # The receiver gets its own thread so it never competes with the workers running the tasks
+            self._receiver_thread = threading.Thread(target=receiver, name="TaskQueueReceiver", daemon=True)
+            self._receiver_thread.start()
+            self._dispatcher_thread = threading.Thread(target=self._dispatch_loop, name="TaskQueueDispatcher", daemon=True)
+            self._dispatcher_thread.start()
+            self.heartbeat.start()
             return APIResponse(status="success", message="Task processing started")
         except Exception as e:
             logging.error(f"Failed to start processing: {str(e)}")
@@ -149,7 +737,18 @@ class TaskQueue:
     def stop_processing(self) -> APIResponse:
         try:
             self.is_processing = False
+            if self._receiver_thread is not None:
+                self._receiver_thread.join()
+                self._receiver_thread = None
+            if self._dispatcher_thread is not None:
+                # The dispatcher hands out whatever is still buffered before it exits
+                self._dispatcher_thread.join()
+                self._dispatcher_thread = None
+            if self.poller_executor is not None:
+                self.poller_executor.shutdown(wait=True)
             self.executor.shutdown(wait=True)
+            self.heartbeat.stop()
+            self.ack_buffer.stop()
             return APIResponse(status="success", message="Task processing stopped")
         except Exception as e:
             logging.error(f"Failed to stop processing: {str(e)}")
@@ -159,7 +758,7 @@ class TaskQueue:
         """Check if there are any messages in the user's queue directly."""
         try:
             queue_url = self.get_user_queue_url(user_id)
-            response = self.sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessages'])
+            response = self.backend.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessages'])
 
             visible_count = int(response['Attributes'].get('ApproximateNumberOfMessages', 0))
             if visible_count > 0:
@@ -173,13 +772,14 @@ class TaskQueue:
 
         except ClientError as e:
             logging.error(f"Error checking for tasks for user {user_id}: {str(e)}")
+            self._handle_client_error(e, user_id=user_id)
             return APIResponse(status="failure", message="Error checking for tasks")
 
     def get_task_count_for_user(self, user_id) -> APIResponse:
         """Get the number of messages in the user's queue directly."""
         try:
             queue_url = self.get_user_queue_url(user_id)
-            response = self.sqs_client.get_queue_attributes(
+            response = self.backend.get_queue_attributes(
                 QueueUrl=queue_url, AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible']
             )
 
@@ -196,34 +796,92 @@ class TaskQueue:
             )
         except ClientError as e:
             logging.error(f"Error getting task count for user {user_id}: {str(e)}")
+            self._handle_client_error(e, user_id=user_id)
             return APIResponse(status="failure", message="Error getting task count")
 
-    def process_message(self, user_id, message) -> APIResponse:
-        """Process a message from the user's specific queue."""
+    def process_message(self, user_id, message, queue_url=None) -> APIResponse:
+        """Process a message from the user's specific queue and hand it to the ack buffer for deletion."""
+        if queue_url is None:
+            queue_url = self.get_user_queue_url(user_id)
         try:
             task_data = json.loads(message['Body'])
-            task_type = task_data.get('type')
-
-            if task_type in self.callbacks:
-                callback_result = self.callbacks[task_type](task_data)
-                queue_url = self.get_user_queue_url(user_id)
-                self.sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
-                return APIResponse(status="success", message="Message processed and deleted", data=callback_result)
-            else:
-                logging.warning(f"No callback registered for task type: {task_type}")
-                return APIResponse(status="failure", message=f"No callback registered for task type: {task_type}")
         except json.JSONDecodeError:
             logging.error("Failed to parse message body as JSON")
+            # A malformed body will never parse, so there is no point in retrying it
+            self._quarantine_message(user_id, queue_url, message, None, "Failed to parse message body as JSON")
             return APIResponse(status="failure", message="Failed to parse message body")
+
+        task_type = task_data.get('type')
+        try:
+            if task_type not in self.callbacks:
+                logging.warning(f"No callback registered for task type: {task_type}")
+                self._handle_failed_message(user_id, queue_url, message, task_type, f"No callback registered for task type: {task_type}")
+                return APIResponse(status="failure", message=f"No callback registered for task type: {task_type}")
+
+            callback_result = self.callbacks[task_type](task_data)
+            self.ack_buffer.add(queue_url, message['ReceiptHandle'])
+            return APIResponse(status="success", message="Message processed and acknowledged", data=callback_result)
         except ClientError as e:
             logging.error(f"Error processing message for user {user_id}: {str(e)}")
+            self._handle_client_error(e, user_id=user_id)
             return APIResponse(status="failure", message="Error processing message")
+        except Exception as e:
+            logging.error(f"Task {task_type} failed for user {user_id}: {str(e)}")
+            self._handle_failed_message(user_id, queue_url, message, task_type, str(e))
+            return APIResponse(status="failure", message=f"Task {task_type} failed")
+
+    def _handle_failed_message(self, user_id, queue_url, message, task_type, error):
+        """Retry a failed message after a backoff, or quarantine it once it has used up its attempts."""
+        receive_count = int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1))
+        if receive_count >= self.max_attempts:
+            self._quarantine_message(user_id, queue_url, message, task_type, error)
+            return
+
+        # Stop extending the visibility, then make the message visible again after an exponential backoff
+        self.heartbeat.untrack(message['ReceiptHandle'])
+        retry_delay = min(self.visibility_timeout, 2**receive_count)
+        logging.info(f"Retrying {task_type} task for user {user_id} in {retry_delay}s (attempt {receive_count} of {self.max_attempts})")
+        self._change_message_visibility(queue_url, message['ReceiptHandle'], retry_delay)
+
+    def _quarantine_message(self, user_id, queue_url, message, task_type, error):
+        """Move a message to the failed_tasks table and delete it from the queue."""
+        receive_count = int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1))
+        response = FailedTaskManager().add_failed_task(
+            user_id, task_type, message['Body'], error, receive_count, message.get('MessageId')
+        )
+        # If the task could not be stored it stays in the queue and is quarantined on a later attempt
+        if response.status == "success":
+            self.ack_buffer.add(queue_url, message['ReceiptHandle'])
+
+    def get_failed_tasks(self, user_id=None, limit=100) -> APIResponse:
+        """List the quarantined tasks, optionally for a single user."""
+        return FailedTaskManager().get_failed_tasks(user_id, limit)
+
+    def replay_failed_task(self, failed_task_id) -> APIResponse:
+        """Put a quarantined task back on its user's queue with a fresh attempt count."""
+        failed_task_manager = FailedTaskManager()
+        failed_task_response = failed_task_manager.get_failed_task(failed_task_id)
+        if failed_task_response.status != "success":
+            return failed_task_response
+
+        failed_task = failed_task_response.data
+        try:
+            task = json.loads(failed_task['message_body'])
+        except json.JSONDecodeError:
+            return APIResponse(status="failure", message="Failed task body is not valid JSON and cannot be replayed")
+
+        # The task was enqueued before, so its deduplication ID must not be reused
+        response = self.add_tasks(failed_task['user_id'], [task], deduplicate=False)
+        if response.status != "success":
+            return response
+        failed_task_manager.delete_failed_task(failed_task_id)
+        return APIResponse(status="success", message="Failed task replayed successfully", data={"failed_task_id": failed_task_id})
 
     def get_tasks(self, user_id) -> APIResponse:
         """Retrieve tasks for a specific user from the user's queue."""
         try:
             queue_url = self.get_user_queue_url(user_id)
-            response = self.sqs_client.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=10)
+            response = self.backend.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=10)
 
             tasks = []
             if 'Messages' in response:
@@ -242,13 +900,14 @@ class TaskQueue:
                 return APIResponse(status="success", message="No tasks found for the user", data=[])
         except ClientError as e:
             logging.error(f"Failed to receive messages for user {user_id}: {str(e)}")
+            self._handle_client_error(e, user_id=user_id)
             return APIResponse(status="failure", message="Failed to retrieve tasks")
 
     def has_task_for_user(self, user_id) -> APIResponse:
         """Check if there are any tasks for the given user in the queue."""
         try:
             queue_url = self.get_user_queue_url(user_id)
-            response = self.sqs_client.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=0)
+            response = self.backend.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=0)
 
             if 'Messages' in response:
                 for message in response['Messages']:
@@ -268,12 +927,13 @@ class TaskQueue:
 
         except ClientError as e:
             logging.error(f"Error checking for tasks for user {user_id}: {str(e)}")
+            self._handle_client_error(e, user_id=user_id)
             return APIResponse(status="failure", message="Error checking for tasks")
 
     def get_all_queues(self) -> APIResponse:
         """Retrieve all queues and return a list of (user_id, queue_url) tuples."""
         try:
-            response = self.sqs_client.list_queues()
+            response = self.backend.list_queues()
             queue_urls = response.get('QueueUrls', [])
             user_queue_tuples = []
 
@@ -287,6 +947,7 @@ class TaskQueue:
                         user_id_part = queue_name.split('_')[1]
                         user_id = int(user_id_part)  # Assuming user_id is an integer
                         user_queue_tuples.append((user_id, queue_url))
+                        self.queue_url_registry.put(queue_name, queue_url)
                     except (IndexError, ValueError):
                         logging.warning(f"Unable to parse user_id from queue name: {queue_name}")
 
@@ -296,73 +957,284 @@ class TaskQueue:
             logging.error(f"Error retrieving all queues: {str(e)}")
             return APIResponse(status="failure", message="Error retrieving all queues")
 
+    def set_partition(self, partition_index, partition_count):
+        """Only receive from the user queues where user_id % partition_count == partition_index."""
+        if partition_count < 1 or not 0 <= partition_index < partition_count:
+            raise ValueError(f"Invalid partition {partition_index} of {partition_count}")
+        self.partition_index = partition_index
+        self.partition_count = partition_count
+
+    def get_partition_queues(self) -> APIResponse:
+        """Retrieve the (user_id, queue_url) tuples owned by this listener's partition."""
+        response = self.get_all_queues()
+        if response.status != "success" or self.partition_count == 1:
+            return response
+        user_queue_tuples = [
+            (user_id, queue_url)
+            for user_id, queue_url in response.data
+            if user_id % self.partition_count == self.partition_index
+        ]
+        return APIResponse(status="success", message="Partition queues retrieved successfully", data=user_queue_tuples)
+
     def _processing_loop(self):
-        """Continuously process tasks from all users' queues."""
-        futures = []
+        """Continuously receive tasks from all users' queues and stream them to the worker pool."""
         while self.is_processing:
+            user_queues = self.get_partition_queues().data
+            if not user_queues:
+                time.sleep(1)
+                continue
+
+            for user_id, queue_url in user_queues:
+                reserved = 0
+                while self.is_processing and not reserved:
+                    reserved = self.in_flight.acquire(10, timeout=1)
+                if not reserved:
+                    break
+
+                try:
+                    messages = self._poll_queue(queue_url, 10, reserved)
+                except ClientError as e:
+                    logging.error(f"Error receiving messages: {e}")
+                    self._handle_client_error(e, queue_url=queue_url)
+                    messages = []
+
+                self.in_flight.release(reserved - len(messages))
+                for message in messages:
+                    self._dispatch_message(user_id, queue_url, message)
+
+    def _fanin_processing_loop(self):
+        """Poll all users' queues concurrently through the poller pool and fan the messages in."""
+        poll_futures = {}
+        last_refresh = 0.0
+        while self.is_processing:
+            now = time.monotonic()
+            if now - last_refresh >= self.queue_refresh_interval:
+                queues_response = self.get_partition_queues()
+                if queues_response.status == "success":
+                    self.poll_scheduler.sync_queues(queues_response.data)
+                last_refresh = now
+
+            # Reserve in-flight slots before polling so a poll never receives more than the workers can take
+            while len(poll_futures) < self.num_pollers and self.in_flight.available() > 0:
+                due_queues = self.poll_scheduler.acquire_due_queues(1)
+                if not due_queues:
+                    break
+                user_id, queue_url, wait_time = due_queues[0]
+                reserved = self.in_flight.acquire(10, timeout=0)
+                future = self.poller_executor.submit(self._poll_queue, queue_url, wait_time, reserved)
+                poll_futures[future] = (user_id, queue_url, reserved)
+
+            if not poll_futures:
+                if self.in_flight.available() == 0:
+                    self.in_flight.wait_for_slot(timeout=1)
+                else:
+                    time.sleep(min(1.0, self.poll_scheduler.seconds_until_next_due()))
+                continue
+
+            done, _ = wait(poll_futures, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                user_id, queue_url, reserved = poll_futures.pop(future)
+                try:
+                    messages = future.result()
+                except ClientError as e:
+                    logging.error(f"Error receiving messages for user {user_id}: {e}")
+                    self._handle_client_error(e, queue_url=queue_url)
+                    messages = []
+                self.poll_scheduler.record_result(queue_url, len(messages))
+
+                self.in_flight.release(reserved - len(messages))
+                for message in messages:
+                    self._dispatch_message(user_id, queue_url, message)
+
+    def _poll_queue(self, queue_url, wait_time, max_messages=10) -> list:
+        """Long-poll a single queue and return the received messages."""
+        response = self.backend.receive_message(
+            QueueUrl=queue_url,
+            MaxNumberOfMessages=max_messages,
+            WaitTimeSeconds=wait_time,
+            VisibilityTimeout=self.visibility_timeout,
+            AttributeNames=['ApproximateReceiveCount', 'SentTimestamp', 'MessageGroupId'],
+        )
+        return response.get('Messages', [])
+
+    def _dispatch_message(self, user_id, queue_url, message):
+        """Buffer a received message in the fair scheduler; its in-flight slot is held until the task completes."""
+        self.heartbeat.track(queue_url, message['ReceiptHandle'])
+        # Messages are grouped by task type, so the group tells the class without parsing the body
+        task_type = message.get('Attributes', {}).get('MessageGroupId')
+        if task_type is None:
             try:
-                user_queues = self.get_all_queues().data
-                for user_id, queue_url in user_queues:
-                    response = self.sqs_client.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10, WaitTimeSeconds=10)
-                    messages = response.get('Messages', [])
+                task_type = json.loads(message['Body']).get('type')
+            except (json.JSONDecodeError, AttributeError):
+                task_type = None
+        priority_class = get_priority_class(task_type)
+        self.task_scheduler.put(priority_class, user_id, (user_id, queue_url, message, priority_class))
 
-                    for message in messages:
-                        future = self.executor.submit(self.process_message, user_id, message)
-                        futures.append(future)
+    def _dispatch_loop(self):
+        """Hand buffered tasks to the workers in fair order, one at a time as workers become free."""
+        while self.is_processing or len(self.task_scheduler):
+            if not self._worker_slots.acquire(timeout=1):
+                continue
+            task = self.task_scheduler.get(timeout=1)
+            if task is None:
+                self._worker_slots.release()
+                continue
+            receipt_handle = task[2]['ReceiptHandle']
+            future = self.executor.submit(self._run_task, *task)
+            future.add_done_callback(lambda done, receipt_handle=receipt_handle: self._on_task_done(done, receipt_handle))
 
-                # Process completed futures
-                for future in as_completed(futures):
-                    try:
-                        result = future.result()
-                        if result.status == "success":
-                            logging.info(f"Task processed successfully: {result.message}")
-                        else:
-                            logging.error(f"Task processing failed: {result.message}")
-                    except Exception as e:
-                        logging.error(f"Error processing task: {str(e)}")
+    def _run_task(self, user_id, queue_url, message, priority_class) -> APIResponse:
+        """Process a message and record its latency against its priority class."""
+        started_at = time.time()
+        result = self.process_message(user_id, message, queue_url)
+        sent_timestamp = message.get('Attributes', {}).get('SentTimestamp')
+        if sent_timestamp is not None:
+            sent_at = int(sent_timestamp) / 1000
+            self.latency_tracker.record(priority_class, started_at - sent_at, time.time() - sent_at)
+        return result
 
-                # Clear the futures list to prevent accumulation
-                futures.clear()
+    def _on_task_done(self, future, receipt_handle):
+        """Stop the task's heartbeat, free its worker and in-flight slot and log its outcome."""
+        self.heartbeat.untrack(receipt_handle)
+        self._worker_slots.release()
+        self.in_flight.release()
+        self._log_task_result(future)
 
-            except ClientError as e:
-                logging.error(f"Error receiving messages: {e}")
+    def get_latency_metrics(self) -> APIResponse:
+        """Get queue wait and total latency percentiles per priority class, in seconds."""
+        return APIResponse(status="success", message="Latency metrics retrieved", data=self.latency_tracker.get_stats())
+
+    def _delete_message_batch(self, queue_url, receipt_handles):
+        """Delete up to 10 processed messages from a queue in a single request."""
+        entries = [{'Id': str(i), 'ReceiptHandle': receipt_handle} for i, receipt_handle in enumerate(receipt_handles)]
+        try:
+            response = self.backend.delete_message_batch(QueueUrl=queue_url, Entries=entries)
+            for failure in response.get('Failed', []):
+                logging.error(f"Failed to delete message {failure['Id']} from {queue_url}: {failure.get('Message')}")
+            logging.info(f"Deleted {len(response.get('Successful', []))} processed messages from {queue_url}")
+        except ClientError as e:
+            logging.error(f"Error deleting processed messages from {queue_url}: {str(e)}")
+            self._handle_client_error(e, queue_url=queue_url)
 
-    def add_tasks(self, user_id, tasks) -> APIResponse:
-        """Add multiple tasks to the user's SQS queue."""
+    def _change_message_visibility(self, queue_url, receipt_handle, visibility_timeout):
+        """Change the visibility timeout of a received message, to extend its processing time or schedule a retry."""
+        try:
+            self.backend.change_message_visibility(
+                QueueUrl=queue_url, ReceiptHandle=receipt_handle, VisibilityTimeout=visibility_timeout
+            )
+            logging.debug(f"Set visibility of message in {queue_url} to {visibility_timeout} seconds")
+        except ClientError as e:
+            logging.warning(f"Failed to change visibility of message in {queue_url}: {str(e)}")
+            self._handle_client_error(e, queue_url=queue_url)
+
+    @staticmethod
+    def _log_task_result(future):
+        """Log the outcome of a processed task."""
+        try:
+            result = future.result()
+            if result.status == "success":
+                logging.info(f"Task processed successfully: {result.message}")
+            else:
+                logging.error(f"Task processing failed: {result.message}")
+        except Exception as e:
+            logging.error(f"Error processing task: {str(e)}")
+
+    @staticmethod
+    def get_task_deduplication_id(task) -> str:
+        """
+        Build a content-addressed deduplication ID for a task.
+        Tasks about a job are keyed on (user_id, type, job_id); other tasks on their full task data.
+        """
+        task_data = task.get('task_data') or {}
+        job_id = task_data.get('job_id') if isinstance(task_data, dict) else None
+        if job_id is not None:
+            key = f"{task['user_id']}:{task['type']}:{job_id}"
+        else:
+            key = f"{task['user_id']}:{task['type']}:{json.dumps(task_data, sort_keys=True, default=str)}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def add_tasks(self, user_id, tasks, deduplicate=True) -> APIResponse:
+        """
+        Add multiple tasks to the user's SQS queue.
+        Tasks already enqueued recently are skipped unless `deduplicate` is False, e.g. when replaying a task.
+        """
         if not user_id:
             return APIResponse(status="failure", message="User ID is required")
         if not tasks or not isinstance(tasks, list):
             return APIResponse(status="failure", message="Tasks must be provided as a list")
 
+        keyed_tasks = []
+        seen_keys = set()
+        for task in tasks:
+            deduplication_id = self.get_task_deduplication_id(task) if deduplicate else uuid.uuid4().hex
+            if deduplication_id in seen_keys or self.recent_task_keys.contains(deduplication_id):
+                continue
+            seen_keys.add(deduplication_id)
+            keyed_tasks.append((task, deduplication_id))
+
+        skipped = len(tasks) - len(keyed_tasks)
+        if skipped:
+            logging.info(f"Skipped {skipped} duplicate tasks for user {user_id}")
+        if not keyed_tasks:
+            return APIResponse(status="success", message="All tasks were already queued", data={"successful": [], "skipped": skipped})
+
         queue_url = self.get_user_queue_url(user_id)
-        return self._batch_and_send_tasks(queue_url, tasks)
+        response = self._batch_and_send_tasks(queue_url, keyed_tasks)
+        response.data["skipped"] = skipped
+        return response
 
     def _batch_and_send_tasks(self, queue_url, tasks):
+        """Send (task, deduplication_id) pairs to a queue in batches of 10."""
         BATCH_SIZE = 10
         MAX_RETRIES = 5
         INITIAL_BACKOFF = 0.5
         MAX_BACKOFF = 16
 
-        results = []
-        for i in range(0, len(tasks), BATCH_SIZE):
-            batch = tasks[i : i + BATCH_SIZE]
-            batch_result = self._send_task_batch(queue_url, batch, MAX_RETRIES, INITIAL_BACKOFF, MAX_BACKOFF)
-            results.extend(batch_result)
-            time.sleep(0.5)  # Delay between batches to avoid throttling
+        batches = [tasks[i : i + BATCH_SIZE] for i in range(0, len(tasks), BATCH_SIZE)]
+        started_at = time.monotonic()
+
+        # Batches go out back-to-back; the rate controller only slows us down once SQS throttles.
+        # Parallel sends do not preserve FIFO order across batches, so they are opt-in.
+        if self.sender_executor is not None and len(batches) > 1:
+            futures = [
+                self.sender_executor.submit(self._send_task_batch, queue_url, batch, MAX_RETRIES, INITIAL_BACKOFF, MAX_BACKOFF)
+                for batch in batches
+            ]
+            batch_results = [future.result() for future in futures]
+        else:
+            batch_results = [
+                self._send_task_batch(queue_url, batch, MAX_RETRIES, INITIAL_BACKOFF, MAX_BACKOFF) for batch in batches
+            ]
+        results = [result for batch_result in batch_results for result in batch_result]
 
         successful = [r for r in results if r['status'] == 'success']
         failed = [r for r in results if r['status'] == 'failure']
+        if successful:
+            # Receivers in this process pick the tasks up now rather than after the queue's idle backoff
+            self.poll_scheduler.wake(queue_url)
+
+        elapsed = time.monotonic() - started_at
+        send_rate = len(successful) / elapsed if elapsed > 0 else float(len(successful))
+        logging.info(f"Sent {len(successful)} tasks in {elapsed:.2f}s ({send_rate:.1f} tasks/s) to {queue_url}")
 
         if failed:
             return APIResponse(
                 status="partial_success" if successful else "failure",
                 message=f"Added {len(successful)} tasks, failed to add {len(failed)} tasks",
-                data={"successful": successful, "failed": failed},
+                data={"successful": successful, "failed": failed, "send_rate": send_rate},
             )
         return APIResponse(
-            status="success", message=f"Successfully added {len(successful)} tasks", data={"successful": successful}
+            status="success",
+            message=f"Successfully added {len(successful)} tasks",
+            data={"successful": successful, "send_rate": send_rate},
         )
 
+    @staticmethod
+    def _is_throttling_error(error: ClientError) -> bool:
+        """Check whether a ClientError means SQS is throttling our requests."""
+        error_code = error.response.get('Error', {}).get('Code', '')
+        return error_code in ('ThrottlingException', 'RequestThrottled', 'Throttling')
+
     def _send_task_batch(self, queue_url, batch, max_retries, initial_backoff, max_backoff):
         for attempt in range(max_retries):
             try:
@@ -372,17 +1244,21 @@ class TaskQueue:
                         'MessageBody': json.dumps(
                             {'task_data': task['task_data'], 'user_id': task['user_id'], 'type': task['type']}
                         ),
-                        'MessageGroupId': 'default',
-                        'MessageDeduplicationId': str(uuid.uuid4()),
+                        # One message group per task type, so a bulk backlog does not hold back interactive tasks
+                        'MessageGroupId': task['type'],
+                        'MessageDeduplicationId': deduplication_id,
                     }
-                    for i, task in enumerate(batch)
+                    for i, (task, deduplication_id) in enumerate(batch)
                 ]
 
-                response = self.sqs_client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+                self.rate_controller.acquire()
+                response = self.backend.send_message_batch(QueueUrl=queue_url, Entries=entries)
+                self.rate_controller.on_success()
 
                 results = []
                 if 'Successful' in response:
                     for success in response['Successful']:
+                        self.recent_task_keys.add(entries[int(success['Id'])]['MessageDeduplicationId'])
                         results.append(
                             {
                                 'status': 'success',
@@ -403,10 +1279,16 @@ class TaskQueue:
 
                 return results
 
-            except self.sqs_client.exceptions.ThrottlingException:
-                wait_time = min(initial_backoff * (2**attempt), max_backoff)
-                logging.warning(f"Throttling detected. Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
+            except ClientError as e:
+                if self._is_throttling_error(e):
+                    self.rate_controller.on_throttle()
+                    wait_time = min(initial_backoff * (2**attempt), max_backoff)
+                    logging.warning(f"Throttling detected. Retrying in {wait_time} seconds...")
+                    time.sleep(wait_time)
+                    continue
+                logging.error(f"Error occurred while sending batch: {str(e)}")
+                self._handle_client_error(e, queue_url=queue_url)
+                return [{'status': 'failure', 'message': f"Error sending batch: {str(e)}"} for _ in batch]
             except Exception as e:
                 logging.error(f"Error occurred while sending batch: {str(e)}")
                 return [{'status': 'failure', 'message': f"Error sending batch: {str(e)}"} for _ in batch]
@@ -8,13 +8,23 @@ document.addEventListener('DOMContentLoaded', function () {
     let updateScroll = false
     let isLoading = false; // Prevent multiple simultaneous requests
     const PAGE_SIZE = 50;  // Adjust based on desired number of jobs per load
+    let nextPageCursor = null;  // Position after the last page loaded, the server ignores it for any other page
 
     function initializeDataTable() {
         jobsTable = $('#jobsTable').DataTable({
             processing: true,  // Show processing indicator
             serverSide: true,   // Enable server-side processing
             ajax: {
-                "url": "/api/jobs/jobs"
+                "url": "/api/jobs/jobs",
+                "data": function (data) {
+                    if (nextPageCursor) {
+                        data.cursor = nextPageCursor;
+                    }
+                },
+                "dataSrc": function (json) {
+                    nextPageCursor = json.next_cursor;
+                    return json.data;
+                }
             },
             scrollResize: false,
             scrollY: 300,
@@ -382,6 +392,7 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     let lastSyncDate = new Date().toISOString(); // Start polling from current time
+    let changeCursor = null; // Returned by every poll, resumes exactly where the previous poll stopped
 
 
     async function pollEndpoints() {
@@ -390,7 +401,9 @@ document.addEventListener('DOMContentLoaded', function () {
 
             const [queueResponse, jobUpdatesResponse] = await Promise.all([
                 fetch('/api/task_queue/task_count'),
-                fetch(`/api/jobs/poll-updates?last_sync=${lastSyncDate}`)
+                fetch(changeCursor
+                    ? `/api/jobs/poll-updates?cursor=${encodeURIComponent(changeCursor)}`
+                    : `/api/jobs/poll-updates?last_sync=${lastSyncDate}`)
             ]);
 
             const queueResult = await queueResponse.json();
@@ -409,11 +422,11 @@ document.addEventListener('DOMContentLoaded', function () {
             }
 
             if (jobUpdatesResult.status === "success") {
-                const updatedJobs = jobUpdatesResult.data;
+                const updatedJobs = jobUpdatesResult.data.jobs;
+                changeCursor = jobUpdatesResult.data.cursor;
                 totalTasks += updatedJobs.length;
                 if (updatedJobs.length > 0) {
                     updateJobsInDataTable(updatedJobs);
-                    lastSyncDate = new Date().toISOString();
                     statusMessage += `${updatedJobs.length} jobs updated.`;
                 }
             } else {
@@ -452,6 +465,10 @@ document.addEventListener('DOMContentLoaded', function () {
     }
 
     function startPolling() {
+        if (socketIsOpen()) {
+            // Updates are pushed, nothing to poll
+            return;
+        }
         if (!pollingTimeout) {
             emptyResponseCount = 0;
             showConnectionStatus("Polling...", "loading", 0);
@@ -467,7 +484,81 @@ document.addEventListener('DOMContentLoaded', function () {
             stickyStatus = null
         }
     }
+    // Job changes are pushed over a websocket; polling only runs while the socket is down
+    let jobSocket = null;
+    let socketRetryDelay = 1000;
+    const MAX_SOCKET_RETRY_DELAY = 30000;
+    let taskCountTimeout = null;
+    let tableReloadTimeout = null;
+
+    function refreshTaskCount() {
+        // Debounced: a burst of job updates costs a single queue attributes call
+        clearTimeout(taskCountTimeout);
+        taskCountTimeout = setTimeout(() => {
+            fetch('/api/task_queue/task_count')
+                .then(response => response.json())
+                .then(result => {
+                    if (result.status === "success") {
+                        updateTaskCount(result.data.visible_count);
+                    }
+                })
+                .catch(error => console.error("Error fetching queue message count:", error));
+        }, 1000);
+    }
+
+    function reloadJobsTable() {
+        // Debounced: a burst of new jobs costs a single table reload
+        clearTimeout(tableReloadTimeout);
+        tableReloadTimeout = setTimeout(() => {
+            jobsTable.ajax.reload(null, false);
+        }, 1000);
+    }
+
+    function connectJobSocket() {
+        // Rendered by the jobs page: the websocket server runs separately from the Flask app
+        jobSocket = new WebSocket(JOB_SOCKET_URL);
+
+        jobSocket.onopen = function () {
+            socketRetryDelay = 1000;
+            if (isPolling) {
+                stopPolling();
+                // Catch up on what changed while the socket was down
+                jobsTable.ajax.reload(null, false);
+            }
+        };
+
+        jobSocket.onmessage = function (event) {
+            const message = JSON.parse(event.data);
+            if (message.status !== "success" || !message.data || !message.data.job_id) {
+                return;
+            }
+            if (message.message === "New job available") {
+                reloadJobsTable();
+            } else {
+                updateJobsInDataTable([message.data]);
+            }
+            refreshTaskCount();
+        };
+
+        jobSocket.onclose = function () {
+            jobSocket = null;
+            if (isPolling && !pollingTimeout) {
+                startPolling();
+            }
+            setTimeout(connectJobSocket, socketRetryDelay);
+            socketRetryDelay = Math.min(socketRetryDelay * 2, MAX_SOCKET_RETRY_DELAY);
+        };
+    }
+
+    function socketIsOpen() {
+        return jobSocket !== null && jobSocket.readyState === WebSocket.OPEN;
+    }
+
     initializeDataTable()
+    // No URL when the websocket server is disabled: the page keeps polling
+    if (JOB_SOCKET_URL) {
+        connectJobSocket()
+    }
     // Update any UI elements that depend on selection
     updateSelectionDependentUI();
 
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+import signal
+from http import HTTPStatus
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import urlsplit
+
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+from itsdangerous import BadData
+from websockets.asyncio.server import serve
+
+from app.db.db_utils import close_async_db, get_async_db
+from app.managers.user_connection_manager import QueuedConnection, UserConnectionManager
+from app.managers.websocket_handler import WebSocketHandler
+from app.models.config import setup_logging
+from app.services.pubsub import create_pubsub
+
+# Set up logging
+setup_logging()
+
+
+class SessionAuthenticator:
+    """Reads the user of a websocket handshake from the Flask session cookie set by the web application."""
+
+    def __init__(self):
+        # Same SECRET_KEY and session settings as create_flask_app(), without its blueprints and database setup
+        self.flask_app = Flask(__name__)
+        self.flask_app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+        self.serializer = SecureCookieSessionInterface().get_signing_serializer(self.flask_app)
+        self.max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def get_user_id(self, cookie_header):
+        """Return the id of the logged in user (as stored by flask_login), or None."""
+        if not cookie_header or self.serializer is None:
+            return None
+        try:
+            cookie = SimpleCookie(cookie_header).get(self.flask_app.config['SESSION_COOKIE_NAME'])
+            if cookie is None:
+                return None
+            session = self.serializer.loads(cookie.value, max_age=self.max_age)
+            user_id = session.get('_user_id')
+            return int(user_id) if user_id is not None else None
+        except (CookieError, BadData, ValueError, TypeError) as e:
+            # BadData covers tampered and expired sessions
+            self.logger.warning(f"Rejected websocket session cookie: {e}")
+            return None
+
+    async def process_request(self, connection, request):
+        """Reject the handshake unless it carries the session of an active user."""
+        user_id = self.get_user_id(request.headers.get('Cookie'))
+        if user_id is None:
+            return connection.respond(HTTPStatus.UNAUTHORIZED, "Authentication required\n")
+
+        db = await get_async_db()
+        user = await db.fetch_one("SELECT is_active FROM users WHERE user_id = %s", (user_id,))
+        if not user or not user[0]:
+            return connection.respond(HTTPStatus.FORBIDDEN, "Inactive user\n")
+
+        connection.user_id = user_id
+        return None
+
+
+def _raise_open_file_limit():
+    """Every connection is a file descriptor; raise the soft limit to the hard limit so thousands fit."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            logging.info(f"Raised open file limit from {soft} to {hard}")
+    except (ImportError, ValueError, OSError) as e:
+        logging.warning(f"Could not raise the open file limit: {e}")
+
+
+async def run_websocket_server(host=None, port=None, path=None):
+    """
+    Serve websocket connections on ws://host:port/path until SIGTERM or SIGINT. Browsers find the server through
+    the URL the jobs page renders (WEBSOCKET_PUBLIC_URL, or the web host on WEBSOCKET_PORT), and a reverse proxy
+    can route the same path on the web host here instead.
+    """
+    host = host or os.getenv('WEBSOCKET_HOST', '0.0.0.0')
+    port = port or int(os.getenv('WEBSOCKET_PORT', '8765'))
+    path = path or os.getenv('WEBSOCKET_PATH', '/ws')
+    _raise_open_file_limit()
+
+    connection_manager = UserConnectionManager()
+    # Job changes arrive on the channels of the users connected to this process, from triggers or other processes
+    pubsub = create_pubsub()
+    websocket_handler = WebSocketHandler(connection_manager, pubsub)
+    authenticator = SessionAuthenticator()
+
+    async def process_request(connection, request):
+        if urlsplit(request.path).path != path:
+            return connection.respond(HTTPStatus.NOT_FOUND, "Not found\n")
+        return await authenticator.process_request(connection, request)
+
+    async def handle_connection(connection):
+        await websocket_handler.handle_websocket(QueuedConnection(connection), connection.user_id)
+
+    stop = asyncio.get_running_loop().create_future()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(signum, lambda: stop.done() or stop.set_result(None))
+
+    # Per idle connection memory is bounded by these limits; permessage-deflate alone would keep
+    # two zlib contexts (hundreds of KB) per connection, and pushed messages are small
+    async with serve(
+        handle_connection,
+        host,
+        port,
+        process_request=process_request,
+        compression=None,
+        max_size=int(os.getenv('WEBSOCKET_MAX_MESSAGE_SIZE', str(64 * 1024))),
+        max_queue=int(os.getenv('WEBSOCKET_MAX_INCOMING_QUEUE', '4')),
+        write_limit=int(os.getenv('WEBSOCKET_WRITE_LIMIT', str(32 * 1024))),
+        # Keepalive pings come from the connection manager's heartbeat wheel, not a task per connection
+        ping_interval=None,
+    ):
+        logging.info(f"Websocket server listening on {host}:{port}{path}")
+        pubsub.start()
+        await stop
+
+    logging.info("Stopping websocket server...")
+    await pubsub.close()
+    await connection_manager.close()
+    await close_async_db()
+    logging.info("Websocket server stopped.")
+
+
+# Main function to run the websocket server
+if __name__ == '__main__':
+    logging.info("Starting websocket server...")
+    asyncio.run(run_websocket_server())
@@ -0,0 +1,206 @@
+import base64
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from app.managers.job_manager import JobManager
+
+
+COLUMNS = [{'data': 'job_id'}, {'data': 'job_title'}, {'data': 'created_at'}]
+
+
+class TestJobPageCursor(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.db.fetch_one.return_value = (3,)
+        self.db.fetch_all.return_value = []
+        with patch('app.managers.job_manager.get_db', return_value=self.db):
+            self.job_manager = JobManager()
+
+    def _get_page(self, **kwargs):
+        options = dict(start=10, length=2, sort_column='created_at', sort_order='DESC', columns=COLUMNS)
+        options.update(kwargs)
+        return self.job_manager.get_jobs_for_user(1, **options)
+
+    def _cursor(self, sort_order='DESC', search_value=None, next_start=10):
+        last_job = {'job_id': 'b', 'created_at': datetime(2024, 5, 1, 12, 30)}
+        return JobManager.encode_page_cursor('created_at', sort_order, search_value, next_start, last_job)
+
+    def test_cursor_round_trip_keeps_datetimes(self):
+        """A decoded cursor gives back the sort value with its type, and the page it was built for."""
+        position = JobManager.decode_page_cursor(self._cursor(search_value='python'))
+
+        self.assertEqual(position['v'], datetime(2024, 5, 1, 12, 30))
+        self.assertEqual(
+            (position['c'], position['o'], position['s'], position['n'], position['id']),
+            ('created_at', 'DESC', 'python', 10, 'b'),
+        )
+
+    def test_malformed_cursor_is_rejected(self):
+        """Cursors that are not base64 JSON, or lack fields, decode to None."""
+        self.assertIsNone(JobManager.decode_page_cursor('not a cursor'))
+        self.assertIsNone(JobManager.decode_page_cursor('e30='))  # {}
+
+    def test_matching_cursor_seeks_instead_of_offset(self):
+        """The cursor of the requested page replaces OFFSET with a seek past its last row."""
+        self._get_page(cursor=self._cursor())
+
+        query, params = self.db.fetch_all.call_args.args
+        self.assertIn("(created_at, job_id) < (%s, %s)", query)
+        self.assertNotIn("OFFSET", query)
+        self.assertEqual(params, (1, datetime(2024, 5, 1, 12, 30), 'b', 2))
+
+    def test_cursor_of_another_page_falls_back_to_offset(self):
+        """A cursor built for a different sort, order, search or start is ignored."""
+        for page in (
+            dict(sort_column='job_title'),
+            dict(sort_order='ASC'),
+            dict(search_value='python', searchable_columns=['job_title']),
+            dict(start=20),
+        ):
+            with self.subTest(**page):
+                self._get_page(cursor=self._cursor(), **page)
+
+                query, params = self.db.fetch_all.call_args.args
+                self.assertIn("OFFSET", query)
+                self.assertNotIn("job_id) <", query)
+                self.assertNotIn("job_id) >", query)
+
+    def test_ascending_seek_keeps_null_sort_values(self):
+        """NULLs sort last in ascending order, so they remain after any non-NULL cursor position."""
+        self._get_page(sort_order='ASC', cursor=self._cursor(sort_order='ASC'))
+
+        query, _ = self.db.fetch_all.call_args.args
+        self.assertIn("((created_at, job_id) > (%s, %s) OR created_at IS NULL)", query)
+
+    def test_descending_seek_skips_null_sort_values(self):
+        """NULLs sort first in descending order, so they were all on earlier pages."""
+        self._get_page(cursor=self._cursor())
+
+        query, _ = self.db.fetch_all.call_args.args
+        self.assertNotIn("IS NULL", query)
+
+    def test_no_cursor_after_a_null_sort_value(self):
+        """A row-value comparison with NULL matches nothing, so such a page is not given a next cursor."""
+        self.db.fetch_all.return_value = [('a', 'First', datetime(2024, 5, 1)), ('b', 'Second', None)]
+
+        response = self._get_page(sort_order='ASC', start=0)
+
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_full_page_returns_a_cursor_for_the_next_one(self):
+        """The cursor points after the last row of the page and at the start of the next one."""
+        self.db.fetch_all.return_value = [('a', 'First', datetime(2024, 5, 2)), ('b', 'Second', datetime(2024, 5, 1))]
+
+        response = self._get_page(start=0)
+
+        position = JobManager.decode_page_cursor(response.data['next_cursor'])
+        self.assertEqual((position['n'], position['id'], position['v']), (2, 'b', datetime(2024, 5, 1)))
+
+
+class TestJobSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.lexemes = True
+        self.db.fetch_one.side_effect = lambda query, *args, **kwargs: (self.lexemes,) if "numnode" in query else (3,)
+        self.db.fetch_all.return_value = []
+        with patch('app.managers.job_manager.get_db', return_value=self.db):
+            self.job_manager = JobManager()
+
+    def _search_page(self, search_value):
+        self.job_manager.get_jobs_for_user(
+            1, columns=COLUMNS, search_value=search_value, searchable_columns=['job_title']
+        )
+        return self.db.fetch_all.call_args.args
+
+    def test_prefix_tsquery_matches_every_word(self):
+        """Every word must match, the last one as a prefix; punctuation is not passed to to_tsquery."""
+        self.assertEqual(JobManager.to_prefix_tsquery("django rest"), "django & rest:*")
+        self.assertEqual(JobManager.to_prefix_tsquery("c'est (python)!"), "c & est & python:*")
+        self.assertIsNone(JobManager.to_prefix_tsquery(" !? "))
+
+    def test_words_are_searched_through_the_index(self):
+        """Text with indexed words uses the full-text index instead of LIKE on the indexed columns."""
+        query, params = self._search_page("django")
+
+        self.assertIn("search_vector @@ to_tsquery('english', %s)", query)
+        self.assertNotIn("job_title LIKE", query)
+        self.assertIn("django:*", params)
+
+    def test_stop_words_only_fall_back_to_like(self):
+        """A tsquery the configuration reduces to nothing would match no job, so the title is matched with LIKE."""
+        self.lexemes = False
+
+        query, params = self._search_page("the")
+
+        self.assertNotIn("search_vector", query)
+        self.assertIn("job_title LIKE %s", query)
+        self.assertIn("%the%", params)
+
+    def test_search_jobs_stop_words_only_fall_back_to_like(self):
+        """The search endpoint falls back the same way instead of returning nothing."""
+        self.lexemes = False
+
+        response = self.job_manager.search_jobs(1, "the")
+
+        query, params = self.db.fetch_all.call_args.args
+        self.assertEqual(response.status, "success")
+        self.assertNotIn("to_tsquery", query)
+        self.assertEqual(params, (1, "%the%", "%the%", 20))
+
+
+class TestJobChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        with patch('app.managers.job_manager.get_db', return_value=self.db):
+            self.job_manager = JobManager()
+
+    @staticmethod
+    def _cursor(snapshot):
+        return base64.urlsafe_b64encode(snapshot.encode()).decode()
+
+    def test_decode_change_cursor(self):
+        """Only base64 encoded pg_snapshot text is accepted."""
+        self.assertEqual(JobManager.decode_change_cursor(self._cursor("100:105:")), "100:105:")
+        self.assertEqual(JobManager.decode_change_cursor(self._cursor("100:105:101,103")), "100:105:101,103")
+        for cursor in (self._cursor("100:105:101,"), self._cursor("100;105:"), self._cursor("1:2:3 OR 1=1"), "%%%", None):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(JobManager.decode_change_cursor(cursor))
+
+    def test_first_poll_without_jobs_returns_a_cursor(self):
+        """The LEFT JOIN still yields the snapshot row when nothing changed, so the client gets its first cursor."""
+        self.db.fetch_all.return_value = [("100:100:", None, None, None)]
+
+        response = self.job_manager.poll_updates_for_user(1, last_sync=datetime(2024, 5, 1))
+
+        query, params = self.db.fetch_all.call_args.args
+        self.assertIn("job.last_updated_at > %s", query)
+        self.assertEqual(params, (1, datetime(2024, 5, 1)))
+        self.assertEqual(response.data, {"jobs": [], "cursor": self._cursor("100:100:")})
+
+    def test_poll_with_cursor_returns_writes_the_previous_snapshot_missed(self):
+        """Rows written by transactions at or after the previous snapshot's xmin and invisible to it are returned."""
+        self.db.fetch_all.return_value = [("110:112:", "job-1", "processed", 4)]
+
+        response = self.job_manager.poll_updates_for_user(1, cursor=self._cursor("100:105:101"))
+
+        query, params = self.db.fetch_all.call_args.args
+        self.assertIn("NOT pg_visible_in_snapshot", query)
+        self.assertNotIn("last_updated_at", query)
+        self.assertEqual(params, (1, 100, "100:105:101"))
+        self.assertEqual(response.data["jobs"], [{"job_id": "job-1", "status": "processed", "job_fit": 4}])
+        self.assertEqual(response.data["cursor"], self._cursor("110:112:"))
+
+    def test_poll_without_cursor_or_last_sync_is_rejected(self):
+        """An invalid cursor without a last_sync to fall back on cannot start a feed."""
+        response = self.job_manager.poll_updates_for_user(1, cursor="garbage")
+
+        self.assertEqual(response.status, "failure")
+        self.db.fetch_all.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import psycopg2.extensions
+from flask import Flask
+
+from app.db import identity_map
+from app.db.postgresdb import PostgresDB, _IdleConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 1
+        self.description = [("id",)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        self.connection.executed.append(query)
+        if not self.connection.autocommit:
+            self.connection.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchall(self):
+        return [(1,)]
+
+    def mogrify(self, query, params=None):
+        return (query.decode() % tuple(repr(param) for param in params)).encode()
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = True
+        self.encoding = 'UTF8'
+        self.info = SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def make_db(connection):
+    with patch.object(PostgresDB, 'init_database'), patch.object(PostgresDB, 'connect'):
+        db = PostgresDB('localhost', 'test', 'user', 'password', min_size=1, max_size=2)
+    db.pool = MagicMock()
+    db.pool.getconn.return_value = connection
+    return db
+
+
+class TestPreparedStatements(unittest.TestCase):
+
+    def test_prepared_statements_survive_a_rollback(self):
+        """PREPARE is not transactional, so a rolled back transaction keeps its statements cached."""
+        connection = FakeConnection()
+        db = make_db(connection)
+        query = "SELECT id FROM jobs WHERE id = %s"
+
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                db.fetch_one(query, (1,), prepare=True)
+                raise RuntimeError("abort")
+        connection.executed.clear()
+
+        db.fetch_one(query, (1,), prepare=True)
+
+        self.assertEqual(connection.executed, ["EXECUTE stmt_1 (%s)"])
+        self.assertEqual(db.get_prepared_statement_stats()["hits"], 1)
+
+
+class TestIdleConnectionPool(unittest.TestCase):
+
+    def test_keeps_up_to_max_idle_returned_connections(self):
+        """Only min_size connections are opened up front, but up to max_idle stay open when returned."""
+        with patch('psycopg2.pool.psycopg2.connect', side_effect=lambda *args, **kwargs: FakeConnection()) as connect:
+            pool = _IdleConnectionPool(1, 4, 2)
+            self.assertEqual(connect.call_count, 1)
+            connections = [pool.getconn() for _ in range(3)]
+
+        for connection in connections:
+            pool.putconn(connection)
+
+        self.assertEqual(pool._pool, connections[:2])
+        self.assertEqual([bool(connection.closed) for connection in connections], [False, False, True])
+
+
+
+class TestRequestIdentityMap(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.db = make_db(self.connection)
+        self.app = Flask(__name__)
+
+    def test_repeated_reads_are_served_within_a_request(self):
+        """The same lookup twice in one request reaches the database once."""
+        with self.app.test_request_context():
+            first = self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+            second = self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.connection.executed), 1)
+
+    def test_cache_does_not_outlive_the_request(self):
+        """Each request starts with an empty cache."""
+        with self.app.test_request_context():
+            self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+        with self.app.test_request_context():
+            self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+
+        self.assertEqual(len(self.connection.executed), 2)
+
+    def test_writes_invalidate_cached_rows(self):
+        """Any write may change cached rows, so the next read goes to the database again."""
+        with self.app.test_request_context():
+            self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+            self.db.execute_query("UPDATE jobs SET status = %s WHERE id = %s", ("done", 1))
+            self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+
+        self.assertEqual(len(self.connection.executed), 3)
+
+    def test_locking_reads_bypass_the_cache(self):
+        """SELECT ... FOR UPDATE must take its lock every time, so it is neither served nor cached."""
+        self.assertFalse(identity_map.is_read_statement("SELECT id FROM jobs WHERE id = %s for update"))
+        with self.app.test_request_context():
+            self.db.fetch_one("SELECT id FROM jobs WHERE id = %s FOR UPDATE", (1,))
+            self.db.fetch_one("SELECT id FROM jobs WHERE id = %s FOR UPDATE", (1,))
+
+        self.assertEqual(len(self.connection.executed), 2)
+
+    def test_nothing_is_cached_outside_a_request(self):
+        """Workers and scripts run without a request, and always read from the database."""
+        self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+        self.db.fetch_one("SELECT id FROM jobs WHERE id = %s", (1,))
+
+        self.assertEqual(len(self.connection.executed), 2)
+
+
+class TestBulkUpsert(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.db = make_db(self.connection)
+
+    def test_generated_statement(self):
+        """Rows become one multi-row INSERT that updates the given columns on conflict and returns the rows."""
+        self.db.bulk_upsert(
+            'job_details',
+            [{'job_id': 'a', 'status': 'new'}, {'job_id': 'b', 'status': 'new'}],
+            conflict_cols=['job_id'],
+            update_cols=['status'],
+            returning=['job_id'],
+        )
+
+        self.assertEqual(
+            self.connection.executed,
+            [
+                b"INSERT INTO job_details (job_id, status) VALUES ('a','new'),('b','new') ON CONFLICT (job_id) "
+                b"DO UPDATE SET status = EXCLUDED.status RETURNING job_id"
+            ],
+        )
+
+    def test_conflicts_are_skipped_without_update_columns(self):
+        """Without update columns, rows that already exist are left untouched."""
+        self.db.bulk_upsert('job_details', [{'job_id': 'a', 'status': 'new'}], conflict_cols=['job_id'])
+
+        self.assertTrue(self.connection.executed[0].endswith(b"ON CONFLICT (job_id) DO NOTHING"))
+
+    def test_rows_are_sent_in_pages(self):
+        """Each page is one statement, and the RETURNING rows of every page are collected."""
+        rows = [{'job_id': str(i), 'status': 'new'} for i in range(5)]
+
+        result = self.db.bulk_upsert('job_details', rows, conflict_cols=['job_id'], returning=['job_id'], page_size=2)
+
+        self.assertEqual([statement.count(b"),(") + 1 for statement in self.connection.executed], [2, 2, 1])
+        self.assertEqual(len(result), 3)
+
+    def test_duplicate_keys_keep_the_last_row(self):
+        """One statement cannot update a row twice, but rows with a NULL key part never conflict and are all kept."""
+        rows = [
+            {'queue_name': 'q', 'deduplication_id': 'x', 'body': 'first'},
+            {'queue_name': 'q', 'deduplication_id': 'x', 'body': 'second'},
+            {'queue_name': 'q', 'deduplication_id': None, 'body': 'third'},
+            {'queue_name': 'q', 'deduplication_id': None, 'body': 'fourth'},
+        ]
+
+        self.db.bulk_upsert('task_queue', rows, conflict_cols=['queue_name', 'deduplication_id'])
+
+        [statement] = self.connection.executed
+        self.assertNotIn(b"'first'", statement)
+        for body in (b"'second'", b"'third'", b"'fourth'"):
+            self.assertIn(body, statement)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from app.db.query_stats import LATENCY_BUCKETS_MS, QueryStats
+
+
+class TestQueryStatsNormalize(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = QueryStats(slow_query_ms=10_000)
+
+    def test_literals_and_placeholders_are_replaced(self):
+        """String and number literals and every placeholder style become '?'."""
+        self.assertEqual(
+            self.stats.normalize("SELECT * FROM jobs WHERE title = 'it''s' AND fit > 3 AND id = %s AND user_id = $1"),
+            "SELECT * FROM jobs WHERE title = ? AND fit > ? AND id = ? AND user_id = ?",
+        )
+        self.assertEqual(self.stats.normalize("SELECT * FROM jobs WHERE id = %(job_id)s"), "SELECT * FROM jobs WHERE id = ?")
+
+    def test_whitespace_is_collapsed(self):
+        """The same statement formatted differently is one entry."""
+        self.assertEqual(self.stats.normalize("\n  SELECT id\n    FROM jobs\n   LIMIT 10  "), "SELECT id FROM jobs LIMIT ?")
+
+    def test_identifiers_containing_digits_are_kept(self):
+        """Only standalone numbers are literals."""
+        self.assertEqual(self.stats.normalize("SELECT col1 FROM table2"), "SELECT col1 FROM table2")
+
+
+class TestQueryStatsRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = QueryStats(slow_query_ms=10_000)
+
+    def test_durations_fall_into_their_bucket(self):
+        """Bucket bounds are inclusive, and anything slower than the last bound lands in the overflow bucket."""
+        for duration_ms in (0.5, 1, 3, 5000, 6000):
+            self.stats.record("SELECT 1", duration_ms / 1000, 1)
+
+        histogram = self.stats.get_top_statements()[0]["histogram"]
+
+        self.assertEqual(histogram["<=1ms"], 2)
+        self.assertEqual(histogram["<=5ms"], 1)
+        self.assertEqual(histogram["<=5000ms"], 1)
+        self.assertEqual(histogram[f">{LATENCY_BUCKETS_MS[-1]}ms"], 1)
+        self.assertEqual(sum(histogram.values()), 5)
+
+    def test_executions_of_one_statement_are_aggregated(self):
+        """Calls with different parameters share an entry; unknown row counts are not subtracted."""
+        self.stats.record("SELECT * FROM jobs WHERE id = 1", 0.002, 1)
+        self.stats.record("SELECT * FROM jobs WHERE id = 2", 0.004, -1)
+
+        [statement] = self.stats.get_top_statements()
+
+        self.assertEqual(statement["statement"], "SELECT * FROM jobs WHERE id = ?")
+        self.assertEqual(statement["calls"], 2)
+        self.assertEqual(statement["rows"], 1)
+        self.assertAlmostEqual(statement["avg_ms"], 3.0)
+        self.assertAlmostEqual(statement["max_ms"], 4.0)
+
+    def test_new_statements_are_dropped_beyond_the_limit(self):
+        """Once max_statements are tracked, only the known statements keep counting."""
+        stats = QueryStats(slow_query_ms=10_000, max_statements=1)
+        stats.record("SELECT 1 FROM jobs", 0.001, 1)
+        stats.record("SELECT 1 FROM users", 0.001, 1)
+
+        self.assertEqual([entry["statement"] for entry in stats.get_top_statements()], ["SELECT ? FROM jobs"])
+
+
+if __name__ == '__main__':
+    unittest.main()
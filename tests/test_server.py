@@ -0,0 +1,161 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from app import server
+
+
+class FakeProcess:
+    """Stands in for multiprocessing.Process; the test decides when it dies and whether it stops on SIGTERM."""
+
+    def __init__(self, target, args, name, clock, registry):
+        self.name = name
+        self.pid = len(registry) + 1000
+        self.exitcode = None
+        self.started_at = None
+        self.alive = False
+        self.stops_on_terminate = True
+        self.terminated = False
+        self.killed = False
+        self._clock = clock
+        registry.append(self)
+
+    def start(self):
+        self.started_at = self._clock.now
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def crash(self):
+        self.alive = False
+        self.exitcode = 1
+
+    def terminate(self):
+        self.terminated = True
+        if self.stops_on_terminate:
+            self.alive = False
+            self.exitcode = 0
+
+    def join(self, timeout=None):
+        pass
+
+    def kill(self):
+        self.killed = True
+        self.alive = False
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeStopEvent:
+    """Each wait() of the supervisor loop is one tick: the clock moves on and the test's `on_tick` runs."""
+
+    def __init__(self, clock, ticks, on_tick):
+        self._clock = clock
+        self._ticks = ticks
+        self._on_tick = on_tick
+        self._set = False
+
+    def is_set(self):
+        return self._set
+
+    def set(self):
+        self._set = True
+
+    def wait(self, timeout=None):
+        self._clock.now += timeout
+        self._ticks -= 1
+        if self._ticks <= 0:
+            self._set = True
+        else:
+            self._on_tick()
+        return self._set
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.processes = []
+
+    def _run(self, num_processes, ticks, on_tick=lambda: None, websocket_server=False):
+        def make_process(target, args, name):
+            return FakeProcess(target, args, name, self.clock, self.processes)
+
+        stop_event = FakeStopEvent(self.clock, ticks, on_tick)
+        with patch.object(server.multiprocessing, 'Process', side_effect=make_process), patch.object(
+            server.threading, 'Event', return_value=stop_event
+        ), patch.object(server.time, 'monotonic', side_effect=self.clock.monotonic), patch.object(
+            server, '_install_stop_handlers'
+        ), patch.dict(os.environ, {'TASK_QUEUE_DRAIN_TIMEOUT': '5'}):
+            server.run_supervisor(num_processes, websocket_server)
+
+    def _started(self, name):
+        return [process.started_at for process in self.processes if process.name == name]
+
+    def test_dead_worker_is_restarted(self):
+        """A crashed listener is started again while the other one keeps running."""
+
+        def crash_first_listener_once():
+            if self.clock.now == 1:
+                self.processes[0].crash()
+
+        self._run(2, ticks=5, on_tick=crash_first_listener_once, websocket_server=True)
+
+        self.assertEqual(self._started("TaskQueueListener-0"), [0, 2])
+        self.assertEqual(self._started("TaskQueueListener-1"), [0])
+        self.assertEqual(self._started("WebSocketServer"), [0])
+
+    def test_restart_backoff_doubles_and_resets_after_a_stable_run(self):
+        """A worker that keeps crashing waits 1, 2, 4, 8... seconds; one that ran long enough starts over at 1."""
+
+        def crash_listener():
+            for process in self.processes:
+                if not process.alive:
+                    continue
+                if self.clock.now < 30 or self.clock.now - process.started_at >= server.STABLE_WORKER_SECONDS:
+                    process.crash()
+
+        self._run(1, ticks=110, on_tick=crash_listener)
+
+        starts = self._started("TaskQueueListener-0")
+        # Each run lasts one tick before crashing, then the backoff runs: 1s, 2s, 4s, 8s, 16s
+        self.assertEqual(starts[:6], [0, 2, 5, 10, 19, 36])
+        # Started at 36, it ran for STABLE_WORKER_SECONDS before crashing, so its backoff is back to 1s
+        self.assertEqual(starts[6] - starts[5], server.STABLE_WORKER_SECONDS + 1)
+
+    def test_backoff_is_capped(self):
+        """However often a worker crashes, it is restarted at least every MAX_RESTART_BACKOFF seconds."""
+
+        def crash_listener():
+            for process in self.processes:
+                if process.alive:
+                    process.crash()
+
+        self._run(1, ticks=400, on_tick=crash_listener)
+
+        starts = self._started("TaskQueueListener-0")
+        gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+        self.assertEqual(max(gaps), server.MAX_RESTART_BACKOFF + 1)
+
+    def test_shutdown_terminates_workers_and_kills_the_stuck_ones(self):
+        """On stop every worker gets SIGTERM to drain; one still alive after the drain timeout is killed."""
+
+        def make_second_listener_hang():
+            self.processes[1].stops_on_terminate = False
+
+        self._run(2, ticks=2, on_tick=make_second_listener_hang)
+
+        self.assertTrue(all(process.terminated for process in self.processes))
+        self.assertEqual([process.killed for process in self.processes], [False, True])
+        self.assertFalse(any(process.alive for process in self.processes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,18 +1,30 @@
+import json
+import os
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
 
 from app.models.api_response import APIResponse
-from app.services.task_queue import TaskQueue
+import psycopg2
+
+from app.services.queue_backends import InMemoryQueueBackend, PostgresQueueBackend
+from app.services.task_queue import (
+    AckBuffer,
+    AdaptiveRateController,
+    FairTaskScheduler,
+    InFlightWindow,
+    QueuePollScheduler,
+    QueueUrlRegistry,
+    TaskQueue,
+)
 import boto3
+from botocore.exceptions import ClientError
 
 
 class TestTaskQueue(unittest.TestCase):
 
     def setUp(self):
-        # Create an instance of TaskQueue
-        self.task_queue = TaskQueue()
-
-        # Mock the SQS client using patch
+        # Mock the SQS client using patch, before the TaskQueue creates its backend
         self.sqs_patcher = patch('boto3.client')
         self.mock_boto_client = self.sqs_patcher.start()
 
@@ -23,8 +35,16 @@ class TestTaskQueue(unittest.TestCase):
         # Mock the list_queues method
         self.mock_sqs_client.list_queues.return_value = {'QueueUrls': []}
 
+        # Create an instance of TaskQueue
+        TaskQueue._instance = None
+        TaskQueue._initialized = False
+        with patch.dict(os.environ, {'TASK_QUEUE_BACKEND': 'sqs'}):
+            self.task_queue = TaskQueue()
+
     def tearDown(self):
         self.sqs_patcher.stop()
+        TaskQueue._instance = None
+        TaskQueue._initialized = False
 
     def test_get_all_queues_success(self):
         """Test get_all_queues method for successful retrieval of queues."""
@@ -35,7 +55,7 @@ class TestTaskQueue(unittest.TestCase):
                 'https://sqs.us-east-1.amazonaws.com/058264153804/user_2_queue.fifo',
             ]
         }
-        self.task_queue.sqs_client.list_queues.return_value = mock_response
+        self.mock_sqs_client.list_queues.return_value = mock_response
 
         response = self.task_queue.get_all_queues()
 
@@ -55,7 +75,9 @@ class TestTaskQueue(unittest.TestCase):
     def test_get_all_queues_failure(self):
         """Test get_all_queues method for failure when retrieving queues."""
         # Simulate an error in the list_queues method
-        self.mock_sqs_client.list_queues.side_effect = Exception("Error retrieving queues")
+        self.mock_sqs_client.list_queues.side_effect = ClientError(
+            {'Error': {'Code': 'InternalError', 'Message': 'Error retrieving queues'}}, 'ListQueues'
+        )
 
         response = self.task_queue.get_all_queues()
 
@@ -63,32 +85,380 @@ class TestTaskQueue(unittest.TestCase):
         self.assertEqual(response.status, "failure")
         self.assertEqual(response.message, "Error retrieving all queues")
 
-    def test_processing_loop(self, mock_as_completed):
-        """Test the _processing_loop method for processing tasks."""
-        # Mock the queue retrieval and message reception
-        mock_response = {
-            'QueueUrls': [
-                'https://sqs.us-east-1.amazonaws.com/058264153804/user_1_queue.fifo',
-            ]
+    def test_processing_loop(self):
+        """The receiver streams messages to the dispatcher, which runs them on the workers and acknowledges them."""
+        self.task_queue.backend = InMemoryQueueBackend()
+        queue_url = self.task_queue.backend.create_queue(
+            QueueName='user_1_queue.fifo', Attributes={'FifoQueue': 'true', 'ContentBasedDeduplication': 'true'}
+        )['QueueUrl']
+        self.task_queue.backend.send_message_batch(
+            QueueUrl=queue_url,
+            Entries=[
+                {
+                    'Id': str(i),
+                    'MessageBody': json.dumps({'type': 'test_task', 'user_id': 1, 'task_data': {'job_id': i}}),
+                    'MessageGroupId': 'test_task',
+                }
+                for i in range(3)
+            ],
+        )
+        # Keep the receiver's long polls short, so stop_processing does not wait out a 10 second poll
+        receive_message = self.task_queue.backend.receive_message
+        self.task_queue.backend.receive_message = lambda **kwargs: receive_message(**{**kwargs, 'WaitTimeSeconds': 0.1})
+        processed = threading.Event()
+        callback = MagicMock(side_effect=lambda task_data: callback.call_count == 3 and processed.set())
+        self.task_queue.register_callback('test_task', callback)
+
+        self.task_queue.start_processing()
+        self.assertTrue(processed.wait(timeout=5))
+        self.task_queue.stop_processing()
+
+        self.assertEqual([call.args[0]['task_data']['job_id'] for call in callback.call_args_list], [0, 1, 2])
+        attributes = self.task_queue.backend.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['All'])['Attributes']
+        self.assertEqual(attributes['ApproximateNumberOfMessages'], '0')
+        self.assertEqual(attributes['ApproximateNumberOfMessagesNotVisible'], '0')
+
+
+class TestQueueUrlRegistry(unittest.TestCase):
+
+    def test_put_then_get_counts_hit(self):
+        """A cached URL is returned and counted as a hit."""
+        registry = QueueUrlRegistry(ttl_seconds=60)
+        self.assertIsNone(registry.get('user_1_queue.fifo'))
+        registry.put('user_1_queue.fifo', 'https://sqs/user_1_queue.fifo')
+
+        self.assertEqual(registry.get('user_1_queue.fifo'), 'https://sqs/user_1_queue.fifo')
+        stats = registry.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    @patch('app.services.task_queue.time.monotonic')
+    def test_expired_entry_is_a_miss(self, mock_monotonic):
+        """Entries older than the TTL are dropped on lookup."""
+        registry = QueueUrlRegistry(ttl_seconds=10)
+        mock_monotonic.return_value = 100
+        registry.put('user_1_queue.fifo', 'https://sqs/user_1_queue.fifo')
+        mock_monotonic.return_value = 111
+
+        self.assertIsNone(registry.get('user_1_queue.fifo'))
+        self.assertEqual(registry.get_stats()['size'], 0)
+
+    def test_invalidate_by_url(self):
+        """Invalidating by URL removes the matching queue name."""
+        registry = QueueUrlRegistry()
+        registry.put('user_1_queue.fifo', 'https://sqs/user_1_queue.fifo')
+        registry.put('user_2_queue.fifo', 'https://sqs/user_2_queue.fifo')
+
+        registry.invalidate(queue_url='https://sqs/user_1_queue.fifo')
+
+        self.assertIsNone(registry.get('user_1_queue.fifo'))
+        self.assertEqual(registry.get('user_2_queue.fifo'), 'https://sqs/user_2_queue.fifo')
+
+
+class TestQueuePollScheduler(unittest.TestCase):
+
+    def test_busy_queue_is_polled_first(self):
+        """Queues that returned messages are prioritised over idle ones."""
+        scheduler = QueuePollScheduler()
+        scheduler.sync_queues([(1, 'queue-1'), (2, 'queue-2')])
+        scheduler.acquire_due_queues(2)
+        scheduler.record_result('queue-1', 0)
+        scheduler.record_result('queue-2', 3)
+
+        acquired = scheduler.acquire_due_queues(2)
+
+        self.assertEqual(acquired, [(2, 'queue-2', 1)])
+
+    def test_idle_queue_backs_off(self):
+        """Idle queues are polled without waiting and are not due again immediately."""
+        scheduler = QueuePollScheduler()
+        scheduler.sync_queues([(1, 'queue-1')])
+        for _ in range(3):
+            scheduler.acquire_due_queues(1)
+            scheduler.record_result('queue-1', 0)
+            scheduler._states['queue-1']['next_poll_at'] = 0.0
+
+        self.assertEqual(scheduler.acquire_due_queues(1), [(1, 'queue-1', 0)])
+        scheduler.record_result('queue-1', 0)
+        self.assertEqual(scheduler.acquire_due_queues(1), [])
+
+    def test_idle_backoff_is_capped(self):
+        """However long a queue stays idle, it is polled again within max_idle_delay seconds."""
+        scheduler = QueuePollScheduler(max_idle_delay=5)
+        scheduler.sync_queues([(1, 'queue-1')])
+        for _ in range(10):
+            scheduler.acquire_due_queues(1)
+            scheduler.record_result('queue-1', 0)
+            scheduler._states['queue-1']['next_poll_at'] = 0.0
+        scheduler.acquire_due_queues(1)
+        scheduler.record_result('queue-1', 0)
+
+        self.assertLessEqual(scheduler.seconds_until_next_due(), 5)
+
+    def test_wake_skips_the_idle_backoff(self):
+        """A queue that was just sent to is due again at once, as a busy queue."""
+        scheduler = QueuePollScheduler()
+        scheduler.sync_queues([(1, 'queue-1')])
+        scheduler.acquire_due_queues(1)
+        scheduler.record_result('queue-1', 0)
+        self.assertEqual(scheduler.acquire_due_queues(1), [])
+
+        scheduler.wake('queue-1')
+
+        self.assertEqual(scheduler.acquire_due_queues(1), [(1, 'queue-1', 1)])
+
+
+class TestInFlightWindow(unittest.TestCase):
+
+    def test_acquire_is_bounded(self):
+        """Reservations never exceed the window size and time out when it is full."""
+        window = InFlightWindow(3)
+
+        self.assertEqual(window.acquire(10, timeout=0), 3)
+        self.assertEqual(window.acquire(1, timeout=0), 0)
+
+    def test_release_frees_slots(self):
+        """Released slots can be reserved again and the window drains to empty."""
+        window = InFlightWindow(2)
+        window.acquire(2, timeout=0)
+        window.release()
+
+        self.assertEqual(window.acquire(10, timeout=0), 1)
+        window.release(2)
+        self.assertTrue(window.wait_until_empty(timeout=0))
+
+
+class TestAckBuffer(unittest.TestCase):
+
+    def test_full_batch_is_deleted_immediately(self):
+        """Ten acknowledged messages on one queue trigger a single batch delete."""
+        delete_batch = MagicMock()
+        ack_buffer = AckBuffer(delete_batch, flush_interval=60)
+        for i in range(10):
+            ack_buffer.add('queue-1', f'handle-{i}')
+
+        delete_batch.assert_called_once_with('queue-1', [f'handle-{i}' for i in range(10)])
+        ack_buffer.stop()
+
+    def test_stop_flushes_partial_batches(self):
+        """Buffered acknowledgements are flushed per queue on stop."""
+        delete_batch = MagicMock()
+        ack_buffer = AckBuffer(delete_batch, flush_interval=60)
+        ack_buffer.add('queue-1', 'handle-1')
+        ack_buffer.add('queue-2', 'handle-2')
+
+        ack_buffer.stop()
+
+        delete_batch.assert_any_call('queue-1', ['handle-1'])
+        delete_batch.assert_any_call('queue-2', ['handle-2'])
+
+
+class TestAdaptiveRateController(unittest.TestCase):
+
+    def test_rate_grows_additively_and_halves_on_throttle(self):
+        """Accepted batches raise the rate step by step; a throttle cuts it in half."""
+        controller = AdaptiveRateController(initial_rate=10.0, increase_step=2.0)
+        controller.on_success()
+        controller.on_success()
+        self.assertEqual(controller.rate, 14.0)
+
+        controller.on_throttle()
+
+        self.assertEqual(controller.get_stats(), {"rate": 7.0, "throttle_count": 1})
+
+    @patch('app.services.task_queue.time.sleep')
+    def test_burst_is_sent_without_sleeping(self, mock_sleep):
+        """A full bucket lets a burst of batches through back-to-back."""
+        controller = AdaptiveRateController(burst=5)
+        for _ in range(5):
+            controller.acquire()
+
+        mock_sleep.assert_not_called()
+
+
+class TestFairTaskScheduler(unittest.TestCase):
+
+    def test_classes_are_weighted(self):
+        """Interactive tasks get their weight's share of dispatches while bulk work is still served."""
+        scheduler = FairTaskScheduler({'interactive': 3, 'bulk': 1})
+        for i in range(8):
+            scheduler.put('bulk', 1, f'bulk-{i}')
+            scheduler.put('interactive', 1, f'interactive-{i}')
+
+        dispatched = [scheduler.get(timeout=0) for _ in range(8)]
+
+        self.assertEqual(sum(task.startswith('interactive') for task in dispatched), 6)
+        self.assertEqual(sum(task.startswith('bulk') for task in dispatched), 2)
+
+    def test_users_take_turns_within_a_class(self):
+        """A user with a large backlog does not delay another user's tasks of the same class."""
+        scheduler = FairTaskScheduler()
+        for i in range(5):
+            scheduler.put('bulk', 1, f'user-1-{i}')
+        scheduler.put('bulk', 2, 'user-2-0')
+
+        self.assertEqual([scheduler.get(timeout=0) for _ in range(3)], ['user-1-0', 'user-2-0', 'user-1-1'])
+        self.assertEqual(len(scheduler), 3)
+
+
+class TestFailedMessageHandling(unittest.TestCase):
+
+    def setUp(self):
+        TaskQueue._instance = None
+        TaskQueue._initialized = False
+        with patch.dict(os.environ, {'TASK_QUEUE_BACKEND': 'memory', 'TASK_QUEUE_MAX_ATTEMPTS': '3'}):
+            self.task_queue = TaskQueue()
+        self.task_queue.register_callback('failing_task', MagicMock(side_effect=RuntimeError("boom")))
+        self.message = {
+            'MessageId': 'message-1',
+            'ReceiptHandle': 'handle-1',
+            'Body': json.dumps({'user_id': 1, 'type': 'failing_task', 'task_data': {}}),
+            'Attributes': {'ApproximateReceiveCount': '1'},
         }
-        self.task_queue.get_all_queues = MagicMock(return_value=APIResponse("success", "", mock_response['QueueUrls']))
 
-        self.task_queue.sqs_client.receive_message.return_value = {'Messages': [{'Body': 'test message'}]}
+    def tearDown(self):
+        TaskQueue._instance = None
+        TaskQueue._initialized = False
+
+    @patch('app.services.task_queue.FailedTaskManager')
+    def test_failing_task_is_retried_with_backoff(self, mock_failed_task_manager):
+        """A task that raises is made visible again after a backoff instead of being deleted."""
+        with patch.object(self.task_queue, '_change_message_visibility') as mock_change_visibility, patch.object(
+            self.task_queue.ack_buffer, 'add'
+        ) as mock_ack:
+            response = self.task_queue.process_message(1, self.message, 'queue-1')
+
+        self.assertEqual(response.status, "failure")
+        mock_change_visibility.assert_called_once_with('queue-1', 'handle-1', 2)
+        mock_ack.assert_not_called()
+        mock_failed_task_manager.assert_not_called()
+
+    @patch('app.services.task_queue.FailedTaskManager')
+    def test_task_is_quarantined_after_max_attempts(self, mock_failed_task_manager):
+        """The last allowed attempt moves the task to failed_tasks and deletes it from the queue."""
+        mock_failed_task_manager.return_value.add_failed_task.return_value = APIResponse("success", "")
+        self.message['Attributes']['ApproximateReceiveCount'] = '3'
+        with patch.object(self.task_queue.ack_buffer, 'add') as mock_ack:
+            self.task_queue.process_message(1, self.message, 'queue-1')
+
+        mock_failed_task_manager.return_value.add_failed_task.assert_called_once_with(
+            1, 'failing_task', self.message['Body'], "boom", 3, 'message-1'
+        )
+        mock_ack.assert_called_once_with('queue-1', 'handle-1')
+
+
+class TestTaskDeduplication(unittest.TestCase):
+
+    def setUp(self):
+        TaskQueue._instance = None
+        TaskQueue._initialized = False
+        with patch.dict(os.environ, {'TASK_QUEUE_BACKEND': 'memory'}):
+            self.task_queue = TaskQueue()
+
+    def tearDown(self):
+        TaskQueue._instance = None
+        TaskQueue._initialized = False
+
+    def test_deduplication_id_is_keyed_on_job(self):
+        """Tasks for the same user, type and job share a deduplication ID regardless of other task data."""
+        task = {'user_id': 1, 'type': 'process_job', 'task_data': {'job_id': 'abc'}}
+        same_job = {'user_id': 1, 'type': 'process_job', 'task_data': {'job_id': 'abc', 'source': 'fetch'}}
+        other_user = {'user_id': 2, 'type': 'process_job', 'task_data': {'job_id': 'abc'}}
+
+        self.assertEqual(TaskQueue.get_task_deduplication_id(task), TaskQueue.get_task_deduplication_id(same_job))
+        self.assertNotEqual(TaskQueue.get_task_deduplication_id(task), TaskQueue.get_task_deduplication_id(other_user))
+
+    def test_recently_enqueued_task_is_skipped(self):
+        """Re-adding a task that was just enqueued does not send it again."""
+        self.task_queue.add_task(1, 'process_job', {'job_id': 'abc'})
+        response = self.task_queue.add_tasks(
+            1,
+            [
+                {'user_id': 1, 'type': 'process_job', 'task_data': {'job_id': 'abc'}},
+                {'user_id': 1, 'type': 'process_job', 'task_data': {'job_id': 'def'}},
+            ],
+        )
+
+        self.assertEqual(response.status, "success")
+        self.assertEqual(len(response.data['successful']), 1)
+        self.assertEqual(response.data['skipped'], 1)
+
+
+class TestInMemoryQueueBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = InMemoryQueueBackend()
+        self.queue_url = self.backend.create_queue(
+            QueueName='user_1_queue.fifo', Attributes={'FifoQueue': 'true', 'ContentBasedDeduplication': 'true'}
+        )['QueueUrl']
+
+    def test_received_message_is_invisible_until_deleted(self):
+        """A received message is hidden from other receivers and gone once deleted."""
+        self.backend.send_message_batch(
+            QueueUrl=self.queue_url, Entries=[{'Id': '0', 'MessageBody': 'task', 'MessageGroupId': 'default'}]
+        )
+
+        messages = self.backend.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10)['Messages']
+        self.assertEqual([m['Body'] for m in messages], ['task'])
+        self.assertEqual(self.backend.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10), {})
+
+        self.backend.delete_message(QueueUrl=self.queue_url, ReceiptHandle=messages[0]['ReceiptHandle'])
+        attributes = self.backend.get_queue_attributes(QueueUrl=self.queue_url, AttributeNames=['All'])['Attributes']
+        self.assertEqual(attributes['ApproximateNumberOfMessages'], '0')
+        self.assertEqual(attributes['ApproximateNumberOfMessagesNotVisible'], '0')
+
+    def test_duplicate_bodies_are_deduplicated(self):
+        """Content-based deduplication drops a resend of the same body."""
+        entry = {'Id': '0', 'MessageBody': 'task', 'MessageGroupId': 'default'}
+        self.backend.send_message_batch(QueueUrl=self.queue_url, Entries=[entry])
+        self.backend.send_message_batch(QueueUrl=self.queue_url, Entries=[entry])
+
+        messages = self.backend.receive_message(QueueUrl=self.queue_url, MaxNumberOfMessages=10)['Messages']
+
+        self.assertEqual(len(messages), 1)
+
+    def test_unknown_queue_raises_client_error(self):
+        """Missing queues surface as the same ClientError SQS raises."""
+        with self.assertRaises(ClientError) as context:
+            self.backend.get_queue_url(QueueName='user_2_queue.fifo')
+
+        self.assertTrue(TaskQueue._is_queue_missing(context.exception))
+
+
+class TestPostgresQueueBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.backend = PostgresQueueBackend(self.db)
+        self.queue_url = PostgresQueueBackend.URL_PREFIX + 'user_1_queue.fifo'
+        self.db.fetch_one.return_value = ('user_1_queue.fifo', True)
+
+    def test_send_message_batch_inserts_in_one_statement(self):
+        """The batch is one multi-row INSERT; duplicates already queued report the original message."""
+        entries = [
+            {'Id': '0', 'MessageBody': 'a', 'MessageGroupId': 'default', 'MessageDeduplicationId': 'dedup-a'},
+            {'Id': '1', 'MessageBody': 'b', 'MessageGroupId': 'default', 'MessageDeduplicationId': 'dedup-b'},
+        ]
+        self.db.bulk_upsert.return_value = [(1, 'dedup-a')]
+        self.db.fetch_all.return_value = [(7, 'dedup-b')]
+
+        response = self.backend.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
 
-        # Mock the process_message method
-        self.task_queue.process_message = MagicMock(return_value=APIResponse("success", "Task processed"))
+        self.db.bulk_upsert.assert_called_once()
+        self.assertEqual(len(self.db.bulk_upsert.call_args.args[1]), 2)
+        self.assertEqual(self.db.fetch_all.call_args.args[1], ('user_1_queue.fifo', ['dedup-b']))
+        self.assertEqual(response['Successful'], [{'Id': '0', 'MessageId': '1'}, {'Id': '1', 'MessageId': '7'}])
 
-        # Set up the futures to complete successfully
-        mock_future = MagicMock()
-        mock_future.result.return_value = APIResponse("success", "Task processed")
-        mock_as_completed.return_value = [mock_future]
+    def test_send_message_batch_raises_database_errors_as_client_errors(self):
+        """A database failure, including the queue lookup, is raised as an InternalError ClientError."""
+        self.db.fetch_one.side_effect = psycopg2.OperationalError("connection lost")
 
-        self.task_queue._processing_loop()
+        with self.assertRaises(ClientError) as context:
+            self.backend.send_message_batch(
+                QueueUrl=self.queue_url, Entries=[{'Id': '0', 'MessageBody': 'a', 'MessageGroupId': 'default'}]
+            )
 
-        # Ensure the receive_message method was called correctly
-        self.task_queue.sqs_client.receive_message.assert_called_once()
-        # Ensure process_message was called
-        self.task_queue.process_message.assert_called_once_with(1, {'Body': 'test message'})
+        self.assertEqual(context.exception.response['Error']['Code'], 'InternalError')
 
 
 if __name__ == "__main__":
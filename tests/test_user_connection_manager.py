@@ -0,0 +1,205 @@
+import asyncio
+import unittest
+
+from app.managers.user_connection_manager import HeartbeatWheel, QueuedConnection, UserConnectionManager
+
+
+class FakeConnection:
+    def __init__(self, answers_pings=True):
+        self.answers_pings = answers_pings
+        self.sent = []
+        self.pings = 0
+        self.closed_with = None
+
+    async def send(self, message):
+        self.sent.append(message)
+        return True
+
+    async def ping(self):
+        self.pings += 1
+        pong_waiter = asyncio.get_running_loop().create_future()
+        if self.answers_pings:
+            pong_waiter.set_result(0.0)
+        return pong_waiter
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+class SlowWebSocket:
+    """Accepts a message only when the test releases it."""
+
+    remote_address = ('127.0.0.1', 1234)
+
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+        self._release = asyncio.Semaphore(0)
+
+    async def send(self, message):
+        await self._release.acquire()
+        self.sent.append(message)
+
+    def release(self, count=1):
+        for _ in range(count):
+            self._release.release()
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+class TestQueuedConnection(unittest.IsolatedAsyncioTestCase):
+    async def _fill(self, connection, count):
+        self.assertTrue(await connection.send("m0"))
+        # The writer task takes the first message and waits on the socket with it, the rest fill the queue
+        await asyncio.sleep(0)
+        for i in range(1, count):
+            self.assertTrue(await connection.send(f"m{i}"))
+
+    async def test_drop_oldest_keeps_the_newest_messages(self):
+        websocket = SlowWebSocket()
+        connection = QueuedConnection(websocket, max_queue=2, overflow_policy='drop_oldest')
+        await self._fill(connection, 3)
+
+        self.assertTrue(await connection.send("m3"))
+        websocket.release(3)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(websocket.sent, ["m0", "m2", "m3"])
+        self.assertEqual(connection.dropped, 1)
+
+    async def test_drop_newest_rejects_the_message(self):
+        websocket = SlowWebSocket()
+        connection = QueuedConnection(websocket, max_queue=2, overflow_policy='drop_newest')
+        await self._fill(connection, 3)
+
+        self.assertFalse(await connection.send("m3"))
+        websocket.release(3)
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(websocket.sent, ["m0", "m1", "m2"])
+        self.assertEqual(connection.dropped, 1)
+
+    async def test_close_policy_disconnects_the_client(self):
+        websocket = SlowWebSocket()
+        connection = QueuedConnection(websocket, max_queue=2, overflow_policy='close')
+        await self._fill(connection, 3)
+
+        self.assertFalse(await connection.send("m3"))
+
+        self.assertEqual(websocket.closed_with, 1013)
+        self.assertFalse(await connection.send("m4"))
+
+    async def test_block_waits_for_room(self):
+        websocket = SlowWebSocket()
+        connection = QueuedConnection(websocket, max_queue=2, overflow_policy='block', send_timeout=1)
+        await self._fill(connection, 3)
+
+        send = asyncio.create_task(connection.send("m3"))
+        await asyncio.sleep(0.01)
+        self.assertFalse(send.done())
+        websocket.release()
+
+        self.assertTrue(await send)
+        websocket.release(3)
+        await asyncio.sleep(0.01)
+        self.assertEqual(websocket.sent, ["m0", "m1", "m2", "m3"])
+
+    async def test_block_closes_the_client_after_the_send_timeout(self):
+        websocket = SlowWebSocket()
+        connection = QueuedConnection(websocket, max_queue=2, overflow_policy='block', send_timeout=0.05)
+        await self._fill(connection, 3)
+
+        self.assertFalse(await connection.send("m3"))
+        self.assertEqual(websocket.closed_with, 1013)
+
+
+class TestHeartbeatWheel(unittest.IsolatedAsyncioTestCase):
+    async def test_connections_are_spread_over_the_slots(self):
+        wheel = HeartbeatWheel(on_dead=None, interval=60, slots=4)
+        connections = [FakeConnection() for _ in range(8)]
+        for connection in connections:
+            wheel.add(connection)
+
+        self.assertEqual([len(slot) for slot in wheel.slots], [2, 2, 2, 2])
+        await wheel.stop()
+
+    async def test_connection_without_pong_is_reported_dead(self):
+        dead = []
+
+        async def on_dead(connection):
+            dead.append(connection)
+
+        wheel = HeartbeatWheel(on_dead, interval=0.04, slots=2)
+        alive, silent = FakeConnection(), FakeConnection(answers_pings=False)
+        wheel.add(alive)
+        wheel.add(silent)
+
+        await asyncio.sleep(0.15)
+        await wheel.stop()
+
+        self.assertEqual(dead, [silent])
+        self.assertGreaterEqual(alive.pings, 2)
+        self.assertNotIn(silent, wheel._slot_of)
+        self.assertIn(alive, wheel._slot_of)
+
+
+class TestUserConnectionManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.manager = UserConnectionManager(heartbeat_interval=60)
+
+    async def asyncTearDown(self):
+        await self.manager.close()
+
+    async def test_removing_one_socket_keeps_the_others(self):
+        first_tab, second_tab = FakeConnection(), FakeConnection()
+        await self.manager.add_connection(1, first_tab)
+        await self.manager.add_connection(1, second_tab)
+
+        await self.manager.remove_connection(1, first_tab)
+
+        self.assertTrue((await self.manager.is_connected(1)).data["connected"])
+        self.assertNotIn(first_tab, self.manager.heartbeat._slot_of)
+        self.assertIn(second_tab, self.manager.heartbeat._slot_of)
+        response = await self.manager.broadcast(1, "update")
+        self.assertEqual(response.data["delivered"], 1)
+        self.assertEqual((first_tab.sent, second_tab.sent), ([], ["update"]))
+
+    async def test_broadcast_lets_a_blocked_send_close_the_slow_client(self):
+        websocket = SlowWebSocket()
+        connection = QueuedConnection(websocket, max_queue=1, overflow_policy='block', send_timeout=0.05)
+        await self.manager.add_connection(1, connection)
+        self.manager.broadcast_timeout = 1
+        await connection.send("m0")
+        await connection.send("m1")
+
+        response = await self.manager.broadcast(1, "m2")
+
+        self.assertEqual(response.data["delivered"], 0)
+        self.assertEqual(websocket.closed_with, 1013)
+
+    async def test_broadcast_timeout_closes_the_connection(self):
+        websocket = SlowWebSocket()
+        await self.manager.add_connection(1, websocket)
+        self.manager.broadcast_timeout = 0.05
+
+        response = await self.manager.broadcast(1, "update")
+        await asyncio.sleep(0)
+
+        self.assertEqual(response.data["delivered"], 0)
+        self.assertEqual(websocket.closed_with, 1013)
+
+    async def test_dead_connection_is_removed_and_closed(self):
+        first_tab, second_tab = FakeConnection(), FakeConnection()
+        await self.manager.add_connection(1, first_tab)
+        await self.manager.add_connection(1, second_tab)
+
+        await self.manager._on_dead_connection(first_tab)
+        await asyncio.sleep(0)
+
+        self.assertEqual(first_tab.closed_with, 1011)
+        self.assertEqual(self.manager.active_connections[1], {second_tab})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import unittest
+from http import HTTPStatus
+from unittest import mock
+
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+from app.web_socket_server import SessionAuthenticator
+
+SECRET_KEY = 'test-secret'
+
+
+def session_cookie(data, secret_key=SECRET_KEY):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = secret_key
+    serializer = SecureCookieSessionInterface().get_signing_serializer(app)
+    return f"{app.config['SESSION_COOKIE_NAME']}={serializer.dumps(data)}"
+
+
+class FakeServerConnection:
+    def __init__(self):
+        self.user_id = None
+
+    def respond(self, status, text):
+        return status
+
+
+class FakeRequest:
+    def __init__(self, cookie=None):
+        self.headers = {'Cookie': cookie} if cookie else {}
+
+
+class TestSessionAuthenticator(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        with mock.patch.dict(os.environ, {'SECRET_KEY': SECRET_KEY}):
+            self.authenticator = SessionAuthenticator()
+
+    def test_reads_the_user_of_a_valid_session(self):
+        self.assertEqual(self.authenticator.get_user_id(session_cookie({'_user_id': '42'})), 42)
+
+    def test_rejects_a_missing_cookie_or_anonymous_session(self):
+        self.assertIsNone(self.authenticator.get_user_id(None))
+        self.assertIsNone(self.authenticator.get_user_id("other=value"))
+        self.assertIsNone(self.authenticator.get_user_id(session_cookie({})))
+
+    def test_rejects_a_bad_signature(self):
+        self.assertIsNone(self.authenticator.get_user_id(session_cookie({'_user_id': '42'}, secret_key='other')))
+
+    def test_rejects_an_expired_session(self):
+        # Signed long before the session lifetime
+        with mock.patch('itsdangerous.timed.time.time', return_value=0):
+            cookie = session_cookie({'_user_id': '42'})
+        self.assertIsNone(self.authenticator.get_user_id(cookie))
+
+    async def _process(self, cookie, is_active):
+        db = mock.AsyncMock()
+        db.fetch_one.return_value = (is_active,) if is_active is not None else None
+        connection = FakeServerConnection()
+        with mock.patch('app.web_socket_server.get_async_db', mock.AsyncMock(return_value=db)):
+            response = await self.authenticator.process_request(connection, FakeRequest(cookie))
+        return response, connection
+
+    async def test_handshake_of_an_active_user_is_accepted(self):
+        response, connection = await self._process(session_cookie({'_user_id': '7'}), True)
+        self.assertIsNone(response)
+        self.assertEqual(connection.user_id, 7)
+
+    async def test_handshake_without_session_is_unauthorized(self):
+        response, _ = await self._process(None, True)
+        self.assertEqual(response, HTTPStatus.UNAUTHORIZED)
+
+    async def test_handshake_of_an_inactive_or_deleted_user_is_forbidden(self):
+        for is_active in (False, None):
+            response, connection = await self._process(session_cookie({'_user_id': '7'}), is_active)
+            self.assertEqual(response, HTTPStatus.FORBIDDEN)
+            self.assertIsNone(connection.user_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import unittest
+
+import websockets
+from websockets.frames import Close
+
+from app.managers.user_connection_manager import UserConnectionManager
+from app.managers.websocket_handler import WebSocketHandler
+from app.services.pubsub import InMemoryPubSub, user_channel
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self._incoming = asyncio.Queue()
+
+    async def recv(self):
+        message = await self._incoming.get()
+        if message is None:
+            raise websockets.ConnectionClosedOK(Close(1000, ""), Close(1000, ""), True)
+        return message
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+        return True
+
+    async def ping(self):
+        pong_waiter = asyncio.get_running_loop().create_future()
+        pong_waiter.set_result(0.0)
+        return pong_waiter
+
+    async def close(self, code=1000, reason=""):
+        self._incoming.put_nowait(None)
+
+    def disconnect(self):
+        self._incoming.put_nowait(None)
+
+
+class TestWebSocketHandlerPubSub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pubsub = InMemoryPubSub()
+        self.connection_manager = UserConnectionManager(heartbeat_interval=60)
+        self.handler = WebSocketHandler(self.connection_manager, self.pubsub)
+
+    async def asyncTearDown(self):
+        await self.connection_manager.close()
+
+    async def _connect(self, user_id):
+        websocket = FakeWebSocket()
+        task = asyncio.create_task(self.handler.handle_websocket(websocket, user_id))
+        await asyncio.sleep(0)
+        return websocket, task
+
+    async def test_notify_new_job_reaches_every_socket_of_the_user(self):
+        first_tab, first_task = await self._connect(1)
+        second_tab, second_task = await self._connect(1)
+        other_user, other_task = await self._connect(2)
+
+        await self.handler.notify_new_job(1, {"job_id": "abc", "status": "new"})
+
+        self.assertEqual([message["data"]["job_id"] for message in first_tab.sent], ["abc"])
+        self.assertEqual([message["data"]["job_id"] for message in second_tab.sent], ["abc"])
+        self.assertEqual(other_user.sent, [])
+
+        for websocket in (first_tab, second_tab, other_user):
+            websocket.disconnect()
+        await asyncio.gather(first_task, second_task, other_task)
+
+    async def test_channel_is_unsubscribed_with_the_last_socket(self):
+        first_tab, first_task = await self._connect(1)
+        second_tab, second_task = await self._connect(1)
+        self.assertIn(user_channel(1), self.pubsub._callbacks)
+
+        first_tab.disconnect()
+        await first_task
+        self.assertIn(user_channel(1), self.pubsub._callbacks)
+
+        second_tab.disconnect()
+        await second_task
+        self.assertNotIn(user_channel(1), self.pubsub._callbacks)
+        self.assertFalse((await self.connection_manager.is_connected(1)).data["connected"])
+
+
+if __name__ == '__main__':
+    unittest.main()